@@ -0,0 +1,64 @@
+"""
+Allocation and per-query memory of building and compiling typical queries.
+
+    python benchmarks/builder_memory.py [count]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlbuilder.builder import Builder
+from sqlbuilder.connection import Connection
+from sqlbuilder.mysqlgrammar import MysqlGrammar
+
+
+def build(connection, grammar, i):
+    def nested(query):
+        query.where('name', 'Abigail').or_where('votes', '>', 50)
+
+    return (Builder(connection, grammar)
+            .table('users')
+            .select('users.id', 'users.name')
+            .join('roles', 'roles.id', '=', 'users.role_id')
+            .where('users.id', '>', i)
+            .where_in('status', [1, 2, 3])
+            .where_null('deleted_at')
+            .where(nested)
+            .order_by('users.id')
+            .limit(10))
+
+
+def main(count):
+    connection = Connection(None, '')
+    grammar = MysqlGrammar('')
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    queries = [build(connection, grammar, i) for i in range(count)]
+    after = tracemalloc.take_snapshot()
+    stats = after.compare_to(before, 'filename')
+    size = sum(s.size_diff for s in stats)
+    blocks = sum(s.count_diff for s in stats)
+    tracemalloc.stop()
+
+    print(f'retained per query: {size / count:.0f} bytes in {blocks / count:.1f} blocks')
+
+    start = time.perf_counter()
+    for query in queries:
+        query.to_sql()
+        query.get_bindings()
+    elapsed = time.perf_counter() - start
+    print(f'compile + bindings: {elapsed / count * 1e6:.2f} us per query')
+
+    start = time.perf_counter()
+    for i in range(count):
+        build(connection, grammar, i)
+    elapsed = time.perf_counter() - start
+    print(f'build: {elapsed / count * 1e6:.2f} us per query')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,43 @@
+"""
+Compile time of select queries with and without the grammar's compiled sql cache,
+and the share of it spent building the cache key.
+
+    python benchmarks/compile_cache.py [count]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlbuilder.connection import Connection
+from sqlbuilder.mysqlgrammar import MysqlGrammar
+from builder_memory import build
+
+
+def best(fn, queries, repeat=5):
+    elapsed = min(timed(fn, queries) for _ in range(repeat))
+    return elapsed / len(queries) * 1e6
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return time.perf_counter() - start
+
+
+def main(count):
+    connection = Connection(None, '')
+    uncached = MysqlGrammar('', cache_size=0)
+    cached = MysqlGrammar('')
+    queries = [build(connection, cached, i) for i in range(count)]
+
+    print(f'uncached compile: {best(uncached.compile_select, queries):.2f} us per query')
+    print(f'cached compile: {best(cached.compile_select, queries):.2f} us per query')
+    print(f'fingerprint: {best(cached.fingerprint, queries):.2f} us per query')
+    print(cached.cache_info())
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
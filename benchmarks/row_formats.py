@@ -0,0 +1,34 @@
+"""
+Memory and time of shaping fetched tuples into each row format.
+
+    python benchmarks/row_formats.py [rows]
+"""
+import datetime
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlbuilder.rows import shape, ROW_FORMATS
+
+
+def main(count):
+    names = ('id', 'user_id', 'amount', 'status', 'created_at')
+    created = datetime.datetime(2024, 1, 1)
+    fetched = [(i, i % 1000, i * 0.5, 'paid', created) for i in range(count)]
+
+    for row_format in ROW_FORMATS:
+        tracemalloc.start()
+        start = time.perf_counter()
+        rows = shape(names, fetched, row_format)
+        elapsed = time.perf_counter() - start
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'{row_format:>10}: {size / count:7.1f} bytes/row, {elapsed * 1e9 / count:6.0f} ns/row')
+        del rows
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,100 @@
+"""
+Typed column arrays built batch by batch from driver.fetch_batches. numpy and
+pyarrow are optional and only imported when used.
+"""
+import datetime
+
+# column kinds reported by the drivers
+KINDS = ('int', 'float', 'bool', 'datetime', 'date', 'object')
+
+
+def _import(module, feature):
+    try:
+        return __import__(module)
+    except ImportError as e:
+        raise ImportError(f'{feature} requires {module}, install it with pip install {module}') from e
+
+
+def _naive_utc(value):
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _numpy_column(np, kind, values):
+    has_null = None in values
+    if kind == 'int':
+        if has_null:
+            return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        return np.fromiter(values, dtype=np.int64, count=len(values))
+    if kind == 'float':
+        if has_null:
+            return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        return np.fromiter(values, dtype=np.float64, count=len(values))
+    if kind == 'bool' and not has_null:
+        return np.fromiter(values, dtype=np.bool_, count=len(values))
+    if kind == 'datetime':
+        return np.array([_naive_utc(v) if v is not None else 'NaT' for v in values], dtype='datetime64[us]')
+    if kind == 'date':
+        return np.array([v if v is not None else 'NaT' for v in values], dtype='datetime64[D]')
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def to_numpy(columns, batches):
+    """
+    :param columns: [(name, kind)] as returned by driver.fetch_batches
+    :param batches: iterable of lists of row tuples
+    :return: dict of column name to numpy array; int columns holding nulls become float with nan
+    """
+    np = _import('numpy', 'to_numpy')
+    chunks = [[] for _ in columns]
+    for batch in batches:
+        for chunk, (_, kind), values in zip(chunks, columns, zip(*batch)):
+            chunk.append(_numpy_column(np, kind, values))
+
+    result = {}
+    for (name, kind), chunk in zip(columns, chunks):
+        if not chunk:
+            result[name] = _numpy_column(np, kind, ())
+        elif len(chunk) == 1:
+            result[name] = chunk[0]
+        else:
+            # an int column turns float in the batches holding nulls, so concatenate promotes
+            result[name] = np.concatenate(chunk)
+    return result
+
+
+def _arrow_type(pa, kind):
+    return {
+        'int': pa.int64(),
+        'float': pa.float64(),
+        'bool': pa.bool_(),
+        'datetime': pa.timestamp('us'),
+        'date': pa.date32(),
+    }.get(kind)
+
+
+def to_arrow(columns, batches):
+    """
+    :param columns: [(name, kind)] as returned by driver.fetch_batches
+    :param batches: iterable of lists of row tuples
+    :return: pyarrow.Table; object columns get the type arrow infers, widened across batches
+    """
+    pa = _import('pyarrow', 'to_arrow')
+    types = [_arrow_type(pa, kind) for _, kind in columns]
+    names = [name for name, _ in columns]
+    tables = []
+    for batch in batches:
+        arrays = []
+        for (_, kind), type_, values in zip(columns, types, zip(*batch)):
+            if kind == 'datetime':
+                values = [_naive_utc(v) for v in values]
+            arrays.append(pa.array(values, type=type_))
+        tables.append(pa.Table.from_arrays(arrays, names=names))
+
+    if not tables:
+        return pa.schema([(name, type_ or pa.null()) for name, type_ in zip(names, types)]).empty_table()
+    # an object column can come out null in one batch and decimal(5, 2) in the next
+    return pa.concat_tables(tables, promote_options='permissive')
@@ -0,0 +1,214 @@
+import asyncio
+import inspect
+import time
+from .builder import Builder, InvalidArgumentException
+from .hooks import forget_event
+
+
+class AsyncBuilder(Builder):
+    """
+    Builder whose execution methods are coroutines. Query construction and
+    compilation are inherited unchanged; only the round trips are awaited.
+    count/min/max/avg, first and find return awaitables through aggregate and get,
+    and so does prepare().execute through the connection's select. lazy and
+    lazy_by_id are async generators; chunk callbacks may be coroutine functions.
+    """
+    __slots__ = ()
+
+    def new_query(self):
+        return AsyncBuilder(self.connection, self.grammar)
+
+    async def get(self, columns=None, row_format='dict'):
+        sql, bindings = self._compile_get(columns)
+        key, rows = self._remembered(sql, bindings, row_format)
+        if rows is not None:
+            forget_event()
+            return rows
+        since = time.time()
+        rows = await self.connection.select(sql, bindings, self.use_primary_, row_format)
+        if key is not None:
+            self._remember(key, rows, since)
+        return rows
+
+    async def cursor_paginate(self, per_page=15, cursor=None, columns=None):
+        query, keys, direction = self._cursor_page_query(cursor)
+        results = await query.take(per_page + 1).get(columns)
+        return self._cursor_page(results, per_page, keys, direction, cursor)
+
+    async def _pages(self, count):
+        if not self.orders_:
+            raise InvalidArgumentException('An order by clause is required to page through results.')
+        page = 1
+        while True:
+            results = await self.clone().for_page(page, count).get()
+            if results:
+                yield results
+            if len(results) < count:
+                return
+            page += 1
+
+    async def _pages_by_id(self, count, column='id', alias=None):
+        alias = alias if alias else column.split('.')[-1]
+        last_id = None
+        while True:
+            results = await self.clone().for_page_after_id(count, last_id, column).get()
+            if results:
+                yield results
+            if len(results) < count:
+                return
+            last_id = results[-1][alias]
+
+    @staticmethod
+    async def _chunks(pages, callback):
+        page = 0
+        async for results in pages:
+            page += 1
+            result = callback(results, page)
+            if inspect.isawaitable(result):
+                result = await result
+            if result is False:
+                return False
+        return True
+
+    async def chunk(self, count, callback):
+        return await self._chunks(self._pages(count), callback)
+
+    async def chunk_by_id(self, count, callback, column='id', alias=None):
+        return await self._chunks(self._pages_by_id(count, column, alias), callback)
+
+    async def lazy(self, count=1000):
+        async for results in self._pages(count):
+            for row in results:
+                yield row
+
+    async def lazy_by_id(self, count=1000, column='id', alias=None):
+        async for results in self._pages_by_id(count, column, alias):
+            for row in results:
+                yield row
+
+    def to_numpy(self, columns=None, batch_size=10000):
+        raise NotImplementedError('to_numpy is not available on async connections')
+
+    def to_arrow(self, columns=None, batch_size=10000):
+        raise NotImplementedError('to_arrow is not available on async connections')
+
+    async def aggregate(self, fn, columns):
+        columns = columns if columns else ['*']
+        results = await self._aggregate_query(fn, columns).get(columns)
+        return self._aggregate_result(results)
+
+    async def sum(self, columns):
+        result = await self.aggregate('sum', [columns])
+        return result if result else 0
+
+    async def exists(self):
+        results = await self.connection.select(*self._compile_exists(), self.use_primary_)
+        return self._exists_result(results)
+
+    async def stream(self, batch_size=1000, columns=None):
+        sql, bindings = self._compile_get(columns)
+        rows = await self.connection.cursor(sql, bindings, batch_size, self.use_primary_)
+        async for row in rows:
+            yield row
+
+    async def insert(self, values):
+        if not values:
+            return True
+        result = await self.connection.insert(*self._compile_insert(values))
+        self._invalidate()
+        return result
+
+    async def insert_get_id(self, values, sequence=None):
+        result = await self.connection.insert(*self._compile_insert_get_id(values, sequence))
+        self._invalidate()
+        return result
+
+    async def insert_many(self, rows, chunk_size=None, use_executemany=False, transaction=False):
+        if transaction:
+            await self.connection.start_transaction()
+        try:
+            total = 0
+            for sql, bindings in self._insert_chunks(rows, chunk_size, use_executemany):
+                if use_executemany:
+                    total += await self.connection.statement_many(sql, bindings)
+                else:
+                    total += await self.connection.effecting_statement(sql, bindings)
+        except Exception:
+            if transaction:
+                await self.connection.rollback()
+            raise
+        finally:
+            self._invalidate()
+        if transaction:
+            await self.connection.commit()
+        return total
+
+    async def copy_from(self, rows, columns=None, binary=False, types=None):
+        sql, records = self._compile_copy_from(rows, columns, binary)
+        if sql is None:
+            return 0
+        try:
+            return await self.connection.copy_from(sql, records, types)
+        finally:
+            self._invalidate()
+
+    async def update(self, values):
+        result = await self.connection.update(*self._compile_update(values))
+        self._invalidate()
+        return result
+
+    async def update_or_insert(self, attributes, values):
+        if not await self.where(attributes).exists():
+            return await self.insert({**attributes, **values})
+        return await self.take(1).update(values)
+
+    async def update_batch(self, rows, key='id', types=None, chunk_size=None):
+        try:
+            total = 0
+            for records in self._update_batch_chunks(rows, chunk_size):
+                total += await self.connection.effecting_statement(*self._compile_update_batch(records, key, types))
+        finally:
+            self._invalidate()
+        return total
+
+    async def upsert(self, rows, unique_by, update=None, chunk_size=None):
+        unique_by = [unique_by] if type(unique_by) == str else list(unique_by)
+        try:
+            total = 0
+            for records in self._upsert_chunks(rows, unique_by, chunk_size):
+                total += await self.connection.effecting_statement(*self._compile_upsert(records, unique_by, update))
+        finally:
+            self._invalidate()
+        return total
+
+    async def delete(self, primary_key=''):
+        result = await self.connection.delete(*self._compile_delete(primary_key))
+        self._invalidate()
+        return result
+
+    async def delete_in_batches(self, batch_size=1000, pause=None, progress=None, key='id'):
+        sql, bindings = self._compile_delete_batch(batch_size, key)
+        total = 0
+        try:
+            while True:
+                await self.connection.start_transaction()
+                try:
+                    deleted = await self.connection.delete(sql, bindings)
+                except BaseException:
+                    await self.connection.rollback()
+                    raise
+                await self.connection.commit()
+                if not deleted:
+                    return total
+                total += deleted
+                if progress:
+                    progress(total)
+                if pause:
+                    await asyncio.sleep(pause)
+        finally:
+            self._invalidate()
+
+    async def truncate(self):
+        for sql, bindings in self.grammar.compile_truncate(self).items():
+            await self.connection.statement(sql, bindings)
+        self._invalidate()
@@ -0,0 +1,149 @@
+import asyncio
+from contextlib import asynccontextmanager
+from .asyncbuilder import AsyncBuilder
+from .connection import Connection, QueryException
+from .rows import format_args
+
+
+class AsyncConnection(Connection):
+    """
+    Connection over an asyncio driver. Builders created here are AsyncBuilder,
+    sharing the grammar and compile path of the blocking connection.
+    """
+
+    def new_query(self):
+        return AsyncBuilder(self, self.query_grammar)
+
+    async def statement(self, query, bindings):
+        async def fn(sql, binder):
+            return await self.driver.statement(sql, binder)
+
+        return await self.run(query, bindings, fn)
+
+    async def select(self, query, bindings, use_primary=False, row_format='dict'):
+        bindings = bindings if bindings else ()
+
+        async def fn(sql, binder):
+            return await self.driver.fetch_all(sql, binder, *format_args(row_format))
+
+        return await self.run(query, bindings, fn)
+
+    async def cursor(self, query, bindings, batch_size=1000, use_primary=False):
+        bindings = bindings if bindings else ()
+
+        async def fn(sql, binder):
+            return await self.driver.cursor(sql, binder, batch_size)
+
+        return await self.run(query, bindings, fn)
+
+    async def gather(self, builders, timeout=None, max_concurrency=None):
+        """
+        Run the select of every builder concurrently and return the results in order.
+        :param builders:
+        :param timeout: seconds a query may run once it holds a concurrency slot
+        :param max_concurrency: cap on queries in flight, defaults to one per builder
+        :return:
+        """
+        queries = [self._gathered(builder) for builder in builders]
+        semaphore = asyncio.Semaphore(max_concurrency or len(queries) or 1)
+
+        async def run(sql, bindings, use_primary):
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self.select(sql, bindings, use_primary), timeout)
+                except asyncio.TimeoutError:
+                    raise QueryException(sql, bindings)
+
+        # a task runs in a copy of the context current when it is created
+        tasks = [context.run(asyncio.ensure_future, run(*query)) for context, *query in queries]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    async def insert(self, query, bindings):
+        bindings = bindings if bindings else ()
+
+        async def fn(sql, binder):
+            await self.driver.statement(sql, binder)
+            return self.driver.last_rowid()
+
+        return await self.run(query, bindings, fn)
+
+    async def update(self, query, bindings):
+        return await self.effecting_statement(query, bindings)
+
+    async def delete(self, query, bindings):
+        return await self.effecting_statement(query, bindings)
+
+    async def effecting_statement(self, query, bindings):
+        async def fn(sql, binder):
+            return await self.driver.statement(sql, binder)
+
+        return await self.run(query, bindings, fn)
+
+    async def statement_many(self, query, bindings):
+        async def fn(sql, binder):
+            return await self.driver.statement_many(sql, binder)
+
+        return await self.run(query, bindings, fn)
+
+    async def copy_from(self, query, rows, types=None):
+        async def fn(sql, binder):
+            return await self.driver.copy_from(sql, rows, types)
+
+        return await self.run(query, (), fn)
+
+    async def run(self, query, bindings, fn):
+        if self.hooks is not None:
+            return await self.hooks.execute_async(self._run, query, bindings, fn)
+        return await self._run(query, bindings, fn)
+
+    async def _run(self, query, bindings, fn):
+        start = self._observe_start()
+        try:
+            result = await fn(query, bindings)
+        except Exception as e:
+            if start is not None:
+                self._observe(start, query, bindings, error=e)
+            raise QueryException(query, bindings)
+
+        if start is not None:
+            self._observe(start, query, bindings, result)
+        return result
+
+    async def commit(self):
+        try:
+            return await self.driver.commit()
+        finally:
+            self._ended()
+
+    async def rollback(self):
+        try:
+            return await self.driver.rollback()
+        finally:
+            self._ended()
+
+    async def start_transaction(self):
+        result = await self.driver.start_transaction()
+        self.transaction_open.set(True)
+        return result
+
+    @asynccontextmanager
+    async def transaction(self):
+        if self.in_transaction():
+            # the driver joins the enclosing transaction, which ends it
+            async with self.driver.transaction():
+                yield
+            return
+        self.transaction_open.set(True)
+        try:
+            async with self.driver.transaction():
+                yield
+        finally:
+            self._ended()
+
+    async def close(self):
+        return await self.driver.close()
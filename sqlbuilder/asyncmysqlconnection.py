@@ -0,0 +1,27 @@
+from .asyncconnection import AsyncConnection
+from .mysqlgrammar import MysqlGrammar
+from .driver import AsyncExecutorDriver, MySqlDriver
+
+
+class AsyncMysqlConnection(AsyncConnection):
+    def __init__(self, driver: AsyncExecutorDriver, table_prefix=''):
+        self.table_prefix = table_prefix
+        super().__init__(driver, table_prefix)
+
+    @classmethod
+    async def connect(cls, table_prefix='', pool_size=4, statement_cache_size=0, **config):
+        # statements land on whichever pooled connection is free, so only a task
+        # holding a transaction (which pins its connection) may leave work uncommitted
+        config.setdefault('autocommit', True)
+
+        def factory():
+            return MySqlDriver(statement_cache_size, **config)
+
+        driver = await AsyncExecutorDriver.connect(factory, pool_size)
+        return cls(driver, table_prefix)
+
+    def get_grammar(self):
+        return MysqlGrammar(self.table_prefix)
+
+    def pool_stats(self):
+        return self.driver.pool_stats()
@@ -0,0 +1,18 @@
+from .asyncconnection import AsyncConnection
+from .postgresgrammar import PostgresGrammar
+from .driver import AsyncPostgresDriver
+from psycopg.conninfo import make_conninfo
+
+
+class AsyncPostgresConnection(AsyncConnection):
+    def __init__(self, driver: AsyncPostgresDriver, table_prefix=''):
+        self.table_prefix = table_prefix
+        super().__init__(driver, table_prefix)
+
+    @classmethod
+    async def connect(cls, table_prefix='', statement_cache_size=0, **config):
+        driver = await AsyncPostgresDriver.connect(make_conninfo(**config), statement_cache_size)
+        return cls(driver, table_prefix)
+
+    def get_grammar(self):
+        return PostgresGrammar(self.table_prefix)
@@ -1,23 +1,13 @@
 from inspect import isfunction
+from itertools import chain
 import copy
-import math
-
-
-def flatten(lst, depth=math.inf):
-    result = []
-    if type(lst) == list:
-        tmp = enumerate(lst)
-    else:
-        tmp = lst.items()
-    for p in tmp:
-        v = p[1]
-        if type(v) != dict and type(v) != list:
-            result.append(v)
-        elif depth == 1:
-            result.append(v)
-        else:
-            result += flatten(v, depth-1)
-    return result
+import re
+import time
+from .arrays import to_numpy, to_arrow
+from .cache import cache_key
+from .hooks import forget_event, hooked
+from .nodes import Basic, In, InSub, Null, Between, Nested, Exists, Column, Raw, Sub, Order, Union, Aggregate
+from .pagination import CursorPaginator, encode_cursor, decode_cursor
 
 
 class InvalidArgumentException(Exception):
@@ -25,6 +15,8 @@ class InvalidArgumentException(Exception):
 
 
 class Expression:
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
@@ -35,6 +27,128 @@ class Expression:
         return str(self.value)
 
 
+class Parameter:
+    """
+    Named placeholder for a value supplied when a prepared query is executed.
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f'Parameter({self.name!r})'
+
+
+class PreparedQuery:
+    """
+    Immutable compiled select: the sql plus a binding plan that only needs the
+    named parameter values to produce the final bindings.
+    """
+    __slots__ = ('connection', 'sql', 'bindings', 'params', 'names')
+
+    def __init__(self, connection, sql, bindings):
+        params = tuple((i, v.name) for i, v in enumerate(bindings) if isinstance(v, Parameter))
+        object.__setattr__(self, 'connection', connection)
+        object.__setattr__(self, 'sql', sql)
+        object.__setattr__(self, 'bindings', tuple(bindings))
+        object.__setattr__(self, 'params', params)
+        object.__setattr__(self, 'names', frozenset(name for _, name in params))
+
+    def __setattr__(self, key, value):
+        raise AttributeError('PreparedQuery is immutable')
+
+    def bind(self, **params):
+        if params.keys() != self.names:
+            missing = self.names - params.keys()
+            if missing:
+                raise InvalidArgumentException(f"Missing query parameter: {', '.join(sorted(missing))}")
+            unknown = params.keys() - self.names
+            raise InvalidArgumentException(f"Unknown query parameter: {', '.join(sorted(unknown))}")
+        if not self.params:
+            return self.bindings
+
+        bindings = list(self.bindings)
+        for index, name in self.params:
+            bindings[index] = params[name]
+        return tuple(bindings)
+
+    def execute(self, **params):
+        return self.connection.select(self.sql, self.bind(**params))
+
+
+class Bindings:
+    """
+    Append-only query bindings kept per clause section. The flat tuple, in the
+    order the sections appear in the compiled sql, is built once and reused
+    until the next append.
+    """
+    sections = ('select', 'join', 'where', 'having', 'order', 'union')
+
+    __slots__ = sections + ('flat',)
+
+    def __init__(self):
+        self.select = None
+        self.join = None
+        self.where = None
+        self.having = None
+        self.order = None
+        self.union = None
+        self.flat = ()
+
+    def _section(self, section):
+        if section not in Bindings.sections:
+            raise InvalidArgumentException(f"Invalid binding type: {section}")
+        return getattr(self, section)
+
+    def add(self, value, section='where'):
+        values = self._section(section)
+        if values is None:
+            setattr(self, section, [value])
+        else:
+            values.append(value)
+        self.flat = None
+
+    def extend(self, values, section='where'):
+        current = self._section(section)
+        if not values:
+            return
+        if current is None:
+            setattr(self, section, list(values))
+        else:
+            current.extend(values)
+        self.flat = None
+
+    def clear(self, section):
+        self._section(section)
+        setattr(self, section, None)
+        self.flat = None
+
+    def __getitem__(self, section):
+        values = self._section(section)
+        return tuple(values) if values else ()
+
+    def without(self, *sections):
+        return tuple(chain.from_iterable(getattr(self, s) or () for s in Bindings.sections if s not in sections))
+
+    def to_tuple(self):
+        if self.flat is None:
+            self.flat = tuple(chain.from_iterable(getattr(self, s) or () for s in Bindings.sections))
+        return self.flat
+
+    def copy(self):
+        clone = Bindings()
+        for section in Bindings.sections:
+            values = getattr(self, section)
+            if values:
+                setattr(clone, section, list(values))
+        clone.flat = self.flat
+        return clone
+
+    def __len__(self):
+        return len(self.to_tuple())
+
+
 class Builder:
     operators = [
         '=', '<', '>', '<=', '>=', '<>', '!=', '<=>',
@@ -45,19 +159,17 @@ class Builder:
         'not similar to', 'not like', '~~*', '!~~*',
     ]
 
+    __slots__ = ('connection', 'grammar', 'aggregate_', 'columns_', 'bindings', 'distinct_', 'from_',
+                 'joins_', 'wheres_', 'groups_', 'having_', 'orders_', 'unions_', 'union_orders',
+                 'union_offset', 'offset_', 'union_limit', 'limit_', 'lock_', 'use_primary_',
+                 'remember_')
+
     def __init__(self, connection, grammar):
         self.connection = connection
         self.grammar = grammar
-        self.aggregate_ = {}
+        self.aggregate_ = None
         self.columns_ = []
-        self.bindings = {
-            'select': [],
-            'join': [],
-            'where': [],
-            'having': [],
-            'order': [],
-            'union': [],
-        }
+        self.bindings = Bindings()
         self.distinct_ = False
         self.from_ = ''
         self.joins_ = []
@@ -71,6 +183,9 @@ class Builder:
         self.offset_ = 0
         self.union_limit = 0
         self.limit_ = 0
+        self.lock_ = None
+        self.use_primary_ = False
+        self.remember_ = None
 
     def get_connection(self):
         return self.connection
@@ -81,12 +196,86 @@ class Builder:
     def new_query(self):
         return Builder(self.connection, self.grammar)
 
+    def clone(self):
+        clone = copy.copy(self)
+        clone.columns_ = list(self.columns_)
+        clone.joins_ = list(self.joins_)
+        clone.wheres_ = list(self.wheres_)
+        clone.groups_ = list(self.groups_)
+        clone.having_ = list(self.having_)
+        clone.orders_ = list(self.orders_)
+        clone.unions_ = list(self.unions_)
+        clone.union_orders = list(self.union_orders)
+        clone.bindings = self.bindings.copy()
+        return clone
+
+    def use_primary(self):
+        """
+        Read from the primary even when the connection routes reads to replicas.
+        """
+        self.use_primary_ = True
+        return self
+
+    def remember(self, ttl=60):
+        """
+        Cache the rows of get/first/count/aggregate in the connection's cache store,
+        tagged with every table the query reads. Writes through the connection to
+        one of those tables drop the entry.
+        :param ttl: seconds to keep the rows, None keeps them until invalidated
+        """
+        self.remember_ = ttl
+        return self
+
+    @staticmethod
+    def _table_name(table):
+        if not isinstance(table, str) or not table:
+            return None
+        return re.split(r'\s+as\s+', table.strip(), flags=re.IGNORECASE)[0].split()[0]
+
+    def tables(self):
+        """
+        :return: names of the tables read by the query, including joins and sub queries
+        """
+        tables = set()
+        self._collect_tables(tables)
+        return tables
+
+    def _collect_tables(self, tables):
+        for table in chain((self.from_,), (join.table for join in self.joins_)):
+            name = self._table_name(table)
+            if name:
+                tables.add(name)
+        for node in chain(self.wheres_, self.having_, self.unions_,
+                          (where for join in self.joins_ for where in join.wheres_)):
+            query = getattr(node, 'query', None)
+            if isinstance(query, Builder):
+                query._collect_tables(tables)
+
+    def _invalidate(self):
+        name = self._table_name(self.from_)
+        if name:
+            self.connection.invalidate((name,))
+
+    def _remembered(self, sql, bindings, row_format='dict'):
+        """
+        :return: (key, rows), key is None when the query is not cached and rows None on a miss
+        """
+        if self.remember_ is None or self.connection.cache is None:
+            return None, None
+        key = cache_key(sql, bindings, row_format)
+        return key, self.connection.cache.get(key)
+
+    def _remember(self, key, rows, since):
+        # rows read inside a transaction may hold writes that are rolled back
+        if not self.connection.in_transaction():
+            self.connection.cache.put(key, rows, self.remember_, self.tables(), since)
+
     def select(self, *columns):
         self.columns_ = list(columns)
         return self
 
     def select_raw(self, expression, bindings=None):
-        bindings = [] if None else bindings
+        bindings = bindings if bindings else []
 
         self.add_select(Expression(expression))
         if bindings:
@@ -94,12 +283,10 @@ class Builder:
         return self
 
     def add_binding(self, value, stype='where'):
-        if type in self.bindings:
-            raise InvalidArgumentException(f"Invalid binding type: {stype}")
-        if type(value) == list:
-            self.bindings[stype] = self.bindings[stype] + value
+        if type(value) in (list, tuple):
+            self.bindings.extend(value, stype)
         else:
-            self.bindings[stype].append(value)
+            self.bindings.add(value, stype)
 
         return self
 
@@ -107,8 +294,12 @@ class Builder:
     def raw(value):
         return Expression(value)
 
+    @staticmethod
+    def param(name):
+        return Parameter(name)
+
     def add_select(self, *column):
-        self.columns_ = self.columns_ + column
+        self.columns_ = self.columns_ + list(column)
         return self
 
     def distinct(self):
@@ -120,7 +311,7 @@ class Builder:
         return self
 
     def get_bindings(self):
-        return flatten(self.bindings)
+        return self.bindings.to_tuple()
 
     def join(self, table, first, operator=True, second=None, jtype='inner', where=False):
         join_clause = JoinClause(self, jtype, table)
@@ -160,18 +351,14 @@ class Builder:
 
     def merge_wheres(self, wheres, bindings):
         self.wheres_ = self.wheres_ + wheres
-        self.bindings['where'] = self.bindings['where'] + bindings
+        self.bindings.extend(bindings, 'where')
 
     def for_nested_where(self):
         return self.new_query().table(self.from_)
 
     def add_nested_where_query(self, query, boolean):
         if len(query.wheres_) > 0:
-            self.wheres_.append({
-                'type': 'Nested',
-                'query': query,
-                'boolean': boolean
-            })
+            self.wheres_.append(Nested(query, boolean))
             self.add_binding(query.get_bindings())
         return self
 
@@ -213,22 +400,12 @@ class Builder:
     def where_sub(self, column, operator, callback, boolean):
         query = self.for_sub_query()
         callback(query)
-        self.wheres_.append({
-            'type': 'Sub',
-            'column': column,
-            'operator': operator,
-            'query': query,
-            'boolean': boolean
-        })
-        self.add_binding(query.get_bindings, 'where')
+        self.wheres_.append(Sub(column, operator, query, boolean))
+        self.add_binding(query.get_bindings(), 'where')
         return self
 
     def where_null(self, column, boolean='and', not_null=False):
-        self.wheres_.append({
-            'type': 'Not_Null' if not_null else 'Null',
-            'column': column,
-            'boolean': boolean
-        })
+        self.wheres_.append(Null(column, boolean, not_null))
         return self
 
     def or_where_null(self, column):
@@ -257,13 +434,7 @@ class Builder:
         if type(column) == str and column.find('->') != -1 and type(value) == bool:
             value = Expression('true' if value else 'false')
 
-        self.wheres_.append({
-            'type': 'Basic',
-            'column': column,
-            'operator': operator,
-            'value': value,
-            'boolean': boolean
-        })
+        self.wheres_.append(Basic(column, operator, value, boolean))
 
         if not isinstance(value, Expression):
             self.add_binding(value, 'where')
@@ -289,13 +460,7 @@ class Builder:
         if self.invalid_operator(operator):
             second, operator = operator, '='
 
-        self.wheres_.append({
-            'type': 'Column',
-            'first': first,
-            'operator': operator,
-            'second': second,
-            'boolean': boolean
-        })
+        self.wheres_.append(Column(first, operator, second, boolean))
         return self
 
     def or_where_column(self, first, operator=None, second=None):
@@ -310,32 +475,19 @@ class Builder:
 
     def where_raw(self, sql, bindings=None, boolean='and'):
         bindings = bindings if bindings else []
-        self.wheres_.append({
-            'type': 'raw',
-            'sql': sql,
-            'boolean': boolean
-        })
+        self.wheres_.append(Raw(sql, boolean))
         self.add_binding(bindings, 'where')
         return self
 
     def where_in_existing_query(self, column, query, boolean, not_in):
-        self.wheres_.append({
-            'type': 'Not_In_Sub' if not_in else 'In_Sub',
-            'column': column,
-            'query': query,
-            'boolean': boolean
-        })
+        self.wheres_.append(InSub(column, query, boolean, not_in))
         self.add_binding(query.get_bindings(), 'where')
         return self
 
     def where_in_sub(self, column, callback, boolean, not_in):
         query = self.for_sub_query()
-        self.wheres_.append({
-            'type': 'NotInSub' if not_in else 'In_Sub',
-            'column': column,
-            'query': query,
-            'boolean': boolean
-        })
+        callback(query)
+        self.wheres_.append(InSub(column, query, boolean, not_in))
         self.add_binding(query.get_bindings(), 'where')
         return self
 
@@ -349,12 +501,7 @@ class Builder:
         if isfunction(values):
             return self.where_in_sub(column, values, boolean, not_in)
 
-        self.wheres_.append({
-            'type': 'Not_In' if not_in else 'In',
-            'column': column,
-            'values': values,
-            'boolean': boolean
-        })
+        self.wheres_.append(In(column, values, boolean, not_in))
         for value in values:
             if not isinstance(value, Expression):
                 self.add_binding(value, 'where')
@@ -371,12 +518,7 @@ class Builder:
         return self.where_not_in(column, values, 'or')
 
     def where_between(self, column, values, boolean='and', not_bt=False):
-        self.wheres_.append({
-            'type': 'between',
-            'column': column,
-            'boolean': boolean,
-            'not': not_bt
-        })
+        self.wheres_.append(Between(column, boolean, not_bt))
         self.add_binding(values, 'where')
         return self
 
@@ -404,11 +546,7 @@ class Builder:
         return self.where_not_exists(callback, True)
 
     def add_where_exists_query(self, query, boolean='and', not_ext=False):
-        self.wheres_.append({
-            'type': 'NotExists' if not_ext else 'Exists',
-            'query': query,
-            'boolean': boolean,
-        })
+        self.wheres_.append(Exists(query, boolean, not_ext))
         self.add_binding(query.get_bindings(), 'where')
         return self
 
@@ -426,16 +564,10 @@ class Builder:
         if self.invalid_operator(operator):
             value, operator = operator, '='
 
-        self.having_.append({
-            'type': 'Basic',
-            'column': column,
-            'operator': operator,
-            'value': value,
-            'boolean': boolean
-        })
+        self.having_.append(Basic(column, operator, value, boolean))
 
         if not isinstance(value, Expression):
-            self.add_binding(value, 'where')
+            self.add_binding(value, 'having')
 
         return self
 
@@ -444,11 +576,7 @@ class Builder:
 
     def having_raw(self, sql, bindings, boolean='and'):
         bindings = bindings if bindings else []
-        self.having_.append({
-            'type': 'Raw',
-            'sql': sql,
-            'boolean': boolean
-        })
+        self.having_.append(Raw(sql, boolean))
         self.add_binding(bindings, 'having')
         return self
 
@@ -457,10 +585,7 @@ class Builder:
         return self.having_raw(sql, bindings, 'or')
 
     def order_by(self, column, direct='asc'):
-        item = {
-            'column': column,
-            'direction': 'asc' if direct.lower() == 'asc' else 'desc'
-        }
+        item = Order(column, 'asc' if direct.lower() == 'asc' else 'desc')
         if len(self.unions_) > 0:
             self.union_orders.append(item)
         else:
@@ -499,17 +624,167 @@ class Builder:
     def for_page(self, page, per_page=15):
         return self.skip((page - 1) * per_page).take(per_page)
 
+    def for_page_after_id(self, per_page=15, last_id=None, column='id'):
+        """
+        Constrain the query to the next page after last_id, seeking on column
+        instead of skipping rows with an offset.
+        """
+        self._nest_or_wheres()
+        if last_id is not None:
+            self.where(column, '>', last_id)
+
+        self.orders_ = [order for order in self.orders_ if order.column != column]
+        self.orders_.insert(0, Order(column, 'asc'))
+        return self.take(per_page)
+
+    def _nest_or_wheres(self):
+        # keep "a or b" from swallowing a predicate and-ed on afterwards
+        if any(where.boolean == 'or' for where in self.wheres_):
+            nested = self.for_nested_where()
+            nested.wheres_ = self.wheres_
+            self.wheres_ = [Nested(nested, 'and')]
+        return self
+
+    def cursor_paginate(self, per_page=15, cursor=None, columns=None):
+        """
+        Keyset pagination over the query's order by columns. The cursor encodes
+        the order values of the row at the page boundary, so every page is a
+        seek and no count query is issued.
+        :param per_page:
+        :param cursor: next_cursor or prev_cursor of a previous page
+        :param columns:
+        :return: CursorPaginator
+        """
+        query, keys, direction = self._cursor_page_query(cursor)
+        results = query.take(per_page + 1).get(columns)
+        return self._cursor_page(results, per_page, keys, direction, cursor)
+
+    def _cursor_page_query(self, cursor):
+        if not self.orders_:
+            raise InvalidArgumentException('An order by clause is required for cursor pagination.')
+        for order in self.orders_:
+            if isinstance(order.column, Expression):
+                raise InvalidArgumentException('Cursor pagination can not order by raw expressions.')
+
+        keys = [order.column.split('.')[-1] for order in self.orders_]
+        query = self.clone()
+        direction = 'next'
+        if cursor:
+            values, direction = decode_cursor(cursor)
+            if len(values) != len(keys):
+                raise InvalidArgumentException('Cursor does not match the query order.')
+            query._nest_or_wheres().where_seek(self.orders_, values, direction == 'prev')
+
+        if direction == 'prev':
+            query.orders_ = [Order(o.column, 'desc' if o.direction == 'asc' else 'asc') for o in self.orders_]
+        return query, keys, direction
+
+    @staticmethod
+    def _cursor_page(results, per_page, keys, direction, cursor):
+        has_more = len(results) > per_page
+        items = results[:per_page]
+        if direction == 'prev':
+            items.reverse()
+        if not items:
+            return CursorPaginator(items, per_page)
+
+        next_cursor = prev_cursor = None
+        if direction == 'prev' or has_more:
+            next_cursor = encode_cursor([items[-1][k] for k in keys], 'next')
+        if cursor and (direction == 'next' or has_more):
+            prev_cursor = encode_cursor([items[0][k] for k in keys], 'prev')
+        return CursorPaginator(items, per_page, next_cursor, prev_cursor)
+
+    def where_seek(self, orders, values, backwards=False):
+        """
+        Add the predicate selecting the rows after values in the given order,
+        or before them when backwards.
+        """
+        columns = [order.column for order in orders]
+        operators = ['>' if (order.direction == 'asc') != backwards else '<' for order in orders]
+
+        if self.grammar.supports_row_values and len(set(operators)) == 1:
+            sql = '({}) {} ({})'.format(self.grammar.columnize(columns), operators[0],
+                                        self.grammar.parameterize(values))
+            return self.where_raw(sql, list(values))
+
+        def seek(query):
+            for i in range(len(columns)):
+                def term(q, i=i):
+                    for j in range(i):
+                        q.where(columns[j], '=', values[j])
+                    q.where(columns[i], operators[i], values[i])
+                query.where_nested(term, 'or')
+
+        return self.where_nested(seek)
+
+    def _pages(self, count):
+        if not self.orders_:
+            raise InvalidArgumentException('An order by clause is required to page through results.')
+        page = 1
+        while True:
+            results = self.clone().for_page(page, count).get()
+            if results:
+                yield results
+            if len(results) < count:
+                return
+            page += 1
+
+    def _pages_by_id(self, count, column='id', alias=None):
+        alias = alias if alias else column.split('.')[-1]
+        last_id = None
+        while True:
+            results = self.clone().for_page_after_id(count, last_id, column).get()
+            if results:
+                yield results
+            if len(results) < count:
+                return
+            last_id = results[-1][alias]
+
+    def chunk(self, count, callback):
+        """
+        Pass the results to callback count rows at a time, using offset pages.
+        Returning False from callback stops the iteration.
+        :param count:
+        :param callback: fn(rows, page)
+        :return: False when callback stopped early
+        """
+        for page, results in enumerate(self._pages(count), 1):
+            if callback(results, page) is False:
+                return False
+        return True
+
+    def chunk_by_id(self, count, callback, column='id', alias=None):
+        """
+        Like chunk, but seeks on an increasing column (where id > last order by id)
+        so every batch costs the same however deep into the table it is.
+        :param count:
+        :param callback: fn(rows, page)
+        :param column: key column, may be qualified with the table
+        :param alias: key of column in the result rows, defaults to the unqualified column
+        :return: False when callback stopped early
+        """
+        for page, results in enumerate(self._pages_by_id(count, column, alias), 1):
+            if callback(results, page) is False:
+                return False
+        return True
+
+    def lazy(self, count=1000):
+        for results in self._pages(count):
+            yield from results
+
+    def lazy_by_id(self, count=1000, column='id', alias=None):
+        for results in self._pages_by_id(count, column, alias):
+            yield from results
+
     def union(self, query, all_union=False):
         union_query = query
         if isfunction(query):
             union_query = self.new_query()
             query(union_query)
 
-        self.unions_.append({
-            'query': union_query,
-            'all': all_union
-        })
-        self.add_binding(query.get_bindings(), 'union')
+        self.unions_.append(Union(union_query, all_union))
+        self.add_binding(union_query.get_bindings(), 'union')
         return self
 
     def union_all(self, query):
@@ -518,9 +793,9 @@ class Builder:
     def to_sql(self):
         return self.grammar.compile_select(self)
 
-    def first(self, columns=None):
+    def first(self, columns=None, row_format='dict'):
         columns = ['*'] if columns is None else columns
-        return self.take(1).get(columns)
+        return self.take(1).get(columns, row_format)
 
     def find(self, qid, columns):
         columns = ['*'] if len(columns) == 0 else columns
@@ -544,24 +819,28 @@ class Builder:
 
     def aggregate(self, fn, columns):
         columns = columns if columns else ['*']
+        results = self._aggregate_query(fn, columns).get(columns)
+        return self._aggregate_result(results)
+
+    def _aggregate_query(self, fn, columns):
         clone = copy.copy(self)
         clone.columns_ = []
-        clone.bindings['select'] = []
-        clone.set_aggregate(fn, columns)
-        results = clone.get(columns)
+        clone.bindings = self.bindings.copy()
+        clone.bindings.clear('select')
+        return clone.set_aggregate(fn, columns)
+
+    @staticmethod
+    def _aggregate_result(results):
         if results:
             return results[0]['aggregate']
 
         return None
 
     def set_aggregate(self, fn, columns):
-        self.aggregate_ = {
-            'function': fn,
-            'columns': columns
-        }
+        self.aggregate_ = Aggregate(fn, columns)
         if self.groups_:
             self.orders_ = []
-            self.bindings['order'] = []
+            self.bindings.clear('order')
         return self
 
     def when(self, value, callback, default=None):
@@ -573,32 +852,88 @@ class Builder:
 
         return ret if ret else self
 
-    def get(self, columns=None):
-        if columns is None:
-            columns = ['*']
+    def get(self, columns=None, row_format='dict'):
+        """
+        :param columns:
+        :param row_format: dict, tuple, namedtuple, slots (a generated __slots__ class
+            per result shape) or columnar (a dict of column lists)
+        :return:
+        """
+        return self.run_select(*self._compile_get(columns), row_format)
+
+    @hooked
+    def _compile_get(self, columns=None):
         original = self.columns_
         if not original:
-            self.columns_ = columns
+            self.columns_ = columns if columns else ['*']
 
-        result = self.run_select()
+        sql = self.to_sql()
         self.columns_ = original
-        return result
+        return sql, self.get_bindings()
 
-    def run_select(self):
-        sql = self.to_sql()
-        bindings = self.get_bindings()
-        print({
-            'sql': sql,
-            'bindings': bindings
-        })
-        return self.connection.select(sql, bindings)
+    def prepare(self, columns=None):
+        sql, bindings = self._compile_get(columns)
+        forget_event()
+        return PreparedQuery(self.connection, sql, bindings)
+
+    def cursor(self, batch_size=1000, columns=None):
+        """
+        Stream the results through a server-side cursor, fetching batch_size rows
+        at a time so memory stays flat whatever the size of the result.
+        :param batch_size:
+        :param columns:
+        :return: generator of rows
+        """
+        sql, bindings = self._compile_get(columns)
+        return self.connection.cursor(sql, bindings, batch_size, self.use_primary_)
+
+    def to_numpy(self, columns=None, batch_size=10000):
+        """
+        Fetch the results batch_size rows at a time into typed numpy arrays, using
+        the column types the driver reports. Needs numpy.
+        :return: dict of column name to array
+        """
+        return to_numpy(*self._fetch_batches(columns, batch_size))
+
+    def to_arrow(self, columns=None, batch_size=10000):
+        """
+        Same as to_numpy, building a pyarrow.Table. Needs pyarrow.
+        """
+        return to_arrow(*self._fetch_batches(columns, batch_size))
+
+    def _fetch_batches(self, columns, batch_size):
+        sql, bindings = self._compile_get(columns)
+        return self.connection.fetch_batches(sql, bindings, batch_size, self.use_primary_)
+
+    def run_select(self, sql, bindings, row_format='dict'):
+        key, rows = self._remembered(sql, bindings, row_format)
+        if rows is not None:
+            forget_event()
+            return rows
+        since = time.time()
+        rows = self.connection.select(sql, bindings, self.use_primary_, row_format)
+        if key is not None:
+            self._remember(key, rows, since)
+        return rows
 
     @staticmethod
     def _clean_bindings(bindings):
-        return list(filter(lambda x: not isinstance(x, Expression), bindings))
+        return tuple(x for x in bindings if not isinstance(x, Expression))
+
+    @staticmethod
+    def _insert_bindings(records):
+        return tuple(v for record in records for v in record.values() if not isinstance(v, Expression))
 
     def exists(self):
-        results = self.connection.select(self.grammar.compile_exists(self), self.bindings)
+        results = self.connection.select(*self._compile_exists(), self.use_primary_)
+        return self._exists_result(results)
+
+    @hooked
+    def _compile_exists(self):
+        return self.grammar.compile_exists(self), self.get_bindings()
+
+    @staticmethod
+    def _exists_result(results):
         if results:
             return bool(results[0]['exists'])
         return False
@@ -606,6 +941,12 @@ class Builder:
     def insert(self, values):
         if not values:
             return True
+        result = self.connection.insert(*self._compile_insert(values))
+        self._invalidate()
+        return result
+
+    @hooked
+    def _compile_insert(self, values):
         target = []
         if type(values) == dict:
             target.append(values)
@@ -614,31 +955,295 @@ class Builder:
                 if type(it) != dict:
                     raise InvalidArgumentException(it, 'must be dict')
                 target.append(dict(sorted(it.items())))
-        return self.connection.insert(self.grammar.compile_insert(self, target), self._clean_bindings(flatten(target)))
+        return self.grammar.compile_insert(self, target), self._insert_bindings(target)
 
     def insert_get_id(self, values, sequence=None):
+        result = self.connection.insert(*self._compile_insert_get_id(values, sequence))
+        self._invalidate()
+        return result
+
+    @hooked
+    def _compile_insert_get_id(self, values, sequence=None):
         sql = self.grammar.compile_insert_get_id(self, values, sequence)
-        values = self._clean_bindings(flatten(values))
-        return self.connection.insert(sql, values)
+        return sql, self._insert_bindings(values if type(values) == list else [values])
+
+    def insert_many(self, rows, chunk_size=None, use_executemany=False, transaction=False):
+        """
+        Insert rows streamed from any iterable of dicts, in chunks that stay under
+        the driver's placeholder and packet limits.
+        :param rows: iterable of dicts sharing the keys of the first row
+        :param chunk_size: upper bound of rows per statement
+        :param use_executemany: send a single-row insert through executemany per chunk
+        :param transaction: insert every chunk inside one transaction
+        :return: number of inserted rows
+        """
+        if transaction:
+            self.connection.start_transaction()
+        try:
+            total = 0
+            for sql, bindings in self._insert_chunks(rows, chunk_size, use_executemany):
+                if use_executemany:
+                    total += self.connection.statement_many(sql, bindings)
+                else:
+                    total += self.connection.effecting_statement(sql, bindings)
+        except Exception:
+            if transaction:
+                self.connection.rollback()
+            raise
+        finally:
+            self._invalidate()
+        if transaction:
+            self.connection.commit()
+        return total
+
+    def _insert_chunks(self, rows, chunk_size, use_executemany=False):
+        for records in self._record_chunks(rows, chunk_size):
+            yield self._compile_insert_chunk(records, use_executemany)
+
+    def _record_chunks(self, rows, chunk_size, parameters_per_row=None, reserved=0):
+        """
+        Split rows into lists of records with sorted keys, each under the driver's
+        placeholder and packet limits.
+        :param parameters_per_row: placeholders a row takes, its number of columns by default
+        :param reserved: placeholders the statement takes besides the rows
+        """
+        iterator = iter(rows)
+        first = next(iterator, None)
+        if first is None:
+            return
+        if type(first) != dict:
+            raise InvalidArgumentException(first, 'must be dict')
+
+        keys = first.keys()
+        columns = sorted(keys)
+        max_parameters, max_packet_size = self.connection.insert_limits()
+        max_rows = max(1, (max_parameters - reserved) // (parameters_per_row or len(columns)))
+        if chunk_size:
+            max_rows = min(max_rows, chunk_size)
+        # leave room for the statement text and protocol overhead
+        budget = max_packet_size * 3 // 4 if max_packet_size else 0
+
+        chunk, size = [], 0
+        for row in chain((first,), iterator):
+            if type(row) != dict:
+                raise InvalidArgumentException(row, 'must be dict')
+            if row.keys() != keys:
+                raise InvalidArgumentException(row, 'must have the same keys as the first row')
+            record = {column: row[column] for column in columns}
+            row_size = self._estimate_row_size(record) if budget else 0
+            if chunk and (len(chunk) >= max_rows or (budget and size + row_size > budget)):
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(record)
+            size += row_size
+
+        if chunk:
+            yield chunk
+
+    def _compile_insert_chunk(self, records, use_executemany):
+        if use_executemany:
+            sql = self.grammar.compile_insert(self, records[:1])
+            return sql, [self._insert_bindings((record,)) for record in records]
+        return self.grammar.compile_insert(self, records), self._insert_bindings(records)
+
+    @staticmethod
+    def _estimate_row_size(record):
+        size = 0
+        for value in record.values():
+            size += len(value) + 4 if type(value) in (str, bytes) else 12
+        return size
+
+    def copy_from(self, rows, columns=None, binary=False, types=None):
+        """
+        Bulk load rows into the table with COPY, streaming them from the iterable.
+        :param rows: iterable of dicts or of sequences ordered like columns
+        :param columns: target columns, taken from the first dict row when omitted
+        :param binary: use the binary copy format, types should then name the column types
+        :param types: column type names passed to psycopg's Copy.set_types
+        :return: number of copied rows
+        """
+        sql, records = self._compile_copy_from(rows, columns, binary)
+        if sql is None:
+            return 0
+        try:
+            return self.connection.copy_from(sql, records, types)
+        finally:
+            self._invalidate()
+
+    def _compile_copy_from(self, rows, columns, binary):
+        """
+        :return: (sql, generator of row tuples), sql is None when there are no rows
+        """
+        iterator = iter(rows)
+        first = next(iterator, None)
+        if first is None:
+            return None, ()
+        if columns is None:
+            if type(first) != dict:
+                raise InvalidArgumentException('columns are required when rows are not dicts')
+            columns = list(first.keys())
+
+        def records():
+            for row in chain((first,), iterator):
+                yield tuple(row[column] for column in columns) if type(row) == dict else row
+
+        return self.grammar.compile_copy_from(self, columns, binary), records()
 
     def update(self, values):
+        result = self.connection.update(*self._compile_update(values))
+        self._invalidate()
+        return result
+
+    @hooked
+    def _compile_update(self, values):
         sql = self.grammar.compile_update(self, values)
-        return self.connection.update(sql, self.grammar.prepare_bindings_for_update(self.bindings, values))
+        return sql, self.grammar.prepare_bindings_for_update(self.bindings, values)
 
     def update_or_insert(self, attributes, values):
         if not self.where(attributes).exists():
             return self.insert({**attributes, **values})
         return self.take(1).update(values)
 
+    def update_batch(self, rows, key='id', types=None, chunk_size=None):
+        """
+        Update many rows, each to its own values, in one statement per chunk.
+        :param rows: iterable of dicts holding key and the columns to set, sharing the keys of the first row
+        :param key: column matching the records to the rows, usually the primary key
+        :param types: postgres only, column => sql type cast in the values list
+        :param chunk_size: upper bound of rows per statement
+        :return: affected rows as counted by the server, mysql leaves out the rows already holding the values
+        """
+        try:
+            total = 0
+            for records in self._update_batch_chunks(rows, chunk_size):
+                total += self.connection.effecting_statement(*self._compile_update_batch(records, key, types))
+        finally:
+            self._invalidate()
+        return total
+
+    def _update_batch_chunks(self, rows, chunk_size):
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return ()
+        # a case expression takes the key and the value of every row for each column
+        return self._record_chunks(chain((first,), rows), chunk_size, max(1, 2 * len(first) - 1),
+                                   len(self.bindings['where']))
+
+    @hooked
+    def _compile_update_batch(self, records, key, types=None):
+        if key not in records[0] or len(records[0]) < 2:
+            raise InvalidArgumentException(records[0], f'must hold {key} and a column to update')
+        sql = self.grammar.compile_update_batch(self, records, key, types)
+        return sql, self.grammar.prepare_bindings_for_update_batch(self.bindings, records, key)
+
+    def upsert(self, rows, unique_by, update=None, chunk_size=None):
+        """
+        Insert rows and update the ones colliding on a unique key, in one statement
+        per chunk instead of the exists and write round trips of update_or_insert.
+        :param rows: dict or iterable of dicts sharing the keys of the first row
+        :param unique_by: column or columns of the unique key, mysql uses every unique key of the table;
+            of the rows of a chunk sharing these values only the last one is written
+        :param update: columns overwritten on a collision, by default every column not in unique_by;
+            an empty list leaves the existing rows untouched
+        :param chunk_size: upper bound of rows per statement
+        :return: affected rows as counted by the server, mysql counts an updated row twice
+        """
+        unique_by = [unique_by] if type(unique_by) == str else list(unique_by)
+        try:
+            total = 0
+            for records in self._upsert_chunks(rows, unique_by, chunk_size):
+                total += self.connection.effecting_statement(*self._compile_upsert(records, unique_by, update))
+        finally:
+            self._invalidate()
+        return total
+
+    def _upsert_chunks(self, rows, unique_by, chunk_size):
+        """
+        Chunk the rows like _record_chunks, keeping the last of the rows of a chunk that share
+        their unique_by values: postgres refuses to update a row twice in one statement.
+        """
+        if not unique_by:
+            raise InvalidArgumentException(unique_by, 'must name at least one column')
+        rows = [rows] if type(rows) == dict else rows
+        for records in self._record_chunks(rows, chunk_size):
+            if any(column not in records[0] for column in unique_by):
+                raise InvalidArgumentException(unique_by, 'must be columns of the rows')
+            unique = {}
+            for record in records:
+                unique[tuple(record[column] for column in unique_by)] = record
+            yield list(unique.values())
+
+    @hooked
+    def _compile_upsert(self, records, unique_by, update=None):
+        if update is None:
+            update = [column for column in records[0] if column not in unique_by]
+        return self.grammar.compile_upsert(self, records, unique_by, update), self._insert_bindings(records)
+
     def delete(self, primary_key=''):
+        result = self.connection.delete(*self._compile_delete(primary_key))
+        self._invalidate()
+        return result
+
+    def delete_in_batches(self, batch_size=1000, pause=None, progress=None, key='id'):
+        """
+        Delete the matching rows batch_size at a time, each batch in its own transaction,
+        so no transaction holds its locks, or writes its share of binlog/wal, for long.
+        Every batch commits: do not call it inside a transaction of your own.
+        A short batch does not mean the end, on postgres a concurrent update moves a row
+        away from the ctid selected for it, so it stops at the first batch deleting nothing.
+        :param batch_size: rows deleted per statement
+        :param pause: seconds to sleep between batches, giving replicas time to catch up
+        :param progress: called with the number of rows deleted so far after every batch
+        :param key: column the batches follow when the query has no order_by, None for any order
+        :return: number of deleted rows
+        """
+        sql, bindings = self._compile_delete_batch(batch_size, key)
+        total = 0
+        try:
+            while True:
+                self.connection.start_transaction()
+                try:
+                    deleted = self.connection.delete(sql, bindings)
+                except Exception:
+                    self.connection.rollback()
+                    raise
+                self.connection.commit()
+                if not deleted:
+                    return total
+                total += deleted
+                if progress:
+                    progress(total)
+                if pause:
+                    time.sleep(pause)
+        finally:
+            self._invalidate()
+
+    @hooked
+    def _compile_delete_batch(self, batch_size, key='id'):
+        if self.joins_:
+            raise InvalidArgumentException(self.joins_, 'a batched delete can not have joins')
+        query = self.clone().limit(batch_size)
+        if key and not query.orders_:
+            query.order_by(key)
+        return self.grammar.compile_delete_batch(query), self.grammar.prepare_binding_for_delete(query.bindings)
+
+    def truncate(self):
+        for sql, bindings in self.grammar.compile_truncate(self).items():
+            self.connection.statement(sql, bindings)
+        self._invalidate()
+
+    @hooked
+    def _compile_delete(self, primary_key=''):
         if primary_key:
             self.where(self.from_ + '.id', '=', primary_key)
 
-        return self.connection.delete(self.grammar.compile_delete(self),
-                                      self._clean_bindings(self.grammar.prepare_binding_for_delete(self.bindings)))
+        return self.grammar.compile_delete(self), self.grammar.prepare_binding_for_delete(self.bindings)
 
 
 class JoinClause(Builder):
+    __slots__ = ('parent_query', 'type', 'table')
+
     def __init__(self, parent, join_type, table):
         self.parent_query = parent
         self.type = join_type
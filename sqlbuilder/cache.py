@@ -0,0 +1,335 @@
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from .rows import pack, unpack
+
+logger = logging.getLogger('sqlbuilder.cache')
+
+
+def cache_key(sql, bindings, row_format='dict'):
+    return hashlib.blake2b(repr((sql, tuple(bindings), row_format)).encode(), digest_size=16).hexdigest()
+
+
+class CacheStore:
+    """
+    Backend of Builder.remember. Entries carry the tables they were read from as
+    tags and the time their query started; an entry is stale once any of its tags
+    was invalidated at or after that time, which also covers a write racing the
+    read that fills the entry.
+    """
+
+    def get(self, key):
+        """
+        :return: the cached rows, None on a miss
+        """
+        pass
+
+    def put(self, key, rows, ttl, tags, since):
+        """
+        :param ttl: seconds the entry lives, None for no expiry
+        :param tags: tables the query read
+        :param since: time.time() taken before the query ran
+        """
+        pass
+
+    def invalidate_tags(self, tags):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryCacheStore(CacheStore):
+    """
+    Per-process lru store. Rows are kept packed and rebuilt on the way out, so
+    callers can modify what they get without touching the cache.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.invalidated = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _stale(self, tags, since):
+        return any(self.invalidated.get(tag, 0) >= since for tag in tags)
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            packed, expires, tags, since = entry
+            if (expires is not None and expires <= now) or self._stale(tags, since):
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return unpack(*packed)
+
+    def put(self, key, rows, ttl, tags, since):
+        expires = None if ttl is None else time.time() + ttl
+        with self.lock:
+            if self._stale(tags, since):
+                return
+            self.entries[key] = (pack(rows), expires, frozenset(tags), since)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_tags(self, tags):
+        now = time.time()
+        with self.lock:
+            for tag in tags:
+                self.invalidated[tag] = now
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self.entries),
+                'max_entries': self.max_entries,
+            }
+
+
+def dump_rows(rows, compress_above=4096):
+    """
+    Serialize rows compactly: the column names are stored once plus a tuple of
+    values per row, whatever the row format, and large payloads are compressed.
+    """
+    data = pickle.dumps(pack(rows), pickle.HIGHEST_PROTOCOL)
+    if len(data) > compress_above:
+        return b'z' + zlib.compress(data, 1)
+    return b'p' + data
+
+
+def load_rows(data):
+    data = bytes(data)
+    payload = zlib.decompress(data[1:]) if data[:1] == b'z' else data[1:]
+    return unpack(*pickle.loads(payload))
+
+
+class SqliteCacheStore(CacheStore):
+    """
+    Store in a local SQLite file in WAL mode, shared by every process that opens
+    the same path, such as the workers of a prefork server. Entries are evicted
+    least recently used first once the payloads exceed max_bytes. The file holds
+    pickled rows, so it must only be writable by the application.
+    """
+
+    schema = (
+        'create table if not exists entries (key text primary key, data blob not null, size integer not null, '
+        'expires real, since real not null, tags text not null, used real not null)',
+        'create index if not exists entries_used on entries (used)',
+        'create table if not exists tags (tag text primary key, invalidated real not null)',
+        'create table if not exists meta (id integer primary key check (id = 0), bytes integer not null)',
+        'insert or ignore into meta values (0, 0)',
+        'create trigger if not exists entries_insert after insert on entries '
+        'begin update meta set bytes = bytes + new.size; end',
+        'create trigger if not exists entries_update after update of size on entries '
+        'begin update meta set bytes = bytes + new.size - old.size; end',
+        'create trigger if not exists entries_delete after delete on entries '
+        'begin update meta set bytes = bytes - old.size; end',
+    )
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, timeout=5.0, touch_interval=1.0):
+        """
+        :param path: database file, created when missing
+        :param max_bytes: bound on the total size of the serialized rows
+        :param timeout: seconds to wait for another process holding the write lock
+        :param touch_interval: seconds between recency updates of a hot entry, so hits rarely write
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.touch_interval = touch_interval
+        self.local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # invalidations the file did not take (busy or locked), applied in this process
+        # right away and written on the next access that gets through
+        self.pending = {}
+        self.cleared = None
+        self.pending_lock = threading.Lock()
+        db = self._db()
+        db.execute('begin immediate')
+        try:
+            for statement in self.schema:
+                db.execute(statement)
+            db.execute('commit')
+        except sqlite3.Error:
+            db.execute('rollback')
+            raise
+
+    def _db(self):
+        # sqlite connections can not cross threads, nor survive a fork
+        db = getattr(self.local, 'db', None)
+        if db is None or self.local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute('pragma journal_mode=wal')
+            db.execute('pragma synchronous=normal')
+            self.local.db = db
+            self.local.pid = os.getpid()
+        return db
+
+    @staticmethod
+    def _tags(tags):
+        return '\x1f'.join(sorted(tags))
+
+    def _invalidated(self, db, tags, since):
+        if self.cleared is not None and self.cleared >= since:
+            return True
+        if not tags:
+            return False
+        names = tags.split('\x1f')
+        if self.pending:
+            with self.pending_lock:
+                if any(self.pending.get(name, 0) >= since for name in names):
+                    return True
+        invalidated = db.execute(f"select max(invalidated) from tags where tag in ({', '.join('?' * len(names))})",
+                                 names).fetchone()[0]
+        return invalidated is not None and invalidated >= since
+
+    def get(self, key):
+        now = time.time()
+        try:
+            db = self._db()
+            try:
+                self._flush(db)
+            except sqlite3.Error:
+                # still locked, the pending invalidations are checked in memory
+                pass
+            row = db.execute('select data, expires, since, tags, used from entries where key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            data, expires, since, tags, used = row
+            stale = expires is not None and expires <= now
+            if not stale:
+                stale = self._invalidated(db, tags, since)
+            if stale:
+                db.execute('delete from entries where key = ? and since = ?', (key, since))
+                self.misses += 1
+                return None
+            if now - used >= self.touch_interval:
+                db.execute('update entries set used = ? where key = ?', (now, key))
+            rows = load_rows(data)
+        except sqlite3.Error:
+            # a busy or broken cache only costs the query
+            self.misses += 1
+            return None
+        self.hits += 1
+        return rows
+
+    def put(self, key, rows, ttl, tags, since):
+        now = time.time()
+        data = dump_rows(rows)
+        if len(data) > self.max_bytes:
+            return
+        tags = self._tags(tags)
+        try:
+            db = self._db()
+            self._flush(db)
+            db.execute('begin immediate')
+            try:
+                if self._invalidated(db, tags, since):
+                    db.execute('rollback')
+                    return
+                db.execute('insert into entries (key, data, size, expires, since, tags, used) '
+                           'values (?, ?, ?, ?, ?, ?, ?) on conflict (key) do update set data = excluded.data, '
+                           'size = excluded.size, expires = excluded.expires, since = excluded.since, '
+                           'tags = excluded.tags, used = excluded.used',
+                           (key, data, len(data), None if ttl is None else now + ttl, since, tags, now))
+                self._evict(db, now)
+                db.execute('commit')
+            except BaseException:
+                db.execute('rollback')
+                raise
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, db, now):
+        excess = db.execute('select bytes from meta').fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        expired = db.execute('delete from entries where expires <= ?', (now,)).rowcount
+        self.evictions += expired
+        if expired:
+            excess = db.execute('select bytes from meta').fetchone()[0] - self.max_bytes
+        keys = []
+        for key, size in db.execute('select key, size from entries order by used'):
+            if excess <= 0:
+                break
+            keys.append((key,))
+            excess -= size
+        db.executemany('delete from entries where key = ?', keys)
+        self.evictions += len(keys)
+
+    def invalidate_tags(self, tags):
+        # runs after the database write succeeded, so a busy cache must not raise
+        now = time.time()
+        with self.pending_lock:
+            for tag in tags:
+                self.pending[tag] = now
+        try:
+            self._flush(self._db())
+        except sqlite3.Error as e:
+            logger.warning('cache invalidation of %s deferred: %s', ', '.join(tags), e)
+
+    def clear(self):
+        with self.pending_lock:
+            self.cleared = time.time()
+        try:
+            self._flush(self._db())
+        except sqlite3.Error as e:
+            logger.warning('cache clear deferred: %s', e)
+
+    def _flush(self, db):
+        if not self.pending and self.cleared is None:
+            return
+        with self.pending_lock:
+            pending = list(self.pending.items())
+            cleared = self.cleared
+        if cleared is not None:
+            db.execute('delete from entries where since <= ?', (cleared,))
+        db.executemany('insert into tags (tag, invalidated) values (?, ?) '
+                       'on conflict (tag) do update set invalidated = max(invalidated, excluded.invalidated)',
+                       pending)
+        with self.pending_lock:
+            for tag, invalidated in pending:
+                if self.pending.get(tag) == invalidated:
+                    del self.pending[tag]
+            if self.cleared == cleared:
+                self.cleared = None
+
+    def stats(self):
+        db = self._db()
+        size, count = db.execute('select bytes, (select count(*) from entries) from meta').fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': count,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+        }
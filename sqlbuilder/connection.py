@@ -1,7 +1,14 @@
+import threading
 import time
-from .builder import Builder
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from contextvars import ContextVar, copy_context
+from .builder import Builder, InvalidArgumentException
 from .grammar import Grammar
 from .driver import DriverBase
+from .querylog import QueryLog
+from .querystats import QueryStats
+from .hooks import Hooks, forget_event
+from .rows import format_args, row_count
 
 
 class QueryException(Exception):
@@ -12,8 +19,14 @@ class Connection:
     def __init__(self, driver: DriverBase, table_prefix=''):
         self.driver = driver
         self.table_prefix = table_prefix
-        self.enable_query_log_ = False
-        self.log_stock = []
+        self.query_log = None
+        self.query_stats = None
+        self.hooks = None
+        self.cache = None
+        self.written_tables = set()
+        # set between start_transaction and commit/rollback, per thread or task
+        self.transaction_open = ContextVar(f'sqlbuilder_transaction_{id(self)}', default=False)
+        self.query_grammar = self.get_grammar()
 
     def table(self, table):
         return self.new_query().table(table)
@@ -21,6 +34,37 @@ class Connection:
     def get_grammar(self):
         return Grammar(self.table_prefix)
 
+    def set_cache(self, store):
+        """
+        :param store: CacheStore backing Builder.remember, None turns result caching off
+        """
+        self.cache = store
+        return self
+
+    def invalidate(self, tables):
+        """
+        Drop the cached results read from tables. They are dropped again on commit
+        or rollback, since a read between the write and the end of the transaction
+        may cache the old rows, or rows that are never committed.
+        """
+        if self.cache is None:
+            return
+        self.cache.invalidate_tags(tables)
+        self.written_tables.update(tables)
+
+    def in_transaction(self):
+        """
+        :return: whether this thread or task started a transaction it has not ended yet;
+            Builder.remember does not cache what it reads there
+        """
+        return self.transaction_open.get()
+
+    def _ended(self):
+        self.transaction_open.set(False)
+        if self.cache is not None and self.written_tables:
+            tables, self.written_tables = self.written_tables, set()
+            self.cache.invalidate_tags(tables)
+
     def statement(self, query, bindings):
         def fn(sql, binder):
             return self.driver.statement(sql, binder)
@@ -28,18 +72,92 @@ class Connection:
         return self.run(query, bindings, fn)
 
     def new_query(self):
-        return Builder(self, self.get_grammar())
+        return Builder(self, self.query_grammar)
+
+    def select(self, query, bindings, use_primary=False, row_format='dict'):
+        bindings = bindings if bindings else ()
+
+        def fn(sql, binder):
+            return self.driver.fetch_all(sql, binder, *format_args(row_format))
+
+        return self.run(query, bindings, fn)
+
+    def cursor(self, query, bindings, batch_size=1000, use_primary=False):
+        bindings = bindings if bindings else ()
 
-    def select(self, query, bindings):
-        bindings = bindings if bindings else []
+        def fn(sql, binder):
+            return self.driver.cursor(sql, binder, batch_size)
+
+        return self.run(query, bindings, fn)
+
+    def fetch_batches(self, query, bindings, batch_size=10000, use_primary=False):
+        """
+        :return: ([(name, kind)], generator of lists of row tuples), see driver.fetch_batches
+        """
+        bindings = bindings if bindings else ()
 
         def fn(sql, binder):
-            return self.driver.fetch_all(sql, binder)
+            return self.driver.fetch_batches(sql, binder, batch_size)
 
         return self.run(query, bindings, fn)
 
+    def gather(self, builders, timeout=None, max_concurrency=None):
+        """
+        Run the select of every builder and return the results in the same order.
+        The builders are compiled up front; the queries run concurrently when the
+        driver is thread safe (a pooled connection) and one after another otherwise.
+        Each query runs in a copy of the context it was compiled in, so hooks see its builder.
+        :param builders:
+        :param timeout: seconds a query may run once started, needs a thread safe driver
+        :param max_concurrency: cap on queries in flight, defaults to one per builder
+        :return:
+        """
+        if timeout is not None and not self.driver.thread_safe:
+            raise InvalidArgumentException(timeout, 'needs a thread safe driver, such as a pooled connection')
+        queries = [self._gathered(builder) for builder in builders]
+        workers = min(len(queries), max_concurrency or len(queries))
+        if not queries or not self.driver.thread_safe:
+            return [context.run(self.select, *query) for context, *query in queries]
+
+        started = [threading.Event() for _ in queries]
+        start_times = [0.0] * len(queries)
+
+        def task(i, sql, bindings, use_primary):
+            start_times[i] = time.monotonic()
+            started[i].set()
+            return self.select(sql, bindings, use_primary)
+
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sqlbuilder-gather')
+        futures = [executor.submit(context.run, task, i, *query) for i, (context, *query) in enumerate(queries)]
+        try:
+            results = []
+            for i, future in enumerate(futures):
+                if timeout is None:
+                    results.append(future.result())
+                    continue
+                started[i].wait()
+                try:
+                    results.append(future.result(max(start_times[i] + timeout - time.monotonic(), 0)))
+                except TimeoutError:
+                    raise QueryException(*queries[i][1:3])
+            return results
+        finally:
+            # a query past its timeout keeps its worker until the server answers;
+            # shutdown(cancel_futures=True) would do this but needs python 3.9
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    def _gathered(builder):
+        sql, bindings = builder._compile_get()
+        # taken right after compiling, the copy holds the hook event of this builder
+        context = copy_context()
+        forget_event()
+        return context, sql, bindings, builder.use_primary_
+
     def insert(self, query, bindings):
-        bindings = bindings if bindings else []
+        bindings = bindings if bindings else ()
 
         def fn(sql, binder):
             self.driver.statement(sql, binder)
@@ -59,36 +177,113 @@ class Connection:
 
         return self.run(query, bindings, fn)
 
-    @staticmethod
-    def elapsed_time(start):
-        return round(time.time() * 1000) - start
+    def statement_many(self, query, bindings):
+        def fn(sql, binder):
+            return self.driver.statement_many(sql, binder)
+
+        return self.run(query, bindings, fn)
 
-    def enable_query_log(self):
-        self.enable_query_log_ = True
+    def copy_from(self, query, rows, types=None):
+        def fn(sql, binder):
+            return self.driver.copy_from(sql, rows, types)
+
+        return self.run(query, (), fn)
+
+    def insert_limits(self):
+        if self.driver is None:
+            return DriverBase.max_parameters, DriverBase.max_packet_size
+        return self.driver.max_parameters, self.driver.max_packet_size
 
-    def log_query(self, query, bindings, elapsed_time):
-        if self.enable_query_log_:
-            self.log_stock.append({'query': query, 'bindings': bindings, 'time': elapsed_time})
+    def enable_query_log(self, max_entries=1000, sample_rate=1.0, redact=False, sinks=()):
+        """
+        Record the executed queries, see QueryLog for the options.
+        """
+        self.query_log = QueryLog(max_entries, sample_rate, redact, sinks)
+        return self.query_log
+
+    def disable_query_log(self):
+        self.query_log = None
 
     def get_query_log(self):
-        return self.log_stock
+        return list(self.query_log) if self.query_log is not None else []
+
+    def enable_query_stats(self, max_statements=5000):
+        """
+        Aggregate latency, rows and errors per statement fingerprint, see QueryStats.
+        """
+        self.query_stats = QueryStats(max_statements)
+        return self.query_stats
+
+    def disable_query_stats(self):
+        self.query_stats = None
+
+    def _observe_start(self):
+        log = self.query_log
+        logged = log is not None and log.sampled()
+        if not logged and self.query_stats is None:
+            return None
+        return time.perf_counter_ns(), logged
+
+    def _observe(self, start, query, bindings, result=None, error=None):
+        started, logged = start
+        elapsed = time.perf_counter_ns() - started
+        if logged:
+            self.query_log.record(query, bindings, elapsed, error)
+        if self.query_stats is not None:
+            self.query_stats.record(query, elapsed, row_count(result), error is not None)
+
+    def on(self, event, fn=None):
+        """
+        Register fn(event) for one of before_compile, after_compile, before_execute,
+        after_execute and on_error; without fn, return a decorator. The QueryEvent
+        carries the builder, sql, bindings, compile and database time in ns and the row count.
+        """
+        if fn is None:
+            return lambda f: self.on(event, f)
+        if self.hooks is None:
+            self.hooks = Hooks()
+        self.hooks.add(event, fn)
+        return fn
+
+    def off(self, event, fn):
+        if self.hooks is None:
+            return
+        self.hooks.remove(event, fn)
+        if not self.hooks:
+            # no hooks left, back to the direct path
+            self.hooks = None
 
     def run(self, query, bindings, fn):
-        start = round(time.time() * 1000)
+        if self.hooks is not None:
+            return self.hooks.execute(self._run, query, bindings, fn)
+        return self._run(query, bindings, fn)
+
+    def _run(self, query, bindings, fn):
+        start = self._observe_start()
         try:
             result = fn(query, bindings)
         except Exception as e:
+            if start is not None:
+                self._observe(start, query, bindings, error=e)
             raise QueryException(query, bindings)
 
-        self.log_query(query, bindings, self.elapsed_time(start))
-
+        if start is not None:
+            self._observe(start, query, bindings, result)
         return result
 
     def commit(self):
-        return self.driver.commit()
+        try:
+            return self.driver.commit()
+        finally:
+            self._ended()
 
     def rollback(self):
-        return self.driver.rollback()
+        try:
+            return self.driver.rollback()
+        finally:
+            self._ended()
 
     def start_transaction(self):
-        return self.driver.start_transaction()
+        result = self.driver.start_transaction()
+        self.transaction_open.set(True)
+        return result
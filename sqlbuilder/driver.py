@@ -1,19 +1,64 @@
 import mysql.connector
-from psycopg import Connection
-from psycopg.rows import dict_row
+from mysql.connector.constants import FieldType, FieldFlag
+import psycopg
+from psycopg import Connection, AsyncConnection
+from psycopg.pq import TransactionStatus
+from psycopg.rows import dict_row, tuple_row
+from .rows import fetch, shape, check_format, format_args
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from itertools import islice
+import asyncio
 import re
+import time
+
+# column kinds for driver.fetch_batches, anything missing (decimal, text, json...) is 'object'
+MYSQL_KINDS = {
+    FieldType.TINY: 'int', FieldType.SHORT: 'int', FieldType.INT24: 'int', FieldType.LONG: 'int',
+    FieldType.LONGLONG: 'int', FieldType.YEAR: 'int',
+    FieldType.FLOAT: 'float', FieldType.DOUBLE: 'float',
+    FieldType.DATETIME: 'datetime', FieldType.TIMESTAMP: 'datetime',
+    FieldType.DATE: 'date', FieldType.NEWDATE: 'date',
+}
+# by type oid: int2, int4, int8, oid, float4, float8, bool, timestamp, timestamptz, date
+POSTGRES_KINDS = {
+    21: 'int', 23: 'int', 20: 'int', 26: 'int',
+    700: 'float', 701: 'float',
+    16: 'bool',
+    1114: 'datetime', 1184: 'datetime',
+    1082: 'date',
+}
 
 
 class DriverBase:
+    statement_cache_size = 0
+    max_parameters = 65535
+    max_packet_size = None
+    thread_safe = False
+
     def statement(self, query, binding):
         pass
 
+    def statement_many(self, query, bindings):
+        pass
+
+    def copy_from(self, query, rows, types=None):
+        raise NotImplementedError(f'{type(self).__name__} does not support copy')
+
     def fetch_one(self, query, binding):
         pass
 
-    def fetch_all(self, query, binding):
+    def fetch_all(self, query, binding, row_format='dict'):
         pass
 
+    def cursor(self, query, bindings=None, batch_size=1000):
+        pass
+
+    def fetch_batches(self, query, bindings=None, batch_size=10000):
+        raise NotImplementedError(f'{type(self).__name__} does not support fetching batches')
+
     def last_rowid(self):
         pass
 
@@ -26,41 +71,227 @@ class DriverBase:
     def start_transaction(self):
         pass
 
+    def reconnect(self):
+        pass
+
+    def connection_id(self):
+        pass
+
+    def ping(self):
+        return True
+
+    def close(self):
+        pass
+
+    def init_statement_cache(self, size):
+        self.statement_cache_size = size
+        self.statements = OrderedDict()
+        self.statements_owner = None
+        self.statement_prepares = 0
+        self.statement_executes = 0
+        self.statement_evictions = 0
+
+    def cached_statement(self, query, prepare):
+        """
+        Look up the prepared statement for query in the per-connection lru,
+        calling prepare(query) on a miss. Statements prepared on a previous
+        server session are dropped, so they get prepared again after reconnect.
+        :param query:
+        :param prepare:
+        :return:
+        """
+        owner = self.connection_id()
+        if owner != self.statements_owner:
+            self.statements.clear()
+            self.statements_owner = owner
+
+        self.statement_executes += 1
+        if query in self.statements:
+            self.statements.move_to_end(query)
+            return self.statements[query]
+
+        statement = prepare(query)
+        self.statements[query] = statement
+        self.statement_prepares += 1
+        while len(self.statements) > self.statement_cache_size:
+            self.release_statement(self.statements.popitem(last=False)[1])
+            self.statement_evictions += 1
+        return statement
+
+    def discard_statement(self, query):
+        statement = self.statements.pop(query, None)
+        if statement is not None:
+            self.release_statement(statement)
+
+    def release_statement(self, statement):
+        pass
+
+    def statement_cache_info(self):
+        return {
+            'prepares': self.statement_prepares,
+            'executes': self.statement_executes,
+            'evictions': self.statement_evictions,
+            'size': len(self.statements),
+            'max_size': self.statement_cache_size,
+        }
+
 
 class MySqlDriver(DriverBase):
-    def __init__(self, **kwargs):
+    def __init__(self, statement_cache_size=0, **kwargs):
         self.context = mysql.connector.connect(**kwargs)
-        self.cursor = self.context.cursor(dictionary=True, buffered=True)
         self.last_rowid_ = None
+        self.max_packet_size_ = None
+        self.init_statement_cache(statement_cache_size)
 
     def __del__(self):
         self.context.close()
 
+    @property
+    def max_packet_size(self):
+        if self.max_packet_size_ is None:
+            with self.context.cursor() as cursor:
+                cursor.execute('select @@max_allowed_packet')
+                self.max_packet_size_ = int(cursor.fetchone()[0])
+        return self.max_packet_size_
+
+    def connection_id(self):
+        return self.context.connection_id
+
+    def reconnect(self):
+        self.context.reconnect()
+
+    def ping(self):
+        try:
+            self.context.ping(reconnect=False)
+        except mysql.connector.Error:
+            return False
+        return True
+
+    def close(self):
+        self.context.close()
+
+    def _prepare(self, query):
+        return self.context.cursor(prepared=True)
+
+    def release_statement(self, statement):
+        try:
+            statement.close()
+        except mysql.connector.Error:
+            pass
+
+    def _execute_prepared(self, query, bindings):
+        cursor = self.cached_statement(query, self._prepare)
+        try:
+            cursor.execute(query, tuple(bindings))
+        except mysql.connector.Error:
+            self.discard_statement(query)
+            raise
+        return cursor
+
     def statement(self, query, bindings=None):
         if bindings is None:
-            bindings = []
+            bindings = ()
+        if self.statement_cache_size:
+            cursor = self._execute_prepared(query, bindings)
+            self.last_rowid_ = cursor.lastrowid
+            return cursor.rowcount
+
         with self.context.cursor(dictionary=True) as cursor:
             cursor.execute(query, tuple(bindings))
             self.last_rowid_ = cursor.lastrowid
             return cursor.rowcount
 
+    def statement_many(self, query, bindings):
+        with self.context.cursor() as cursor:
+            cursor.executemany(query, bindings)
+            self.last_rowid_ = cursor.lastrowid
+            return cursor.rowcount
+
     def transaction(self, fn):
         fn(self)
         self.context.commit()
 
     def fetch_one(self, query, bindings=None):
         if bindings is None:
-            bindings = []
+            bindings = ()
+        if self.statement_cache_size:
+            cursor = self._execute_prepared(query, bindings)
+            rows = fetch(cursor, cursor.column_names, 'dict')
+            return rows[0] if rows else None
+
         with self.context.cursor(dictionary=True) as cursor:
             cursor.execute(query, tuple(bindings))
             return cursor.fetchone()
 
-    def fetch_all(self, query, bindings=None):
+    def fetch_all(self, query, bindings=None, row_format='dict'):
+        """
+        :param row_format: dict, tuple, namedtuple, slots or columnar, see rows.shape
+        """
         if bindings is None:
-            bindings = []
-        with self.context.cursor(dictionary=True) as cursor:
+            bindings = ()
+        check_format(row_format)
+        if self.statement_cache_size:
+            cursor = self._execute_prepared(query, bindings)
+            return fetch(cursor, cursor.column_names, row_format)
+
+        with self.context.cursor() as cursor:
+            cursor.execute(query, tuple(bindings))
+            return fetch(cursor, cursor.column_names, row_format)
+
+    def cursor(self, query, bindings=None, batch_size=1000):
+        """
+        Execute on an unbuffered cursor and return a generator that fetches the
+        rows batch_size at a time. The connection can not run other statements
+        until the generator is exhausted or closed.
+        """
+        if bindings is None:
+            bindings = ()
+        cursor = self.context.cursor(dictionary=True, buffered=False)
+        try:
             cursor.execute(query, tuple(bindings))
-            return cursor.fetchall()
+        except Exception:
+            cursor.close()
+            raise
+        return self._iterate(cursor, batch_size)
+
+    def fetch_batches(self, query, bindings=None, batch_size=10000):
+        """
+        Execute on an unbuffered tuple cursor.
+        :return: ([(name, kind)], generator of lists of up to batch_size row tuples)
+        """
+        if bindings is None:
+            bindings = ()
+        cursor = self.context.cursor(buffered=False)
+        try:
+            cursor.execute(query, tuple(bindings))
+        except Exception:
+            cursor.close()
+            raise
+        columns = [(column[0], self._column_kind(column)) for column in cursor.description]
+        return columns, self._batches(cursor, batch_size)
+
+    @staticmethod
+    def _column_kind(column):
+        field_type, flags = column[1], column[7]
+        # an unsigned bigint does not fit int64
+        if field_type == FieldType.LONGLONG and flags & FieldFlag.UNSIGNED:
+            return 'object'
+        return MYSQL_KINDS.get(field_type, 'object')
+
+    def _iterate(self, cursor, batch_size):
+        for rows in self._batches(cursor, batch_size):
+            yield from rows
+
+    def _batches(self, cursor, batch_size):
+        try:
+            rows = cursor.fetchmany(batch_size)
+            while rows:
+                yield rows
+                rows = cursor.fetchmany(batch_size)
+        finally:
+            if self.context.unread_result:
+                self.context.consume_results()
+            cursor.close()
 
     def last_rowid(self):
         return self.last_rowid_
@@ -72,22 +303,62 @@ class MySqlDriver(DriverBase):
         self.context.rollback()
 
     def start_transaction(self):
-        self.start_transaction()
+        if not self.context.in_transaction:
+            self.context.start_transaction()
 
 
 class PostgresDriver(DriverBase):
-    def __init__(self, **kwargs):
-        self.context = Connection.connect(**kwargs)
+    def __init__(self, conninfo='', statement_cache_size=0, **kwargs):
+        self.conninfo = conninfo
+        self.config = kwargs
+        self.context = Connection.connect(conninfo, **kwargs)
         self.last_rowid_ = None
+        self.cursor_count = 0
+        self.init_statement_cache(statement_cache_size)
+        if statement_cache_size:
+            self.context.prepared_max = statement_cache_size
 
     def __del__(self):
         self.context.close()
 
+    def connection_id(self):
+        return self.context.info.backend_pid
+
+    def ping(self):
+        if self.context.closed or self.context.broken:
+            return False
+        if self.context.info.transaction_status != TransactionStatus.IDLE:
+            return True
+        try:
+            self.context.execute('select 1')
+            if not self.context.autocommit:
+                self.context.rollback()
+        except psycopg.Error:
+            return False
+        return True
+
+    def close(self):
+        self.context.close()
+
+    def reconnect(self):
+        self.context.close()
+        self.context = Connection.connect(self.conninfo, **self.config)
+        if self.statement_cache_size:
+            self.context.prepared_max = self.statement_cache_size
+
+    def _execute(self, cursor, query, bindings):
+        if not self.statement_cache_size:
+            return cursor.execute(query, bindings)
+
+        # psycopg keeps the server-side statements itself; the mirror only tracks what it holds
+        self.cached_statement(query, lambda q: True)
+        return cursor.execute(query, bindings, prepare=True)
+
     def statement(self, query, bindings=None):
         if bindings is None:
-            bindings = []
+            bindings = ()
         with self.context.cursor(row_factory=dict_row) as cursor:
-            cursor.execute(query, bindings)
+            self._execute(cursor, query, bindings)
             match = re.search(r'returning\s+\"(\w+)\"', query.lower())
             if match:
                 self.last_rowid_ = cursor.fetchone()[match.group(1)]
@@ -95,24 +366,92 @@ class PostgresDriver(DriverBase):
                 self.last_rowid_ = None
             return cursor.rowcount
 
+    def statement_many(self, query, bindings):
+        with self.context.cursor() as cursor:
+            cursor.executemany(query, bindings)
+            self.last_rowid_ = None
+            return cursor.rowcount
+
+    def copy_from(self, query, rows, types=None):
+        # psycopg flushes the copy buffer every few dozen kB, so memory stays flat
+        with self.context.cursor() as cursor:
+            with cursor.copy(query) as copy:
+                if types:
+                    copy.set_types(types)
+                for row in rows:
+                    copy.write_row(row)
+            return cursor.rowcount
+
     def transaction(self, fn):
         fn(self)
         self.context.commit()
 
     def fetch_one(self, query, bindings=None):
         if bindings is None:
-            bindings = []
+            bindings = ()
         with self.context.cursor(row_factory=dict_row) as cursor:
-            cursor.execute(query, bindings)
+            self._execute(cursor, query, bindings)
             return cursor.fetchone()
 
-    def fetch_all(self, query, bindings=None):
+    def fetch_all(self, query, bindings=None, row_format='dict'):
         if bindings is None:
-            bindings = []
+            bindings = ()
+        if row_format == 'dict':
+            with self.context.cursor(row_factory=dict_row) as cursor:
+                self._execute(cursor, query, bindings)
+                return cursor.fetchall()
 
-        with self.context.cursor(row_factory=dict_row) as cursor:
+        check_format(row_format)
+        with self.context.cursor() as cursor:
+            self._execute(cursor, query, bindings)
+            return fetch(cursor, [column.name for column in cursor.description or ()], row_format)
+
+    def cursor(self, query, bindings=None, batch_size=1000):
+        """
+        Execute on a named server-side cursor and return a generator that fetches
+        the rows batch_size at a time.
+        """
+        cursor = self._server_cursor(query, bindings, batch_size, dict_row)
+        return self._iterate(cursor, batch_size)
+
+    def fetch_batches(self, query, bindings=None, batch_size=10000):
+        """
+        Execute on a named server-side tuple cursor.
+        :return: ([(name, kind)], generator of lists of up to batch_size row tuples)
+        """
+        cursor = self._server_cursor(query, bindings, batch_size, tuple_row)
+        columns = [(column.name, POSTGRES_KINDS.get(column.type_code, 'object')) for column in cursor.description]
+        return columns, self._batches(cursor, batch_size)
+
+    def _server_cursor(self, query, bindings, batch_size, row_factory):
+        if bindings is None:
+            bindings = ()
+        self.cursor_count += 1
+        # outside a transaction block only a holdable cursor survives the implicit commit
+        cursor = self.context.cursor(f'sqlbuilder_cursor_{self.cursor_count}', row_factory=row_factory,
+                                     withhold=self.context.autocommit)
+        cursor.itersize = batch_size
+        try:
             cursor.execute(query, bindings)
-            return cursor.fetchall()
+        except Exception:
+            cursor.close()
+            raise
+        return cursor
+
+    @classmethod
+    def _iterate(cls, cursor, batch_size):
+        for rows in cls._batches(cursor, batch_size):
+            yield from rows
+
+    @staticmethod
+    def _batches(cursor, batch_size):
+        try:
+            rows = cursor.fetchmany(batch_size)
+            while rows:
+                yield rows
+                rows = cursor.fetchmany(batch_size)
+        finally:
+            cursor.close()
 
     def last_rowid(self):
         return self.last_rowid_
@@ -124,4 +463,333 @@ class PostgresDriver(DriverBase):
         self.context.rollback()
 
     def start_transaction(self):
-        self.context.transaction()
+        # without autocommit psycopg opens the transaction implicitly with the first statement
+        if self.context.autocommit and self.context.info.transaction_status == TransactionStatus.IDLE:
+            self.context.execute('begin')
+
+
+class AsyncPostgresDriver(DriverBase):
+    def __init__(self, context, statement_cache_size=0):
+        self.context = context
+        self.last_rowid_ = None
+        self.cursor_count = 0
+        self.init_statement_cache(statement_cache_size)
+        if statement_cache_size:
+            self.context.prepared_max = statement_cache_size
+
+    @classmethod
+    async def connect(cls, conninfo='', statement_cache_size=0, **kwargs):
+        context = await AsyncConnection.connect(conninfo, **kwargs)
+        return cls(context, statement_cache_size)
+
+    async def close(self):
+        await self.context.close()
+
+    def connection_id(self):
+        return self.context.info.backend_pid
+
+    async def _execute(self, cursor, query, bindings):
+        if not self.statement_cache_size:
+            return await cursor.execute(query, bindings)
+
+        self.cached_statement(query, lambda q: True)
+        return await cursor.execute(query, bindings, prepare=True)
+
+    async def statement(self, query, bindings=None):
+        if bindings is None:
+            bindings = ()
+        async with self.context.cursor(row_factory=dict_row) as cursor:
+            await self._execute(cursor, query, bindings)
+            match = re.search(r'returning\s+\"(\w+)\"', query.lower())
+            if match:
+                self.last_rowid_ = (await cursor.fetchone())[match.group(1)]
+            else:
+                self.last_rowid_ = None
+            return cursor.rowcount
+
+    async def statement_many(self, query, bindings):
+        async with self.context.cursor() as cursor:
+            await cursor.executemany(query, bindings)
+            self.last_rowid_ = None
+            return cursor.rowcount
+
+    async def copy_from(self, query, rows, types=None):
+        async with self.context.cursor() as cursor:
+            async with cursor.copy(query) as copy:
+                if types:
+                    copy.set_types(types)
+                for row in rows:
+                    await copy.write_row(row)
+            return cursor.rowcount
+
+    async def fetch_one(self, query, bindings=None):
+        if bindings is None:
+            bindings = ()
+        async with self.context.cursor(row_factory=dict_row) as cursor:
+            await self._execute(cursor, query, bindings)
+            return await cursor.fetchone()
+
+    async def fetch_all(self, query, bindings=None, row_format='dict'):
+        if bindings is None:
+            bindings = ()
+        if row_format == 'dict':
+            async with self.context.cursor(row_factory=dict_row) as cursor:
+                await self._execute(cursor, query, bindings)
+                return await cursor.fetchall()
+
+        check_format(row_format)
+        async with self.context.cursor() as cursor:
+            await self._execute(cursor, query, bindings)
+            return shape([column.name for column in cursor.description or ()], await cursor.fetchall(), row_format)
+
+    async def cursor(self, query, bindings=None, batch_size=1000):
+        if bindings is None:
+            bindings = ()
+        self.cursor_count += 1
+        cursor = self.context.cursor(f'sqlbuilder_cursor_{self.cursor_count}', row_factory=dict_row,
+                                     withhold=self.context.autocommit)
+        cursor.itersize = batch_size
+        try:
+            await cursor.execute(query, bindings)
+        except Exception:
+            await cursor.close()
+            raise
+        return self._iterate(cursor, batch_size)
+
+    @staticmethod
+    async def _iterate(cursor, batch_size):
+        try:
+            rows = await cursor.fetchmany(batch_size)
+            while rows:
+                for row in rows:
+                    yield row
+                rows = await cursor.fetchmany(batch_size)
+        finally:
+            await cursor.close()
+
+    def last_rowid(self):
+        return self.last_rowid_
+
+    async def commit(self):
+        await self.context.commit()
+
+    async def rollback(self):
+        await self.context.rollback()
+
+    async def start_transaction(self):
+        # psycopg opens the transaction implicitly with the first statement
+        pass
+
+    def transaction(self):
+        return self.context.transaction()
+
+
+class ExecutorSlot:
+    __slots__ = ('driver', 'executor')
+
+    def __init__(self, driver, executor):
+        self.driver = driver
+        self.executor = executor
+
+
+class AsyncExecutorDriver(DriverBase):
+    """
+    Awaitable front for a blocking driver. Each pooled driver is bound to its
+    own single-thread executor, so a connection is only ever used from one
+    thread, and callers queue for a free slot without blocking the loop.
+    """
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.free = asyncio.Queue()
+        for slot in slots:
+            self.free.put_nowait(slot)
+        self.pinned = ContextVar(f'sqlbuilder_pinned_{id(self)}', default=None)
+        # the slot pinned by start_transaction, released by commit or rollback
+        self.started = ContextVar(f'sqlbuilder_started_{id(self)}', default=None)
+        self.last_rowid_ = ContextVar(f'sqlbuilder_rowid_{id(self)}', default=None)
+        self.waiting = 0
+        self.wait_count = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    @classmethod
+    async def connect(cls, factory, pool_size=4):
+        loop = asyncio.get_running_loop()
+        executors = [ThreadPoolExecutor(1, thread_name_prefix='sqlbuilder') for _ in range(pool_size)]
+        drivers = await asyncio.gather(*(loop.run_in_executor(e, factory) for e in executors))
+        return cls([ExecutorSlot(d, e) for d, e in zip(drivers, executors)])
+
+    @property
+    def max_parameters(self):
+        return self.slots[0].driver.max_parameters
+
+    @property
+    def max_packet_size(self):
+        return self.slots[0].driver.max_packet_size
+
+    def pool_stats(self):
+        return {
+            'size': len(self.slots),
+            'idle': self.free.qsize(),
+            'waiting': self.waiting,
+            'wait_count': self.wait_count,
+            'wait_time_total': self.wait_time_total,
+            'wait_time_max': self.wait_time_max,
+            'wait_time_avg': self.wait_time_total / self.wait_count if self.wait_count else 0.0,
+        }
+
+    async def _acquire(self):
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            slot = await self.free.get()
+        finally:
+            self.waiting -= 1
+        elapsed = time.perf_counter() - start
+        self.wait_count += 1
+        self.wait_time_total += elapsed
+        self.wait_time_max = max(self.wait_time_max, elapsed)
+        return slot
+
+    def _release(self, slot):
+        self.free.put_nowait(slot)
+
+    @staticmethod
+    def _run(slot, fn, *args):
+        return asyncio.wrap_future(slot.executor.submit(fn, *args))
+
+    async def _call(self, fn, *args):
+        slot = self.pinned.get()
+        if slot is not None:
+            return await self._run(slot, fn, slot.driver, *args)
+
+        slot = await self._acquire()
+        loop = asyncio.get_running_loop()
+        future = slot.executor.submit(fn, slot.driver, *args)
+        # a cancelled caller can not stop a running query; the slot comes back once the thread is done
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._release, slot))
+        return await asyncio.wrap_future(future)
+
+    async def statement(self, query, bindings=None):
+        def fn(driver, sql, binder):
+            return driver.statement(sql, binder), driver.last_rowid()
+
+        rowcount, last_rowid = await self._call(fn, query, bindings)
+        self.last_rowid_.set(last_rowid)
+        return rowcount
+
+    async def statement_many(self, query, bindings):
+        return await self._call(lambda driver, sql, binder: driver.statement_many(sql, binder), query, bindings)
+
+    async def fetch_one(self, query, bindings=None):
+        return await self._call(lambda driver, sql, binder: driver.fetch_one(sql, binder), query, bindings)
+
+    async def fetch_all(self, query, bindings=None, row_format='dict'):
+        return await self._call(lambda driver, sql, binder: driver.fetch_all(sql, binder, *format_args(row_format)),
+                                query, bindings)
+
+    async def cursor(self, query, bindings=None, batch_size=1000):
+        slot = self.pinned.get()
+        owned = slot is None
+        if owned:
+            slot = await self._acquire()
+        try:
+            rows = await self._run(slot, slot.driver.cursor, query, bindings, batch_size)
+        except BaseException:
+            if owned:
+                self._release(slot)
+            raise
+        return self._iterate(slot, owned, rows, batch_size)
+
+    async def _iterate(self, slot, owned, rows, batch_size):
+        try:
+            batch = await self._run(slot, lambda: list(islice(rows, batch_size)))
+            while batch:
+                for row in batch:
+                    yield row
+                batch = await self._run(slot, lambda: list(islice(rows, batch_size)))
+        finally:
+            await self._run(slot, rows.close)
+            if owned:
+                self._release(slot)
+
+    def last_rowid(self):
+        return self.last_rowid_.get()
+
+    async def commit(self):
+        return await self._finish(lambda driver: driver.commit())
+
+    async def rollback(self):
+        return await self._finish(lambda driver: driver.rollback())
+
+    async def start_transaction(self):
+        """
+        Pin a slot to the current task until commit or rollback, so the statements
+        in between run on the connection holding the transaction. The pin lives in
+        the task's context: a transaction started in one task is not seen by others.
+        """
+        if self.pinned.get() is not None:
+            return await self._call(lambda driver: driver.start_transaction())
+
+        slot = await self._acquire()
+        future = slot.executor.submit(slot.driver.start_transaction)
+        try:
+            result = await asyncio.wrap_future(future)
+        except BaseException:
+            self._abandon(slot)
+            raise
+        self.pinned.set(slot)
+        self.started.set(slot)
+        return result
+
+    def _abandon(self, slot):
+        # the begin may still be running after a cancel, roll it back before the slot is reused
+        loop = asyncio.get_running_loop()
+        future = slot.executor.submit(slot.driver.rollback)
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._release, slot))
+
+    async def _finish(self, fn):
+        slot = self.started.get()
+        if slot is None:
+            return await self._call(fn)
+
+        self.started.set(None)
+        self.pinned.set(None)
+        future = slot.executor.submit(fn, slot.driver)
+        try:
+            result = await asyncio.wrap_future(future)
+        except BaseException:
+            self._abandon(slot)
+            raise
+        self._release(slot)
+        return result
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Pin one pooled driver to the current task for the duration of the block,
+        committing on success and rolling back on error.
+        """
+        if self.pinned.get() is not None:
+            yield
+            return
+
+        slot = await self._acquire()
+        token = self.pinned.set(slot)
+        try:
+            await self._run(slot, slot.driver.start_transaction)
+            try:
+                yield
+            except BaseException:
+                await self._run(slot, slot.driver.rollback)
+                raise
+            await self._run(slot, slot.driver.commit)
+        finally:
+            self.pinned.reset(token)
+            self._release(slot)
+
+    async def close(self):
+        for slot in self.slots:
+            await self._run(slot, slot.driver.context.close)
+            slot.executor.shutdown(wait=False)
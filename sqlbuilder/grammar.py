@@ -1,13 +1,48 @@
 import math
+from collections import OrderedDict
 from inspect import isfunction
+from operator import attrgetter
 import re
-from .builder import Expression, JoinClause, Builder, flatten
+import threading
+from .builder import Expression, JoinClause, Builder
+from .nodes import Node, Basic, In, InSub, Null, Between, Nested, Exists, Column, Raw, Sub, Order
+
+# the select clauses Grammar.fingerprint keys besides columns_ and the plain scalars
+fingerprint_fields = attrgetter('aggregate_', 'from_', 'joins_', 'wheres_', 'groups_', 'having_', 'orders_',
+                                'unions_', 'union_orders', 'lock_')
 
 
 class Grammar:
-    def __init__(self, prefix):
+    def __init__(self, prefix, cache_size=256):
         self.prefix = prefix
+        self.cache_size = cache_size
+        self.compiled_cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        self.where_compilers = {
+            Basic: self._where_basic,
+            In: self._where_in,
+            InSub: self._where_in_sub,
+            Null: self._where_null,
+            Between: self._where_between,
+            Nested: self._where_nested,
+            Exists: self._where_exists,
+            Column: self._where_column,
+            Raw: self._where_raw,
+            Sub: self._where_sub,
+        }
+        self.node_fingerprints = {
+            Basic: self._fingerprint_basic,
+            In: self._fingerprint_in,
+            Null: self._fingerprint_null,
+            Nested: self._fingerprint_nested,
+            Column: self._fingerprint_column,
+            Order: self._fingerprint_order,
+        }
         self.operators = []
+        self.supports_row_values = False
         self.select_components = ['aggregate_',
                                   'columns_',
                                   'from_',
@@ -73,6 +108,138 @@ class Grammar:
         return value.get_value() if self.is_expression(value) else self.parameter_chars()
 
     def compile_select(self, query: Builder):
+        if not self.cache_size:
+            return self._compile_select(query)
+
+        try:
+            key = self.fingerprint(query)
+        except TypeError:
+            return self._compile_select(query)
+
+        with self.cache_lock:
+            sql = self.compiled_cache.get(key)
+            if sql is not None:
+                self.compiled_cache.move_to_end(key)
+                self.cache_hits += 1
+                return sql
+            self.cache_misses += 1
+
+        sql = self._compile_select(query)
+
+        with self.cache_lock:
+            self.compiled_cache[key] = sql
+            while len(self.compiled_cache) > self.cache_size:
+                self.compiled_cache.popitem(last=False)
+                self.cache_evictions += 1
+
+        return sql
+
+    def cache_info(self):
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'evictions': self.cache_evictions,
+            'size': len(self.compiled_cache),
+            'max_size': self.cache_size,
+        }
+
+    def clear_cache(self):
+        with self.cache_lock:
+            self.compiled_cache.clear()
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.cache_evictions = 0
+
+    def fingerprint(self, query: Builder):
+        """
+        Structural key of a select query: everything that shapes the compiled sql,
+        with bound values reduced to placeholders. Empty clauses are keyed as None.
+        Raises TypeError when the query holds something that can not be keyed.
+        :param query:
+        :return: tuple
+        """
+        fp = self._fingerprint_value
+        return (
+            type(query),
+            (query.type, fp(query.table)) if isinstance(query, JoinClause) else None,
+            query.distinct_,
+            query.limit_,
+            query.offset_,
+            query.union_limit,
+            query.union_offset,
+            fp(query.columns_) if query.columns_ else '*',
+            *[fp(value) if value else None for value in fingerprint_fields(query)],
+        )
+
+    def _fingerprint_value(self, value):
+        kind = type(value)
+        if kind is str or kind is int or value is None or kind is bool or kind is float:
+            return value
+        if kind is list or kind is tuple:
+            return tuple([item if type(item) is str else self._fingerprint_value(item) for item in value])
+        fingerprint = self.node_fingerprints.get(kind)
+        if fingerprint is not None:
+            return fingerprint(value)
+        if isinstance(value, Node):
+            return self._fingerprint_node(value)
+        if isinstance(value, Expression):
+            return 'raw', value.get_value()
+        if isinstance(value, Builder):
+            return self.fingerprint(value)
+        raise TypeError(f'Can not fingerprint {type(value).__name__}')
+
+    def _fingerprint_node(self, node):
+        key = [type(node)]
+        for field in node.__slots__:
+            value = getattr(node, field)
+            if field == 'value':
+                key.append(self._fingerprint_parameter(value))
+            elif field == 'values':
+                key.append(tuple(map(self._fingerprint_parameter, value)))
+            else:
+                key.append(self._fingerprint_value(value))
+        return tuple(key)
+
+    # the common nodes skip the generic walk over __slots__
+
+    def _fingerprint_basic(self, node):
+        column = node.column
+        return (Basic, node.boolean, column if type(column) is str else self._fingerprint_value(column),
+                node.operator, self._fingerprint_parameter(node.value))
+
+    def _fingerprint_in(self, node):
+        column = node.column
+        values = node.values
+        for value in values:
+            if isinstance(value, Expression):
+                values = tuple(map(self._fingerprint_parameter, values))
+                break
+        else:
+            # plain values only add their count
+            values = len(values)
+        return (In, node.boolean, column if type(column) is str else self._fingerprint_value(column),
+                values, node.not_)
+
+    def _fingerprint_null(self, node):
+        column = node.column
+        return Null, node.boolean, column if type(column) is str else self._fingerprint_value(column), node.not_
+
+    def _fingerprint_nested(self, node):
+        return Nested, node.boolean, self.fingerprint(node.query)
+
+    def _fingerprint_column(self, node):
+        first, second = node.first, node.second
+        return (Column, node.boolean, first if type(first) is str else self._fingerprint_value(first),
+                node.operator, second if type(second) is str else self._fingerprint_value(second))
+
+    def _fingerprint_order(self, node):
+        column = node.column
+        return Order, column if type(column) is str else self._fingerprint_value(column), node.direction
+
+    def _fingerprint_parameter(self, value):
+        return ('raw', value.get_value()) if self.is_expression(value) else '?'
+
+    def _compile_select(self, query: Builder):
         original = query.columns_
 
         if not query.columns_:
@@ -105,15 +272,15 @@ class Grammar:
         return re.sub(r'and |or ', '', value, 1, flags=re.IGNORECASE)
 
     def _compile_aggregate(self, query: Builder, aggregate):
-        column = self.columnize(aggregate['columns'])
+        column = self.columnize(aggregate.columns)
 
         if query.distinct_ and column != '*':
             column = 'distinct ' + column
 
-        return 'select {}({}) as aggregate'.format(aggregate['function'], column)
+        return 'select {}({}) as aggregate'.format(aggregate.function, column)
 
     def _compile_columns(self, query, columns):
-        if not hasattr(query, 'aggregate'):
+        if query.aggregate_:
             return ''
         select = 'select distinct ' if query.distinct_ else 'select '
         return select + self.columnize(columns)
@@ -138,91 +305,75 @@ class Grammar:
         return ''
 
     def _compile_wheres_to_array(self, query):
-        def mf(where):
-            attr = '_where_' + where['type'].lower()
-            fn = getattr(self, attr)
-            return where['boolean'] + ' ' + fn(query, where)
-        return list(map(mf, query.wheres_))
+        compilers = self.where_compilers
+        return [where.boolean + ' ' + compilers[type(where)](query, where) for where in query.wheres_]
 
     def _concatenate_where_clauses(self, query, sql):
         conj = 'on' if isinstance(query, JoinClause) else 'where'
         return conj + ' ' + self.remove_leading_boolean(' '.join(sql))
 
     def _where_raw(self, query, where):
-        return where['sql']
+        return where.sql
 
     def _where_basic(self, query, where):
-        value = self.parameter(where['value'])
-        return self.wrap(where['column']) + ' ' + where['operator'] + ' ' + value
+        value = self.parameter(where.value)
+        return self.wrap(where.column) + ' ' + where.operator + ' ' + value
 
     def _where_in(self, query, where):
-        if 'values' in where and where['values']:
-            return self.wrap(where['column']) + ' in (' + self.parameterize(where['values']) + ')'
+        if where.values:
+            operator = ' not in (' if where.not_ else ' in ('
+            return self.wrap(where.column) + operator + self.parameterize(where.values) + ')'
 
-        return '0 = 1'
-
-    def _where_not_in(self, query, where):
-        if 'values' in where and where['values']:
-            return self.wrap(where['column']) + ' not in (' + self.parameterize(where['values']) + ')'
-
-        return '1 = 1'
+        return '1 = 1' if where.not_ else '0 = 1'
 
     def _where_in_sub(self, query, where):
-        return self.wrap(where['column']) + ' in (' + self.compile_select(where['query']) + ')'
-
-    def _where_not_in_sub(self, query, where):
-        return self.wrap(where['column']) + ' not in (' + self.compile_select(where['query']) + ')'
+        operator = ' not in (' if where.not_ else ' in ('
+        return self.wrap(where.column) + operator + self.compile_select(where.query) + ')'
 
     def _where_null(self, query, where):
-        return self.wrap(where['column']) + ' is null'
-
-    def _where_not_null(self, query, where):
-        return self.wrap(where['column']) + ' is not null'
+        return self.wrap(where.column) + (' is not null' if where.not_ else ' is null')
 
     def _where_between(self, query, where):
-        between = 'not between' if where['not'] else 'between'
-        return self.wrap(where['column']) + between + ' {} and {}'.format(self.parameter_chars(), self.parameter_chars())
+        between = ' not between' if where.not_ else ' between'
+        return self.wrap(where.column) + between + ' {} and {}'.format(self.parameter_chars(), self.parameter_chars())
 
     @staticmethod
     def parameter_chars():
         return '?'
 
     def _where_column(self, query, where):
-        return self.wrap(where['first']) + where['operator'] + self.wrap(where['second'])
+        return self.wrap(where.first) + where.operator + self.wrap(where.second)
 
     def _where_nested(self, query, where):
         offset = 3 if isinstance(query, JoinClause) else 6
-        return '(' + self._compile_wheres(where['query'], None)[offset:] + ')'
+        return '(' + self._compile_wheres(where.query, None)[offset:] + ')'
 
     def _where_sub(self, query, where):
-        select = self.compile_select(where['query'])
-        return self.wrap(where['column']) + ' ' + where['operator'] + ' (' + select + ')'
+        select = self.compile_select(where.query)
+        return self.wrap(where.column) + ' ' + where.operator + ' (' + select + ')'
 
     def _where_exists(self, query, where):
-        return 'exists (' + self.compile_select(where['query']) + ')'
+        return ('not exists (' if where.not_ else 'exists (') + self.compile_select(where.query) + ')'
 
     def _compile_groups(self, query, groups):
         return 'group by ' + self.columnize(groups)
 
     def _compile_having(self, query, havings):
         def mf(having):
-            if having['type'] == 'Raw':
-                return having['boolean'] + ' ' + having['sql']
+            if type(having) is Raw:
+                return having.boolean + ' ' + having.sql
             return self._compile_base_having(having)
         sql = ' '.join(map(mf, havings))
         return 'having ' + self.remove_leading_boolean(sql)
 
     def _compile_base_having(self, having):
-        column = self.wrap(having['column'])
-        parameter = self.parameter(having['value'])
-        return having['boolean'] + ' ' + column + ' ' + having['operator'] + ' ' + parameter
+        column = self.wrap(having.column)
+        parameter = self.parameter(having.value)
+        return having.boolean + ' ' + column + ' ' + having.operator + ' ' + parameter
 
     def _compile_orders(self, query, orders):
         def mf(order):
-            if 'sql' in order:
-                return order['sql']
-            else:
-                return self.wrap(order['column']) + ' ' + order['direction']
+            return self.wrap(order.column) + ' ' + order.direction
 
         if len(orders) > 0:
             return 'order by ' + ', '.join(map(mf, orders))
@@ -254,8 +405,8 @@ class Grammar:
         return sql.lstrip()
 
     def _compile_union(self, union):
-        conj = ' union all ' if union['all'] else ' union '
-        return conj + union['query'].to_sql()
+        conj = ' union all ' if union.all else ' union '
+        return conj + union.query.to_sql()
 
     def compile_exists(self, query):
         select = self.compile_select(query)
@@ -266,47 +417,85 @@ class Grammar:
         if type(values) != list:
             values = [values]
         columns = self.columnize(values[0].keys())
-        parameters = ', '.join(map(lambda record: '(' + self.parameterize(record)+')', values))
+        parameters = ', '.join(map(lambda record: '(' + self.parameterize(record.values()) + ')', values))
 
         return f'insert into {table} ({columns}) values {parameters}'
 
     def compile_insert_or_ignore(self, query, values):
         pass
 
+    def compile_upsert(self, query, values, unique_by, update):
+        raise NotImplementedError(f'{type(self).__name__} does not support upsert')
+
+    def compile_copy_from(self, query, columns, binary=False):
+        raise NotImplementedError(f'{type(self).__name__} does not support copy')
+
     def compile_insert_get_id(self, query, values, sequence=None):
         return self.compile_insert(query, values)
 
     def compile_update(self, query: Builder, values):
         table = self.wrap_table(query.from_)
-        columns = ', '.join(map(lambda p: self.wrap(p[0]) + ' = ' + self.parameter(p[1])+')', enumerate(values)))
+        columns = ', '.join(map(lambda p: self.wrap(p[0]) + ' = ' + self.parameter(p[1]), values.items()))
 
         joins = ''
         if query.joins_:
             joins = ' ' + self._compile_joins(query, query.joins_)
 
-        wheres = self._compile_wheres(query)
+        wheres = self._compile_wheres(query, query.wheres_).rstrip()
 
         return f'update {table}{joins} set {columns} {wheres}'
 
     def prepare_bindings_for_update(self, bindings, values):
-        clean = dict(bindings)
-        clean['join'] = []
-        clean['select'] = []
-        return bindings['join'] + list(values.values()) + flatten(clean)
+        return bindings['join'] + tuple(values.values()) + bindings.without('select', 'join')
+
+    def compile_update_batch(self, query: Builder, records, key, types=None):
+        """
+        One update setting every column of records to the value of the record
+        matching on key, through a case expression per column. types is only
+        used by postgres.
+        """
+        table = self.wrap_table(query.from_)
+        wrapped_key = self.wrap(key)
+        columns = []
+        for column in records[0]:
+            if column != key:
+                cases = ' '.join(f'when {self.parameter(record[key])} then {self.parameter(record[column])}'
+                                 for record in records)
+                columns.append(f'{self.wrap(column)} = case {wrapped_key} {cases} end')
+        ids = self.parameterize(record[key] for record in records)
+        where = self._compile_update_batch_wheres(query, f'{wrapped_key} in ({ids})')
+
+        return f'update {table} set {", ".join(columns)} {where}'
+
+    def _compile_update_batch_wheres(self, query, condition):
+        if not query.wheres_:
+            return 'where ' + condition
+        return f'where {condition} and ({self.remove_leading_boolean(" ".join(self._compile_wheres_to_array(query)))})'
+
+    def prepare_bindings_for_update_batch(self, bindings, records, key):
+        cases = tuple(v for column in records[0] if column != key for record in records
+                      for v in (record[key], record[column]) if not self.is_expression(v))
+        ids = tuple(record[key] for record in records if not self.is_expression(record[key]))
+        return cases + ids + bindings['where']
 
     def compile_delete(self, query: Builder):
         sql = self._compile_wheres(query, query.wheres_) if type(query.wheres_) == list else ''
         return 'delete from ' + self.wrap_table(query.from_) + ' ' + sql.strip()
 
-    @staticmethod
     def prepare_binding_for_delete(self, bindings):
-        return flatten(bindings)
+        return bindings.to_tuple()
+
+    def compile_delete_batch(self, query: Builder):
+        """
+        A delete removing at most query.limit_ of the matching rows.
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not support batched deletes')
 
     def _compile_lock(self, query, value):
         return value if type(value) == str else ''
 
     def compile_truncate(self, query):
-        return {'truncate' + self.wrap_table(query.from_) : []}
+        return {'truncate ' + self.wrap_table(query.from_): []}
 
 
 
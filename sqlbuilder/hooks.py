@@ -0,0 +1,121 @@
+import time
+from contextvars import ContextVar
+from functools import wraps
+from .rows import row_count
+
+EVENTS = ('before_compile', 'after_compile', 'before_execute', 'after_execute', 'on_error')
+
+# the event of the last statement compiled in this context, picked up by the run executing it
+current_event = ContextVar('sqlbuilder_current_event', default=None)
+
+
+def forget_event():
+    """
+    Drop the event of the statement last compiled in this context, for the paths
+    that compile without executing it (a result cache hit, a prepared query), so
+    the next statement run here does not pick it up.
+    """
+    current_event.set(None)
+
+
+class QueryEvent:
+    """
+    Passed to every hook. Hooks may replace sql and bindings before execution;
+    builder is None for statements that did not come from a builder.
+    """
+    __slots__ = ('builder', 'sql', 'bindings', 'compile_ns', 'execute_ns', 'rows', 'result', 'error')
+
+    def __init__(self, builder=None, sql=None, bindings=None):
+        self.builder = builder
+        self.sql = sql
+        self.bindings = bindings
+        self.compile_ns = 0
+        self.execute_ns = 0
+        self.rows = None
+        self.result = None
+        self.error = None
+
+
+class Hooks:
+    def __init__(self):
+        self.handlers = {event: [] for event in EVENTS}
+
+    def add(self, event, fn):
+        if event not in self.handlers:
+            raise ValueError(f'unknown hook event {event}, expected one of {", ".join(EVENTS)}')
+        self.handlers[event].append(fn)
+
+    def remove(self, event, fn):
+        self.handlers[event].remove(fn)
+
+    def __bool__(self):
+        return any(self.handlers.values())
+
+    def emit(self, event, payload):
+        for fn in self.handlers[event]:
+            fn(payload)
+
+    def compile(self, builder, compile_fn, *args, **kwargs):
+        event = QueryEvent(builder)
+        self.emit('before_compile', event)
+        start = time.perf_counter_ns()
+        event.sql, event.bindings = compile_fn(*args, **kwargs)
+        event.compile_ns = time.perf_counter_ns() - start
+        self.emit('after_compile', event)
+        current_event.set(event)
+        return event.sql, event.bindings
+
+    def _begin(self, query, bindings):
+        event = current_event.get()
+        if event is None or event.sql != query:
+            event = QueryEvent(None, query, bindings)
+        current_event.set(None)
+        self.emit('before_execute', event)
+        return event
+
+    def _fail(self, event, start, error):
+        event.execute_ns = time.perf_counter_ns() - start
+        event.error = error
+        self.emit('on_error', event)
+
+    def _end(self, event, start, result):
+        event.execute_ns = time.perf_counter_ns() - start
+        event.result = result
+        event.rows = row_count(result)
+        self.emit('after_execute', event)
+
+    def execute(self, run, query, bindings, fn):
+        event = self._begin(query, bindings)
+        start = time.perf_counter_ns()
+        try:
+            result = run(event.sql, event.bindings, fn)
+        except Exception as e:
+            self._fail(event, start, e)
+            raise
+        self._end(event, start, result)
+        return result
+
+    async def execute_async(self, run, query, bindings, fn):
+        event = self._begin(query, bindings)
+        start = time.perf_counter_ns()
+        try:
+            result = await run(event.sql, event.bindings, fn)
+        except Exception as e:
+            self._fail(event, start, e)
+            raise
+        self._end(event, start, result)
+        return result
+
+
+def hooked(compile_fn):
+    """
+    Run a builder compile method through the connection's compile hooks, if any.
+    """
+    @wraps(compile_fn)
+    def wrapper(self, *args, **kwargs):
+        hooks = self.connection.hooks
+        if hooks is None:
+            return compile_fn(self, *args, **kwargs)
+        return hooks.compile(self, compile_fn, self, *args, **kwargs)
+
+    return wrapper
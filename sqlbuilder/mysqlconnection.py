@@ -1,7 +1,8 @@
-
 from .connection import Connection
 from .mysqlgrammar import MysqlGrammar
 from .driver import MySqlDriver
+from .pool import ConnectionPool, PooledDriver
+from .replication import ReplicatedConnection
 
 
 class MysqlConnection(Connection):
@@ -12,3 +13,47 @@ class MysqlConnection(Connection):
 
     def get_grammar(self):
         return MysqlGrammar(self.table_prefix)
+
+
+class PooledMysqlConnection(MysqlConnection):
+    """
+    MysqlConnection over a pool of drivers; one instance can be shared by threads.
+    Pooled sessions run in autocommit unless a transaction is started.
+    """
+
+    def __init__(self, table_prefix='', min_size=1, max_size=10, timeout=30.0, max_idle=600.0,
+                 max_lifetime=3600.0, check=True, **config):
+        config.setdefault('autocommit', True)
+        self.table_prefix = table_prefix
+        self.pool = ConnectionPool(lambda: MySqlDriver(**config), min_size, max_size, timeout, max_idle,
+                                   max_lifetime, check)
+        self.driver = PooledDriver(self.pool)
+        Connection.__init__(self, self.driver, table_prefix)
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    def close(self):
+        self.pool.close()
+
+
+class ReplicatedMysqlConnection(ReplicatedConnection):
+    """
+    Read/write splitting over a primary and replicas, each given as a MysqlConnection
+    config. With pool, a dict of ConnectionPool options, every server gets its own pool.
+    """
+
+    def __init__(self, primary, replicas, table_prefix='', pool=None, **options):
+        self.table_prefix = table_prefix
+        super().__init__(self.create_driver(primary, pool), [self.create_driver(c, pool) for c in replicas],
+                         table_prefix, **options)
+
+    @staticmethod
+    def create_driver(config, pool=None):
+        if pool is None:
+            return MySqlDriver(**config)
+        config = {'autocommit': True, **config}
+        return PooledDriver(ConnectionPool(lambda: MySqlDriver(**config), **pool))
+
+    def get_grammar(self):
+        return MysqlGrammar(self.table_prefix)
@@ -1,9 +1,10 @@
-from .grammar import Grammar, Builder, flatten
+from .grammar import Grammar, Builder
 
 
 class MysqlGrammar(Grammar):
-    def __init__(self, prefix):
-        super().__init__(prefix)
+    def __init__(self, prefix, cache_size=256):
+        super().__init__(prefix, cache_size)
+        self.supports_row_values = True
         self.select_components = [
             'aggregate_',
             'columns_',
@@ -18,16 +19,16 @@ class MysqlGrammar(Grammar):
             'lock_',
         ]
 
-    def compile_select(self, query: Builder):
-        sql = super().compile_select(query)
+    def _compile_select(self, query: Builder):
+        sql = super()._compile_select(query)
         if query.unions_:
             sql = '(' + sql + ')' + self._compile_unions(query, query.unions_)
 
         return sql
 
     def _compile_union(self, union):
-        conj = ' union all ' if union['all'] else ' union '
-        return conj + '(' + union['query'].to_sql() + ')'
+        conj = ' union all ' if union.all else ' union '
+        return conj + '(' + union.query.to_sql() + ')'
 
     def _compile_lock(self, query, value):
         if str == type(value):
@@ -42,8 +43,18 @@ class MysqlGrammar(Grammar):
 
     def compile_insert_or_ignore(self, query, values):
         sql = self.compile_insert(query, values)
-        sql.replace('insert', 'insert ignore', 1)
-        return sql
+        return sql.replace('insert', 'insert ignore', 1)
+
+    def compile_upsert(self, query, values, unique_by, update):
+        # mysql has no conflict target, a collision on any unique key updates the row.
+        # values() is deprecated since mysql 8.0.20 but, unlike the row alias form, mariadb supports it
+        if not update:
+            # a no-op update skips only the colliding rows, where insert ignore would also
+            # turn not null, truncation and foreign key errors into warnings
+            column = self.wrap(unique_by[0])
+            return self.compile_insert(query, values) + f' on duplicate key update {column} = {column}'
+        columns = ', '.join(f'{column} = values({column})' for column in map(self.wrap, update))
+        return self.compile_insert(query, values) + ' on duplicate key update ' + columns
 
     def compile_update(self, query: Builder, values):
         table = self.wrap_table(query.from_)
@@ -93,10 +104,11 @@ class MysqlGrammar(Grammar):
             self._compile_delete_without_joins(query, table, where)
 
     def prepare_binding_for_delete(self, bindings):
-        clean = dict(bindings)
-        clean['join'] = []
-        clean['select'] = []
-        return bindings['join'] + flatten(clean)
+        return bindings['join'] + bindings.without('select', 'join')
+
+    def compile_delete_batch(self, query: Builder):
+        # Builder refuses joins here, a mysql delete with joins takes no limit
+        return self.compile_delete(query)
 
     def wrap_value(self, value):
         if value == '*':
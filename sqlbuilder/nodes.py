@@ -0,0 +1,127 @@
+class Node:
+    """
+    Base of the query clause nodes. Every concrete node lists all of its
+    fields in __slots__, which is also the order they are fingerprinted in.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ', '.join(f'{k}={getattr(self, k)!r}' for k in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+class Basic(Node):
+    __slots__ = ('boolean', 'column', 'operator', 'value')
+
+    def __init__(self, column, operator, value, boolean='and'):
+        self.boolean = boolean
+        self.column = column
+        self.operator = operator
+        self.value = value
+
+
+class In(Node):
+    __slots__ = ('boolean', 'column', 'values', 'not_')
+
+    def __init__(self, column, values, boolean='and', not_=False):
+        self.boolean = boolean
+        self.column = column
+        self.values = values
+        self.not_ = not_
+
+
+class InSub(Node):
+    __slots__ = ('boolean', 'column', 'query', 'not_')
+
+    def __init__(self, column, query, boolean='and', not_=False):
+        self.boolean = boolean
+        self.column = column
+        self.query = query
+        self.not_ = not_
+
+
+class Null(Node):
+    __slots__ = ('boolean', 'column', 'not_')
+
+    def __init__(self, column, boolean='and', not_=False):
+        self.boolean = boolean
+        self.column = column
+        self.not_ = not_
+
+
+class Between(Node):
+    __slots__ = ('boolean', 'column', 'not_')
+
+    def __init__(self, column, boolean='and', not_=False):
+        self.boolean = boolean
+        self.column = column
+        self.not_ = not_
+
+
+class Nested(Node):
+    __slots__ = ('boolean', 'query')
+
+    def __init__(self, query, boolean='and'):
+        self.boolean = boolean
+        self.query = query
+
+
+class Exists(Node):
+    __slots__ = ('boolean', 'query', 'not_')
+
+    def __init__(self, query, boolean='and', not_=False):
+        self.boolean = boolean
+        self.query = query
+        self.not_ = not_
+
+
+class Column(Node):
+    __slots__ = ('boolean', 'first', 'operator', 'second')
+
+    def __init__(self, first, operator, second, boolean='and'):
+        self.boolean = boolean
+        self.first = first
+        self.operator = operator
+        self.second = second
+
+
+class Raw(Node):
+    __slots__ = ('boolean', 'sql')
+
+    def __init__(self, sql, boolean='and'):
+        self.boolean = boolean
+        self.sql = sql
+
+
+class Sub(Node):
+    __slots__ = ('boolean', 'column', 'operator', 'query')
+
+    def __init__(self, column, operator, query, boolean='and'):
+        self.boolean = boolean
+        self.column = column
+        self.operator = operator
+        self.query = query
+
+
+class Order(Node):
+    __slots__ = ('column', 'direction')
+
+    def __init__(self, column, direction='asc'):
+        self.column = column
+        self.direction = direction
+
+
+class Union(Node):
+    __slots__ = ('query', 'all')
+
+    def __init__(self, query, all_union=False):
+        self.query = query
+        self.all = all_union
+
+
+class Aggregate(Node):
+    __slots__ = ('function', 'columns')
+
+    def __init__(self, function, columns):
+        self.function = function
+        self.columns = columns
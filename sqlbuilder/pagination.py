@@ -0,0 +1,78 @@
+import base64
+import datetime
+import decimal
+import json
+
+
+class InvalidCursorException(Exception):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'$d': value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {'$dec': str(value)}
+    raise TypeError(f'Can not encode {type(value).__name__} in a cursor')
+
+
+def _decode_value(value):
+    if '$dt' in value:
+        return datetime.datetime.fromisoformat(value['$dt'])
+    if '$d' in value:
+        return datetime.date.fromisoformat(value['$d'])
+    if '$dec' in value:
+        return decimal.Decimal(value['$dec'])
+    return value
+
+
+def encode_cursor(values, direction='next'):
+    payload = json.dumps({'v': list(values), 'd': direction}, default=_encode_value, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor):
+    """
+    :param cursor: opaque string produced by encode_cursor
+    :return: (values, direction)
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()), object_hook=_decode_value)
+        direction = payload['d']
+        values = payload['v']
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursorException(cursor) from e
+    if direction not in ('next', 'prev') or type(values) != list:
+        raise InvalidCursorException(cursor)
+    return values, direction
+
+
+class CursorPaginator:
+    __slots__ = ('items', 'per_page', 'next_cursor', 'prev_cursor')
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def to_dict(self):
+        return {
+            'data': self.items,
+            'per_page': self.per_page,
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor,
+        }
@@ -0,0 +1,311 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from .driver import DriverBase
+from .rows import format_args
+
+
+class PoolTimeoutException(Exception):
+    pass
+
+
+class PooledEntry:
+    __slots__ = ('driver', 'created_at', 'last_used')
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of drivers. Idle drivers are reused most recently used first;
+    the ones left idle longer than max_idle are closed while the pool is above
+    min_size, and every driver is recycled once it is older than max_lifetime.
+    """
+
+    def __init__(self, factory, min_size=1, max_size=10, timeout=30.0, max_idle=600.0, max_lifetime=3600.0,
+                 check=True):
+        """
+        :param factory: callable returning a new driver
+        :param min_size: drivers opened up front and kept through idle eviction
+        :param max_size: upper bound on open drivers
+        :param timeout: seconds checkout waits for a free driver
+        :param max_idle: seconds an idle driver is kept above min_size, None keeps it forever
+        :param max_lifetime: seconds before a driver is recycled, None keeps it forever
+        :param check: ping the driver on checkout and replace it when dead
+        """
+        if max_size < 1 or min_size > max_size:
+            raise ValueError(f'invalid pool size min={min_size} max={max_size}')
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check = check
+        self.idle = deque()
+        self.size = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.recycled = 0
+
+        for _ in range(min_size):
+            self.idle.append(PooledEntry(factory()))
+            self.size += 1
+
+    def _expired(self, entry, now):
+        return self.max_lifetime is not None and now - entry.created_at >= self.max_lifetime
+
+    def _discard(self, entry):
+        try:
+            entry.driver.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self, now):
+        # the oldest idle drivers sit at the left end
+        evicted = []
+        while self.idle and self.size > self.min_size and self.max_idle is not None \
+                and now - self.idle[0].last_used >= self.max_idle:
+            evicted.append(self.idle.popleft())
+            self.size -= 1
+        return evicted
+
+    def checkout(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            entry, create, discarded = self._reserve(deadline)
+            for stale in discarded:
+                self._discard(stale)
+
+            if create:
+                try:
+                    entry = PooledEntry(self.factory())
+                except Exception:
+                    self._release_slot()
+                    raise
+            elif self.check and not entry.driver.ping():
+                self._discard(entry)
+                self._release_slot()
+                continue
+
+            entry.last_used = time.monotonic()
+            return entry
+
+    def _reserve(self, deadline):
+        # anything evicted frees a slot, so the discarded list is never dropped by a wait
+        with self.condition:
+            waited = False
+            while True:
+                if self.closed:
+                    raise PoolTimeoutException('pool is closed')
+                now = time.monotonic()
+                discarded = self._evict_idle(now)
+                while self.idle:
+                    entry = self.idle.pop()
+                    if not self._expired(entry, now):
+                        self.checkouts += 1
+                        return entry, False, discarded
+                    discarded.append(entry)
+                    self.size -= 1
+                    self.recycled += 1
+                if self.size < self.max_size:
+                    self.size += 1
+                    self.checkouts += 1
+                    return None, True, discarded
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeoutException(f'no free connection within {self.max_size} connections')
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                self.condition.wait(remaining)
+
+    def _release_slot(self):
+        with self.condition:
+            self.size -= 1
+            self.condition.notify()
+
+    def checkin(self, entry):
+        now = time.monotonic()
+        with self.condition:
+            discard = self.closed or self._expired(entry, now)
+            if discard:
+                self.size -= 1
+                self.recycled += not self.closed
+            else:
+                entry.last_used = now
+                self.idle.append(entry)
+            self.condition.notify()
+        if discard:
+            self._discard(entry)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            idle, self.idle = list(self.idle), deque()
+            self.size -= len(idle)
+            self.condition.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'idle': len(self.idle),
+                'in_use': self.size - len(self.idle),
+                'max_size': self.max_size,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'recycled': self.recycled,
+            }
+
+
+class PooledDriver(DriverBase):
+    """
+    Driver facade that checks a driver out of the pool for each call. Between
+    start_transaction and commit/rollback the calling thread stays pinned to one
+    driver, so the statements of a transaction share a session.
+    """
+    thread_safe = True
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.local = threading.local()
+
+    def _pinned(self):
+        return getattr(self.local, 'entry', None)
+
+    @contextmanager
+    def _checkout(self):
+        entry = self._pinned()
+        if entry is not None:
+            yield entry.driver
+            return
+
+        entry = self.pool.checkout()
+        try:
+            yield entry.driver
+        finally:
+            self.pool.checkin(entry)
+
+    def statement(self, query, bindings=None):
+        with self._checkout() as driver:
+            result = driver.statement(query, bindings)
+            self.local.last_rowid = driver.last_rowid()
+            return result
+
+    def statement_many(self, query, bindings):
+        with self._checkout() as driver:
+            result = driver.statement_many(query, bindings)
+            self.local.last_rowid = driver.last_rowid()
+            return result
+
+    def copy_from(self, query, rows, types=None):
+        with self._checkout() as driver:
+            return driver.copy_from(query, rows, types)
+
+    def fetch_one(self, query, bindings=None):
+        with self._checkout() as driver:
+            return driver.fetch_one(query, bindings)
+
+    def fetch_all(self, query, bindings=None, row_format='dict'):
+        with self._checkout() as driver:
+            return driver.fetch_all(query, bindings, *format_args(row_format))
+
+    def cursor(self, query, bindings=None, batch_size=1000):
+        """
+        The driver stays checked out until the returned generator is exhausted or closed.
+        """
+        entry = self._pinned()
+        if entry is not None:
+            return entry.driver.cursor(query, bindings, batch_size)
+
+        entry = self.pool.checkout()
+        try:
+            rows = entry.driver.cursor(query, bindings, batch_size)
+        except Exception:
+            self.pool.checkin(entry)
+            raise
+        return self._iterate(entry, rows)
+
+    def fetch_batches(self, query, bindings=None, batch_size=10000):
+        entry = self._pinned()
+        if entry is not None:
+            return entry.driver.fetch_batches(query, bindings, batch_size)
+
+        entry = self.pool.checkout()
+        try:
+            columns, batches = entry.driver.fetch_batches(query, bindings, batch_size)
+        except Exception:
+            self.pool.checkin(entry)
+            raise
+        return columns, self._iterate(entry, batches)
+
+    def _iterate(self, entry, rows):
+        try:
+            yield from rows
+        finally:
+            rows.close()
+            self.pool.checkin(entry)
+
+    def last_rowid(self):
+        return getattr(self.local, 'last_rowid', None)
+
+    def start_transaction(self):
+        if self._pinned() is not None:
+            return
+        entry = self.pool.checkout()
+        try:
+            entry.driver.start_transaction()
+        except Exception:
+            self.pool.checkin(entry)
+            raise
+        self.local.entry = entry
+
+    def _finish(self, method):
+        entry = self._pinned()
+        if entry is None:
+            return
+        self.local.entry = None
+        try:
+            getattr(entry.driver, method)()
+        finally:
+            self.pool.checkin(entry)
+
+    def commit(self):
+        self._finish('commit')
+
+    def rollback(self):
+        self._finish('rollback')
+
+    def connection_id(self):
+        entry = self._pinned()
+        return entry.driver.connection_id() if entry is not None else None
+
+    @property
+    def max_parameters(self):
+        with self._checkout() as driver:
+            return driver.max_parameters
+
+    @property
+    def max_packet_size(self):
+        with self._checkout() as driver:
+            return driver.max_packet_size
+
+    def stats(self):
+        return self.pool.stats()
+
+    def close(self):
+        self.pool.close()
@@ -1,15 +1,63 @@
-
 from .connection import Connection
 from .postgresgrammar import PostgresGrammar
 from .driver import PostgresDriver
+from .pool import ConnectionPool, PooledDriver
+from .replication import ReplicatedConnection
 from psycopg.conninfo import make_conninfo
 
 
 class PostgresConnection(Connection):
-    def __init__(self, table_prefix='', **config):
+    def __init__(self, table_prefix='', statement_cache_size=0, **config):
         self.table_prefix = table_prefix
-        self.driver = PostgresDriver(make_conninfo(**config))
+        self.driver = PostgresDriver(make_conninfo(**config), statement_cache_size)
         super().__init__(self.driver, table_prefix)
 
     def get_grammar(self):
         return PostgresGrammar(self.table_prefix)
+
+
+class PooledPostgresConnection(PostgresConnection):
+    """
+    PostgresConnection over a pool of drivers; one instance can be shared by threads.
+    Pooled sessions run in autocommit unless a transaction is started.
+    """
+
+    def __init__(self, table_prefix='', min_size=1, max_size=10, timeout=30.0, max_idle=600.0,
+                 max_lifetime=3600.0, check=True, statement_cache_size=0, **config):
+        conninfo = make_conninfo(**config)
+        self.table_prefix = table_prefix
+        self.pool = ConnectionPool(lambda: PostgresDriver(conninfo, statement_cache_size, autocommit=True),
+                                   min_size, max_size, timeout, max_idle, max_lifetime, check)
+        self.driver = PooledDriver(self.pool)
+        Connection.__init__(self, self.driver, table_prefix)
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    def close(self):
+        self.pool.close()
+
+
+class ReplicatedPostgresConnection(ReplicatedConnection):
+    """
+    Read/write splitting over a primary and replicas, each given as a PostgresConnection
+    config. With pool, a dict of ConnectionPool options, every server gets its own pool.
+    """
+
+    def __init__(self, primary, replicas, table_prefix='', pool=None, **options):
+        self.table_prefix = table_prefix
+        super().__init__(self.create_driver(primary, pool), [self.create_driver(c, pool) for c in replicas],
+                         table_prefix, **options)
+
+    @staticmethod
+    def create_driver(config, pool=None):
+        config = dict(config)
+        statement_cache_size = config.pop('statement_cache_size', 0)
+        conninfo = make_conninfo(**config)
+        if pool is None:
+            return PostgresDriver(conninfo, statement_cache_size)
+        return PooledDriver(ConnectionPool(lambda: PostgresDriver(conninfo, statement_cache_size, autocommit=True),
+                                           **pool))
+
+    def get_grammar(self):
+        return PostgresGrammar(self.table_prefix)
@@ -1,9 +1,11 @@
-from .grammar import Grammar, Builder, flatten
+import re
+from .grammar import Grammar, Builder
 
 
 class PostgresGrammar(Grammar):
-    def __init__(self, prefix):
-        super().__init__(prefix)
+    def __init__(self, prefix, cache_size=256):
+        super().__init__(prefix, cache_size)
+        self.supports_row_values = True
         self.select_components = [
             'aggregate_',
             'columns_',
@@ -34,8 +36,19 @@ class PostgresGrammar(Grammar):
         table = self.wrap_table(query.from_)
         return super().compile_insert(query, values) if values else f"insert into {table} DEFAULT VALUES"
 
+    def compile_copy_from(self, query, columns, binary=False):
+        table = self.wrap_table(query.from_)
+        fmt = ' (format binary)' if binary else ''
+        return f'copy {table} ({self.columnize(columns)}) from stdin{fmt}'
+
     def compile_insert_or_ignore(self, query, values):
-        return self.compile_insert(query, values) + ' no conflict on nothing'
+        return self.compile_insert(query, values) + ' on conflict do nothing'
+
+    def compile_upsert(self, query, values, unique_by, update):
+        sql = self.compile_insert(query, values) + f' on conflict ({self.columnize(unique_by)}) do '
+        if not update:
+            return sql + 'nothing'
+        return sql + 'update set ' + ', '.join(f'{column} = excluded.{column}' for column in map(self.wrap, update))
 
     def compile_insert_get_id(self, query, values, sequence=None):
         return self.compile_insert(query, values) + ' returning ' + self.wrap(sequence if sequence else 'id')
@@ -78,19 +91,41 @@ class PostgresGrammar(Grammar):
         join_wheres = []
         for join in query.joins_:
             for where in join.wheres_:
-                method = '_where_%s' % where['type'].lower()
-                fn = getattr(self, method)
-                join_wheres.append(where['boolean'] + ' ' + fn(query, where))
+                fn = self.where_compilers[type(where)]
+                join_wheres.append(where.boolean + ' ' + fn(query, where))
 
         return ' '.join(join_wheres)
 
     def prepare_bindings_for_update(self, bindings, values):
-        without_join = bindings
-        without_join['join'] = []
-        return list(values.values()) + bindings['join'] + flatten(without_join)
+        return tuple(values.values()) + bindings['where'] + bindings['join']
+
+    def compile_update_batch(self, query: Builder, records, key, types=None):
+        """
+        update ... from (values ...) joined on key. Postgres types the values list from
+        its first row, so types (column => sql type) casts the parameters there, for
+        the string values bound to columns text does not assign to (json, enums...).
+        The values list names its columns "v.<column>", so the unqualified columns of
+        the query's where clauses do not turn ambiguous.
+        """
+        table = self.wrap_table(query.from_)
+        alias = re.split(r'\s+as\s+', table, flags=re.IGNORECASE)[-1]
+        columns = list(records[0])
+        casts = [f'::{types[column]}' if types and column in types else '' for column in columns]
+        rows = ['(' + ', '.join(self.parameter(record[column]) + (cast if i == 0 else '')
+                                for column, cast in zip(columns, casts)) + ')'
+                for i, record in enumerate(records)]
+        values = {column: self.wrap_value('v.' + column) for column in columns}
+        sets = ', '.join(f'{self.wrap(column)} = "v".{values[column]}' for column in columns if column != key)
+        where = self._compile_update_batch_wheres(query, f'{alias}.{self.wrap(key)} = "v".{values[key]}')
+
+        return f'update {table} set {sets} from (values {", ".join(rows)}) as "v"({", ".join(values.values())}) {where}'
+
+    def prepare_bindings_for_update_batch(self, bindings, records, key):
+        values = tuple(v for record in records for v in record.values() if not self.is_expression(v))
+        return values + bindings['where']
 
     def _compile_delete_with_joins(self, query, table):
-        using = ' USING' + ', '.join(list(map(lambda x: self.wrap(x.table), query.joins_)))
+        using = ' USING ' + ', '.join(list(map(lambda x: self.wrap(x.table), query.joins_)))
         where = ' ' + self._compile_update_wheres(query) if query.wheres_ else ''
         return f'delete from {table}{using} {where}'
 
@@ -110,14 +145,20 @@ class PostgresGrammar(Grammar):
 
         return self._compile_delete_with_joins(query, table) if query.joins_ else super().compile_delete(query)
 
+    def compile_delete_batch(self, query: Builder):
+        # delete has no limit, pick the rows by physical location; = any(array(...)) plans as a tid scan
+        table = self.wrap_table(query.from_)
+        where = self._compile_wheres(query, query.wheres_)
+        orders = self._compile_orders(query, query.orders_)
+        select = ' '.join(filter(None, [f'select ctid from {table}', where, orders,
+                                        self._compile_limit(query, query.limit_)]))
+        return f'delete from {table} where ctid = any(array({select}))'
+
     def compile_truncate(self, query):
         return {'truncate ' + self.wrap_table(query.from_) + ' restart identity': []}
 
     def prepare_binding_for_delete(self, bindings):
-        clean = dict(bindings)
-        clean['where'] = []
-        clean['select'] = []
-        return bindings['where'] + flatten(clean)
+        return bindings['where'] + bindings.without('select', 'where')
 
     def wrap_value(self, value):
         if value == '*':
@@ -0,0 +1,91 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+
+class QueryLog:
+    """
+    Ring buffer of the last max_entries executed queries. Only a sample_rate share
+    of the queries is timed and recorded; every recorded entry is also handed to
+    the sinks.
+    """
+
+    def __init__(self, max_entries=1000, sample_rate=1.0, redact=False, sinks=()):
+        """
+        :param max_entries: entries kept in memory, older ones are dropped
+        :param sample_rate: share of the queries recorded, between 0 and 1
+        :param redact: True to drop the binding values, or a callable mapping the bindings to what is kept
+        :param sinks: objects with a write(entry) method, such as LoggingSink and JsonlSink
+        """
+        self.entries = deque(maxlen=max_entries)
+        self.sample_rate = sample_rate
+        self.redact = redact
+        self.sinks = list(sinks)
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def _bindings(self, bindings):
+        if not self.redact:
+            return bindings
+        if callable(self.redact):
+            return self.redact(bindings)
+        return ('?',) * len(bindings)
+
+    def record(self, query, bindings, elapsed_ns, error=None):
+        entry = {
+            'query': query,
+            'bindings': self._bindings(bindings),
+            'time': elapsed_ns / 1e6,
+            'at': time.time(),
+        }
+        if error is not None:
+            entry['error'] = f'{type(error).__name__}: {error}'
+        self.entries.append(entry)
+        for sink in self.sinks:
+            sink.write(entry)
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __iter__(self):
+        return iter(list(self.entries))
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class LoggingSink:
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger if logger is not None else logging.getLogger('sqlbuilder.query')
+        self.level = level
+
+    def write(self, entry):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, '%.3fms %s %r', entry['time'], entry['query'], entry['bindings'],
+                            extra={'query_log': entry})
+
+
+class JsonlSink:
+    """
+    Appends one json object per query to a file. Bindings that are not json
+    types are written with str().
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding='utf-8', buffering=1)
+        self.lock = threading.Lock()
+
+    def write(self, entry):
+        line = json.dumps(entry, default=str, separators=(',', ':'))
+        with self.lock:
+            self.file.write(line + '\n')
+
+    def close(self):
+        self.file.close()
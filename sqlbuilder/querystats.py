@@ -0,0 +1,147 @@
+import math
+import re
+import threading
+from functools import lru_cache
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w"`$])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b', re.IGNORECASE)
+_PLACEHOLDER = re.compile(r'%s|\$\d+|%\(\w+\)s')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ROWS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_SPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """
+    Normalize a statement so calls differing only in literal values, placeholder
+    style or the length of value lists share one fingerprint.
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _LIST.sub('(...)', sql)
+    sql = _ROWS.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip().lower()
+
+
+class LogHistogram:
+    """
+    Streaming histogram over geometric buckets, so quantiles are within the bucket
+    growth factor (2%) of the exact value at a memory cost bounded by the range.
+    """
+    __slots__ = ('buckets', 'count')
+    growth = 1.02
+    log_growth = math.log(growth)
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+
+    def add(self, value):
+        index = int(math.log(value) / self.log_growth) if value > 1 else 0
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return self.growth ** (index + 0.5)
+        return self.growth ** (max(self.buckets) + 0.5)
+
+
+class StatementStats:
+    __slots__ = ('fingerprint', 'calls', 'errors', 'total_ns', 'min_ns', 'max_ns', 'rows', 'histogram')
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.calls = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self.rows = 0
+        self.histogram = LogHistogram()
+
+    def add(self, elapsed_ns, rows, error):
+        self.calls += 1
+        self.errors += error
+        self.total_ns += elapsed_ns
+        self.min_ns = elapsed_ns if self.min_ns is None else min(self.min_ns, elapsed_ns)
+        self.max_ns = max(self.max_ns, elapsed_ns)
+        if rows is not None:
+            self.rows += rows
+        self.histogram.add(elapsed_ns)
+
+    def quantile(self, q):
+        # a bucket midpoint can fall outside the observed range
+        return min(max(self.histogram.quantile(q), self.min_ns), self.max_ns)
+
+    def to_dict(self):
+        ms = 1e6
+        return {
+            'query': self.fingerprint,
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': self.total_ns / ms,
+            'mean_ms': self.total_ns / self.calls / ms,
+            'min_ms': self.min_ns / ms,
+            'max_ms': self.max_ns / ms,
+            'p50_ms': self.quantile(0.5) / ms,
+            'p95_ms': self.quantile(0.95) / ms,
+            'p99_ms': self.quantile(0.99) / ms,
+            'rows': self.rows,
+        }
+
+
+class QueryStats:
+    """
+    Client-side counterpart of pg_stat_statements: call count, latency and rows
+    returned per statement fingerprint. Past max_statements the least called
+    fingerprint makes room for the new one.
+    """
+    orders = ('total_ms', 'mean_ms', 'p95_ms', 'p99_ms', 'max_ms', 'calls', 'errors', 'rows')
+
+    def __init__(self, max_statements=5000):
+        self.max_statements = max_statements
+        self.statements = {}
+        self.lock = threading.Lock()
+
+    def record(self, sql, elapsed_ns, rows=None, error=False):
+        key = fingerprint(sql)
+        with self.lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                if len(self.statements) >= self.max_statements:
+                    del self.statements[min(self.statements.values(), key=lambda s: s.calls).fingerprint]
+                stats = self.statements[key] = StatementStats(key)
+            stats.add(elapsed_ns, rows, error)
+
+    def report(self, n=10, order_by='total_ms'):
+        """
+        :return: the top n fingerprints by order_by, as dicts
+        """
+        if order_by not in self.orders:
+            raise ValueError(f'can not order the report by {order_by}')
+        with self.lock:
+            rows = [stats.to_dict() for stats in self.statements.values()]
+        rows.sort(key=lambda row: row[order_by], reverse=True)
+        return rows[:n]
+
+    def format_report(self, n=10, order_by='total_ms'):
+        lines = [f"{'calls':>8} {'total ms':>11} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} "
+                 f"{'rows':>9} {'errors':>6}  query"]
+        for row in self.report(n, order_by):
+            lines.append(f"{row['calls']:>8} {row['total_ms']:>11.2f} {row['mean_ms']:>9.3f} {row['p50_ms']:>9.3f} "
+                         f"{row['p95_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['rows']:>9} {row['errors']:>6}  "
+                         f"{row['query']}")
+        return '\n'.join(lines)
+
+    def reset(self):
+        with self.lock:
+            self.statements.clear()
@@ -0,0 +1,149 @@
+import itertools
+import threading
+import time
+from .connection import Connection
+from .rows import format_args
+
+
+class ReplicatedConnection(Connection):
+    """
+    Connection over a primary driver and any number of replica drivers. Selects
+    go to a replica unless the builder asked for the primary, the thread is in a
+    transaction or wrote less than sticky_window seconds ago; writes always run on
+    the primary, which is self.driver.
+    """
+    strategies = ('round_robin', 'least_latency')
+
+    def __init__(self, primary, replicas, table_prefix='', strategy='round_robin', sticky_window=1.0, decay=0.2):
+        """
+        :param primary: driver taking the writes
+        :param replicas: drivers taking the reads
+        :param table_prefix:
+        :param strategy: round_robin, or least_latency to pick the replica with the lowest moving average
+        :param sticky_window: seconds reads stay on the primary after a write, for read-your-writes
+        :param decay: weight of the latest sample in the latency moving average
+        """
+        if strategy not in self.strategies:
+            raise ValueError(f'unknown replica strategy {strategy}')
+        super().__init__(primary, table_prefix)
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.sticky_window = sticky_window
+        self.decay = decay
+        self.latencies = [0.0] * len(self.replicas)
+        self.counter = itertools.count()
+        self.local = threading.local()
+
+    def replica_index(self, use_primary=False):
+        """
+        :return: index of the replica to read from, None to read from the primary
+        """
+        if use_primary or not self.replicas or getattr(self.local, 'in_transaction', False):
+            return None
+        last_write = getattr(self.local, 'last_write', None)
+        if last_write is not None and time.monotonic() - last_write < self.sticky_window:
+            return None
+
+        if self.strategy == 'least_latency':
+            return min(range(len(self.replicas)), key=self.latencies.__getitem__)
+        return next(self.counter) % len(self.replicas)
+
+    def read_driver(self, use_primary=False):
+        index = self.replica_index(use_primary)
+        return self.driver if index is None else self.replicas[index]
+
+    def _observe(self, index, elapsed):
+        # an unmeasured replica reads 0, so every replica gets sampled before the average decides
+        average = self.latencies[index]
+        self.latencies[index] = elapsed if not average else average + self.decay * (elapsed - average)
+
+    def _written(self):
+        self.local.last_write = time.monotonic()
+
+    def select(self, query, bindings, use_primary=False, row_format='dict'):
+        index = self.replica_index(use_primary)
+        if index is None:
+            return super().select(query, bindings, row_format=row_format)
+        bindings = bindings if bindings else ()
+        driver = self.replicas[index]
+
+        def fn(sql, binder):
+            start = time.perf_counter()
+            rows = driver.fetch_all(sql, binder, *format_args(row_format))
+            self._observe(index, time.perf_counter() - start)
+            return rows
+
+        return self.run(query, bindings, fn)
+
+    def cursor(self, query, bindings, batch_size=1000, use_primary=False):
+        driver = self.read_driver(use_primary)
+        bindings = bindings if bindings else ()
+
+        def fn(sql, binder):
+            return driver.cursor(sql, binder, batch_size)
+
+        return self.run(query, bindings, fn)
+
+    def fetch_batches(self, query, bindings, batch_size=10000, use_primary=False):
+        driver = self.read_driver(use_primary)
+        bindings = bindings if bindings else ()
+
+        def fn(sql, binder):
+            return driver.fetch_batches(sql, binder, batch_size)
+
+        return self.run(query, bindings, fn)
+
+    def statement(self, query, bindings):
+        try:
+            return super().statement(query, bindings)
+        finally:
+            self._written()
+
+    def insert(self, query, bindings):
+        try:
+            return super().insert(query, bindings)
+        finally:
+            self._written()
+
+    def effecting_statement(self, query, bindings):
+        try:
+            return super().effecting_statement(query, bindings)
+        finally:
+            self._written()
+
+    def statement_many(self, query, bindings):
+        try:
+            return super().statement_many(query, bindings)
+        finally:
+            self._written()
+
+    def copy_from(self, query, rows, types=None):
+        try:
+            return super().copy_from(query, rows, types)
+        finally:
+            self._written()
+
+    def start_transaction(self):
+        result = super().start_transaction()
+        self.local.in_transaction = True
+        return result
+
+    def commit(self):
+        try:
+            return super().commit()
+        finally:
+            self.local.in_transaction = False
+            self._written()
+
+    def rollback(self):
+        try:
+            return super().rollback()
+        finally:
+            self.local.in_transaction = False
+
+    def replica_stats(self):
+        return [{'index': i, 'latency': latency} for i, latency in enumerate(self.latencies)]
+
+    def close(self):
+        for driver in [self.driver] + self.replicas:
+            driver.close()
@@ -0,0 +1,183 @@
+import keyword
+from collections import namedtuple
+from functools import lru_cache
+from itertools import starmap
+
+ROW_FORMATS = ('dict', 'tuple', 'namedtuple', 'slots', 'columnar')
+
+
+def _field_names(names):
+    # same renaming rule as namedtuple(rename=True), so both classes agree on attributes:
+    # invalid, keyword, underscored and repeated names become _<index>
+    fields = []
+    seen = set()
+    for i, name in enumerate(names):
+        if not name.isidentifier() or keyword.iskeyword(name) or name.startswith('_') or name in seen:
+            name = f'_{i}'
+        seen.add(name)
+        fields.append(name)
+    return tuple(fields)
+
+
+class SlotsRow:
+    """
+    Base of the generated row classes: one class per result shape, holding the
+    values in __slots__. Columns are reachable as attributes, by name or by index.
+    """
+    __slots__ = ()
+    _fields = ()
+    _columns = ()
+
+    def __iter__(self):
+        for field in self._fields:
+            yield getattr(self, field)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getitem__(self, key):
+        if type(key) == int:
+            return getattr(self, self._fields[key])
+        try:
+            return getattr(self, self._fields[self._columns.index(key)])
+        except ValueError:
+            raise KeyError(key) from None
+
+    def __eq__(self, other):
+        return type(other) == type(self) and tuple(self) == tuple(other)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def _asdict(self):
+        return dict(zip(self._columns, self))
+
+    def __repr__(self):
+        values = ', '.join(f'{field}={value!r}' for field, value in zip(self._fields, self))
+        return f'Row({values})'
+
+
+@lru_cache(maxsize=256)
+def row_class(names):
+    """
+    :param names: tuple of column names
+    :return: the SlotsRow subclass for that shape, built once
+    """
+    fields = _field_names(names)
+    args = ', '.join(fields)
+    body = ''.join(f'\n    self.{field} = {field}' for field in fields) or '\n    pass'
+    namespace = {}
+    exec(f'def __init__(self, {args}):{body}', namespace)
+    return type('Row', (SlotsRow,), {
+        '__slots__': fields,
+        '_fields': fields,
+        '_columns': tuple(names),
+        '__init__': namespace['__init__'],
+    })
+
+
+@lru_cache(maxsize=256)
+def namedtuple_class(names):
+    return namedtuple('Row', names, rename=True)
+
+
+def format_args(row_format):
+    """
+    Extra arguments for driver.fetch_all: dict rows are requested without any, so
+    drivers written before row formats, taking (query, bindings), keep working.
+    """
+    return () if row_format == 'dict' else (row_format,)
+
+
+def row_count(result):
+    """
+    :return: number of rows in a fetch result of any format, None for anything else
+    """
+    if type(result) == list:
+        return len(result)
+    if type(result) == dict:
+        return len(next(iter(result.values()))) if result else 0
+    return None
+
+
+def check_format(row_format):
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f'unknown row format {row_format}, expected one of {", ".join(ROW_FORMATS)}')
+
+
+def shape(names, rows, row_format='dict'):
+    """
+    Turn the tuples fetched for the columns names into rows of row_format.
+    """
+    if row_format == 'tuple':
+        return rows if type(rows) == list else list(rows)
+    if row_format == 'dict':
+        return [dict(zip(names, row)) for row in rows]
+    if row_format == 'namedtuple':
+        return list(map(namedtuple_class(tuple(names))._make, rows))
+    if row_format == 'slots':
+        return list(starmap(row_class(tuple(names)), rows))
+    if row_format == 'columnar':
+        return columnar(names, (rows,))
+    check_format(row_format)
+
+
+def columnar(names, batches):
+    """
+    Build a dict of column lists from batches of tuples, so only one batch of
+    tuples is alive at a time.
+    """
+    columns = [[] for _ in names]
+    for batch in batches:
+        for column, values in zip(columns, zip(*batch)):
+            column.extend(values)
+    return dict(zip(names, columns))
+
+
+def fetch(cursor, names, row_format, batch_size=10000):
+    """
+    Fetch every row left on a cursor returning tuples, in row_format.
+    """
+    if row_format != 'columnar':
+        return shape(names, cursor.fetchall(), row_format)
+
+    def batches():
+        batch = cursor.fetchmany(batch_size)
+        while batch:
+            yield batch
+            batch = cursor.fetchmany(batch_size)
+
+    return columnar(names, batches())
+
+
+def pack(rows):
+    """
+    Reduce rows of any format to (format, names, tuples), which only holds
+    builtin types, so it can be pickled and turned back by unpack.
+    """
+    if type(rows) == dict:
+        return 'columnar', tuple(rows), list(zip(*rows.values()))
+    rows = rows if type(rows) == list else list(rows)
+    if not rows:
+        return 'tuple', None, []
+    first = rows[0]
+    if type(first) == dict:
+        names = tuple(first)
+        if all(type(row) == dict and tuple(row) == names for row in rows):
+            return 'dict', names, [tuple(row.values()) for row in rows]
+        return 'raw', None, [dict(row) for row in rows]
+    if isinstance(first, SlotsRow):
+        return 'slots', first._columns, [tuple(row) for row in rows]
+    if isinstance(first, tuple) and hasattr(first, '_fields'):
+        return 'namedtuple', first._fields, [tuple(row) for row in rows]
+    return 'tuple', None, rows
+
+
+def unpack(row_format, names, rows):
+    if row_format == 'raw':
+        return [dict(row) for row in rows]
+    if row_format == 'columnar':
+        if not rows:
+            return {name: [] for name in names}
+        return {name: list(values) for name, values in zip(names, zip(*rows))}
+    return shape(names, rows, row_format) if names is not None else list(rows)
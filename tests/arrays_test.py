@@ -0,0 +1,72 @@
+import datetime
+import unittest
+from decimal import Decimal
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+from sqlbuilder.connection import Connection
+from sqlbuilder.driver import DriverBase
+
+UTC = datetime.timezone.utc
+
+
+class BatchDriver(DriverBase):
+    columns = [('id', 'int'), ('score', 'float'), ('parent', 'int'), ('created', 'datetime'), ('price', 'object')]
+    rows = [
+        (1, 0.5, 7, datetime.datetime(2024, 1, 1, 12, tzinfo=UTC), Decimal('1.10')),
+        (2, 1.5, 8, datetime.datetime(2024, 1, 2), None),
+        (3, 2.5, None, None, Decimal('3.30')),
+    ]
+
+    def __init__(self):
+        self.queries = []
+
+    def fetch_batches(self, query, bindings=None, batch_size=10000):
+        self.queries.append((query, bindings, batch_size))
+        batches = (self.rows[i:i + batch_size] for i in range(0, len(self.rows), batch_size))
+        return self.columns, batches
+
+
+class ArraysTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.driver = BatchDriver()
+        self.conn = Connection(self.driver, '')
+
+    @unittest.skipUnless(np, 'numpy is not installed')
+    def test_to_numpy(self):
+        arrays = self.conn.table('orders').where('id', '>', 0).to_numpy(batch_size=2)
+        self.assertEqual(self.driver.queries, [('select * from "orders" where "id" > ?', (0,), 2)])
+
+        self.assertEqual(arrays['id'].dtype, np.int64)
+        self.assertEqual(arrays['id'].tolist(), [1, 2, 3])
+        self.assertEqual(arrays['score'].dtype, np.float64)
+        # the second batch holds a null, so the column turns float
+        self.assertEqual(arrays['parent'].dtype, np.float64)
+        self.assertTrue(np.isnan(arrays['parent'][2]))
+        self.assertEqual(arrays['created'].dtype, np.dtype('datetime64[us]'))
+        self.assertEqual(arrays['created'][0], np.datetime64('2024-01-01T12:00:00'))
+        self.assertTrue(np.isnat(arrays['created'][2]))
+        self.assertEqual(arrays['price'].dtype, object)
+        self.assertEqual(arrays['price'].tolist(), [Decimal('1.10'), None, Decimal('3.30')])
+
+    @unittest.skipUnless(pa, 'pyarrow is not installed')
+    def test_to_arrow(self):
+        table = self.conn.table('orders').to_arrow(batch_size=1)
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.schema.field('id').type, pa.int64())
+        self.assertEqual(table.schema.field('parent').type, pa.int64())
+        self.assertEqual(table.column('parent').null_count, 1)
+        self.assertEqual(table.schema.field('created').type, pa.timestamp('us'))
+        self.assertTrue(pa.types.is_decimal(table.schema.field('price').type))
+        self.assertEqual(table.column('price').to_pylist(), [Decimal('1.10'), None, Decimal('3.30')])
+
+    @unittest.skipUnless(np and pa, 'numpy and pyarrow are not installed')
+    def test_empty(self):
+        self.driver.rows = []
+        self.assertEqual(self.conn.table('orders').to_numpy()['id'].shape, (0,))
+        self.assertEqual(self.conn.table('orders').to_arrow().num_rows, 0)
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from sqlbuilder.asyncmysqlconnection import AsyncMysqlConnection
+from sqlbuilder.cache import MemoryCacheStore
+from sqlbuilder.driver import AsyncExecutorDriver, DriverBase, ExecutorSlot
+
+
+class BlockingDriver(DriverBase):
+    def __init__(self, n):
+        self.id = n
+        self.log = []
+        self.gate = None
+
+    def fetch_all(self, query, bindings=None, row_format='dict'):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.log.append(query)
+        return [{'id': self.id}]
+
+    def statement(self, query, bindings=None):
+        self.log.append(query.split(' ')[0])
+        return 1
+
+    def last_rowid(self):
+        return self.id
+
+    def start_transaction(self):
+        self.log.append('begin')
+
+    def commit(self):
+        self.log.append('commit')
+
+    def rollback(self):
+        self.log.append('rollback')
+
+
+class AsyncMysqlTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.drivers = [BlockingDriver(i) for i in range(2)]
+        self.driver = AsyncExecutorDriver([ExecutorSlot(d, ThreadPoolExecutor(1)) for d in self.drivers])
+        self.conn = AsyncMysqlConnection(self.driver)
+
+    async def asyncTearDown(self) -> None:
+        for slot in self.driver.slots:
+            slot.executor.shutdown()
+
+    def logs(self):
+        return [driver.log for driver in self.drivers]
+
+    async def test_concurrent_get(self):
+        results = await asyncio.gather(*(self.conn.table('users').where('id', i).get() for i in range(10)))
+        self.assertEqual(len(results), 10)
+        stats = self.conn.pool_stats()
+        self.assertEqual((stats['size'], stats['idle'], stats['waiting'], stats['wait_count']), (2, 2, 0, 10))
+
+    async def test_gather(self):
+        seen = []
+        self.conn.on('after_execute', lambda event: seen.append(event.builder))
+        builders = [self.conn.table('users').where('id', i) for i in range(4)]
+        results = await self.conn.gather(builders, timeout=5, max_concurrency=2)
+        self.assertEqual([len(rows) for rows in results], [1, 1, 1, 1])
+        self.assertCountEqual(seen, builders)
+
+    async def test_transaction(self):
+        async with self.conn.transaction():
+            self.assertEqual(self.conn.pool_stats()['idle'], 1)
+            nid = await self.conn.table('users').insert({'name': 'async'})
+            await self.conn.table('users').where('id', nid).update({'votes': 1})
+        self.assertIn(['begin', 'insert', 'update', 'commit'], self.logs())
+        self.assertEqual(self.conn.pool_stats()['idle'], 2)
+
+    async def test_transaction_rollback_drops_cached_rows(self):
+        self.conn.set_cache(MemoryCacheStore())
+        with self.assertRaises(RuntimeError):
+            async with self.conn.transaction():
+                await self.conn.table('users').insert({'name': 'async'})
+                await self.conn.table('users').remember().get()
+                raise RuntimeError
+        self.assertFalse(self.conn.in_transaction())
+        self.assertEqual(self.conn.cache.stats()['size'], 0)
+        self.assertIn(['begin', 'insert', 'select * from `users`', 'rollback'], self.logs())
+
+    async def test_start_transaction_pins_slot(self):
+        await self.conn.start_transaction()
+        self.assertEqual(self.conn.pool_stats()['idle'], 1)
+        await asyncio.gather(*(self.conn.table('users').insert({'name': str(i)}) for i in range(4)))
+        await self.conn.rollback()
+        self.assertIn(['begin', 'insert', 'insert', 'insert', 'insert', 'rollback'], self.logs())
+        self.assertEqual(self.conn.pool_stats()['idle'], 2)
+
+    async def test_insert_many_transaction(self):
+        self.drivers[0].max_parameters = self.drivers[1].max_parameters = 2
+        rows = [{'id': i, 'name': str(i)} for i in range(3)]
+        self.assertEqual(await self.conn.table('users').insert_many(rows, transaction=True), 3)
+        self.assertIn(['begin', 'insert', 'insert', 'insert', 'commit'], self.logs())
+        self.assertEqual(self.conn.pool_stats()['idle'], 2)
+
+    async def test_cancellation(self):
+        gate = threading.Event()
+        for driver in self.drivers:
+            driver.gate = gate
+        tasks = [asyncio.ensure_future(self.conn.table('users').get()) for _ in range(3)]
+        while self.conn.pool_stats()['waiting'] != 1:
+            await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # the running queries keep their slots until the threads return
+        self.assertEqual(self.conn.pool_stats()['idle'], 0)
+        self.assertEqual(self.conn.pool_stats()['waiting'], 0)
+        gate.set()
+        while self.conn.pool_stats()['idle'] != 2:
+            await asyncio.sleep(0.01)
+        self.assertEqual(len(await self.conn.table('users').get()), 1)
+
+    async def test_cancelled_transaction_is_rolled_back(self):
+        gate = threading.Event()
+        self.drivers[0].start_transaction = lambda: gate.wait(5)
+        self.drivers[1].start_transaction = lambda: gate.wait(5)
+        task = asyncio.ensure_future(self.conn.start_transaction())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        gate.set()
+        while self.conn.pool_stats()['idle'] != 2:
+            await asyncio.sleep(0.01)
+        self.assertIn(['rollback'], self.logs())
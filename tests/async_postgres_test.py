@@ -0,0 +1,105 @@
+import unittest
+from sqlbuilder.asyncpostgresconnection import AsyncPostgresConnection
+from sqlbuilder.driver import DriverBase
+
+
+class FakeAsyncDriver(DriverBase):
+    def __init__(self):
+        self.queries = []
+        self.responses = []
+        self.last_rowid_ = None
+
+    async def fetch_all(self, query, bindings=None, row_format='dict'):
+        self.queries.append((query, tuple(bindings)))
+        return self.responses.pop(0)
+
+    async def statement(self, query, bindings=None):
+        self.queries.append((query, tuple(bindings)))
+        self.last_rowid_ = 7 if 'returning' in query else None
+        return 1
+
+    async def copy_from(self, query, rows, types=None):
+        rows = list(rows)
+        self.queries.append((query, rows))
+        return len(rows)
+
+    async def cursor(self, query, bindings=None, batch_size=1000):
+        self.queries.append((query, tuple(bindings)))
+        return self._rows(self.responses.pop(0))
+
+    @staticmethod
+    async def _rows(rows):
+        for row in rows:
+            yield row
+
+    def last_rowid(self):
+        return self.last_rowid_
+
+    async def commit(self):
+        pass
+
+
+class AsyncPostgresTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.driver = FakeAsyncDriver()
+        self.conn = AsyncPostgresConnection(self.driver)
+
+    async def test_get(self):
+        self.driver.responses = [[{'id': 1}], [{'aggregate': 3}]]
+        self.assertEqual(await self.conn.table('users').where('id', '>', 0).get(), [{'id': 1}])
+        self.assertEqual(await self.conn.table('users').count(), 3)
+        self.assertEqual(self.driver.queries, [
+            ('select * from "users" where "id" > %s', (0,)),
+            ('select count(*) as aggregate from "users"', ()),
+        ])
+
+    async def test_insert(self):
+        uid = await self.conn.table('users').insert_get_id({'username': 'async', 'password': '123456'})
+        self.assertEqual(uid, 7)
+        self.assertEqual(self.driver.queries, [
+            ('insert into "users" ("username", "password") values (%s, %s) returning "id"', ('async', '123456')),
+        ])
+
+    async def test_stream(self):
+        self.driver.responses = [[{'id': 1}, {'id': 2}]]
+        rows = [row async for row in self.conn.table('users').stream(batch_size=100)]
+        self.assertEqual(rows, [{'id': 1}, {'id': 2}])
+
+    async def test_prepare(self):
+        self.driver.responses = [[{'id': 1}]]
+        prepared = self.conn.table('users').where('id', 1).prepare()
+        self.assertEqual(await prepared.execute(), [{'id': 1}])
+
+    async def test_cursor_paginate(self):
+        self.driver.responses = [[{'id': 1}, {'id': 2}, {'id': 3}]]
+        page = await self.conn.table('users').order_by('id').cursor_paginate(2)
+        self.assertEqual(page.items, [{'id': 1}, {'id': 2}])
+        self.assertIsNotNone(page.next_cursor)
+        self.assertEqual(self.driver.queries[0], ('select * from "users" order by "id" asc limit 3', ()))
+
+    async def test_chunk_and_lazy(self):
+        self.driver.responses = [[{'id': 1}, {'id': 2}], [{'id': 3}]]
+        pages = []
+
+        async def collect(rows, page):
+            pages.append((page, [row['id'] for row in rows]))
+
+        self.assertTrue(await self.conn.table('users').chunk_by_id(2, collect))
+        self.assertEqual(pages, [(1, [1, 2]), (2, [3])])
+        self.assertEqual(self.driver.queries[1][1], (2,))
+
+        self.driver.responses = [[{'id': 1}, {'id': 2}], [{'id': 3}]]
+        rows = [row async for row in self.conn.table('users').order_by('id').lazy(2)]
+        self.assertEqual([row['id'] for row in rows], [1, 2, 3])
+
+        self.driver.responses = [[{'id': 1}, {'id': 2}]]
+        self.assertFalse(await self.conn.table('users').chunk_by_id(2, lambda rows, page: False))
+
+    async def test_copy_from(self):
+        count = await self.conn.table('users').copy_from([{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}])
+        self.assertEqual(count, 2)
+        self.assertEqual(self.driver.queries, [('copy "users" ("id", "name") from stdin', [(1, 'a'), (2, 'b')])])
+
+    async def test_unsupported(self):
+        with self.assertRaises(NotImplementedError):
+            self.conn.table('users').to_numpy()
@@ -0,0 +1,271 @@
+import unittest
+from sqlbuilder.cache import MemoryCacheStore
+from sqlbuilder.connection import Connection, QueryException
+from sqlbuilder.driver import DriverBase
+from sqlbuilder.mysqlgrammar import MysqlGrammar
+from sqlbuilder.postgresgrammar import PostgresGrammar
+
+
+class RecordingDriver(DriverBase):
+    max_parameters = 6
+
+    def __init__(self):
+        self.statements = []
+        self.fetches = 0
+        self.commits = 0
+        self.transactions = 0
+        self.results = []
+
+    def fetch_all(self, query, bindings=None, row_format='dict'):
+        self.fetches += 1
+        return [{'id': 1}]
+
+    def statement(self, query, bindings=None):
+        self.statements.append((query, tuple(bindings)))
+        return self.results.pop(0) if self.results else 1
+
+    def statement_many(self, query, bindings):
+        self.statements.append((query, list(bindings)))
+        return len(bindings)
+
+    def copy_from(self, query, rows, types=None):
+        rows = list(rows)
+        self.statements.append((query, rows, types))
+        return len(rows)
+
+    def start_transaction(self):
+        self.transactions += 1
+
+    def commit(self):
+        self.commits += 1
+
+
+class MysqlRecordingConnection(Connection):
+    def get_grammar(self):
+        return MysqlGrammar(self.table_prefix)
+
+
+class PostgresRecordingConnection(Connection):
+    def get_grammar(self):
+        return PostgresGrammar(self.table_prefix)
+
+
+class BulkWriteTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.driver = RecordingDriver()
+        self.mysql = MysqlRecordingConnection(self.driver, '')
+        self.pg = PostgresRecordingConnection(self.driver, '')
+
+    def test_insert_many_chunks(self):
+        rows = ({'votes': i, 'email': f'{i}@x'} for i in range(5))
+        self.driver.results = [3, 2]
+        self.assertEqual(self.mysql.table('users').insert_many(rows), 5)
+        sql = 'insert into `users` (`email`, `votes`) values '
+        self.assertEqual(self.driver.statements, [
+            (sql + '(%s, %s), (%s, %s), (%s, %s)', ('0@x', 0, '1@x', 1, '2@x', 2)),
+            (sql + '(%s, %s), (%s, %s)', ('3@x', 3, '4@x', 4)),
+        ])
+
+    def test_insert_many_chunk_size(self):
+        rows = [{'id': i} for i in range(5)]
+        chunks = list(self.mysql.table('users')._insert_chunks(rows, 2))
+        self.assertEqual([bindings for _, bindings in chunks], [(0, 1), (2, 3), (4,)])
+
+    def test_insert_many_packet_size(self):
+        # a 20 character string is estimated at 24 bytes and an int at 12, the budget is 3/4 of the packet
+        self.driver.max_parameters = 65535
+        self.driver.max_packet_size = 100
+        rows = [{'name': 'x' * 20, 'votes': i} for i in range(5)]
+        chunks = list(self.mysql.table('users')._insert_chunks(rows, None))
+        self.assertEqual([len(bindings) // 2 for _, bindings in chunks], [2, 2, 1])
+
+    def test_insert_many_executemany(self):
+        rows = [{'id': i, 'name': str(i)} for i in range(4)]
+        self.assertEqual(self.mysql.table('users').insert_many(rows, use_executemany=True), 4)
+        self.assertEqual(self.driver.statements, [
+            ('insert into `users` (`id`, `name`) values (%s, %s)', [(0, '0'), (1, '1'), (2, '2')]),
+            ('insert into `users` (`id`, `name`) values (%s, %s)', [(3, '3')]),
+        ])
+
+    def test_insert_many_invalid_rows(self):
+        from sqlbuilder.builder import InvalidArgumentException
+        self.assertEqual(self.mysql.table('users').insert_many([]), 0)
+        with self.assertRaises(InvalidArgumentException):
+            self.mysql.table('users').insert_many([{'id': 1}, {'id': 2, 'name': 'b'}])
+        with self.assertRaises(InvalidArgumentException):
+            self.mysql.table('users').insert_many([(1, 'a')])
+
+    def test_compile_copy_from(self):
+        query = self.pg.table('events')
+        self.assertEqual(query.grammar.compile_copy_from(query, ['id', 'name']),
+                         'copy "events" ("id", "name") from stdin')
+        self.assertEqual(query.grammar.compile_copy_from(query, ['id'], binary=True),
+                         'copy "events" ("id") from stdin (format binary)')
+        with self.assertRaises(NotImplementedError):
+            self.mysql.table('events').copy_from([{'id': 1}])
+
+    def test_copy_from(self):
+        rows = ({'name': f'e{i}', 'id': i} for i in range(3))
+        self.assertEqual(self.pg.table('events').copy_from(rows), 3)
+        self.assertEqual(self.driver.statements, [
+            ('copy "events" ("name", "id") from stdin', [('e0', 0), ('e1', 1), ('e2', 2)], None),
+        ])
+
+        self.driver.statements.clear()
+        rows = [(1, 'a'), {'name': 'b', 'id': 2}]
+        self.pg.table('events').copy_from(rows, columns=['id', 'name'], binary=True, types=['int4', 'text'])
+        self.assertEqual(self.driver.statements, [
+            ('copy "events" ("id", "name") from stdin (format binary)', [(1, 'a'), (2, 'b')], ['int4', 'text']),
+        ])
+
+    def test_copy_from_requires_columns(self):
+        from sqlbuilder.builder import InvalidArgumentException
+        self.assertEqual(self.pg.table('events').copy_from([]), 0)
+        with self.assertRaises(InvalidArgumentException):
+            self.pg.table('events').copy_from([(1, 'a')])
+
+    def test_upsert_mysql(self):
+        rows = [{'email': 'a@x', 'name': 'a', 'votes': 1}, {'email': 'b@x', 'name': 'b', 'votes': 2},
+                {'email': 'c@x', 'name': 'c', 'votes': 3}]
+        self.assertEqual(self.mysql.table('users').upsert(rows, 'email', ['votes']), 2)
+        self.assertEqual(self.driver.statements, [
+            ('insert into `users` (`email`, `name`, `votes`) values (%s, %s, %s), (%s, %s, %s) '
+             'on duplicate key update `votes` = values(`votes`)', ('a@x', 'a', 1, 'b@x', 'b', 2)),
+            ('insert into `users` (`email`, `name`, `votes`) values (%s, %s, %s) '
+             'on duplicate key update `votes` = values(`votes`)', ('c@x', 'c', 3)),
+        ])
+
+        self.driver.statements.clear()
+        self.mysql.table('users').upsert({'email': 'a@x', 'name': 'a'}, 'email', [])
+        self.assertEqual(self.driver.statements[0][0], 'insert into `users` (`email`, `name`) values (%s, %s) '
+                                                       'on duplicate key update `email` = `email`')
+
+    def test_upsert_postgres(self):
+        self.pg.table('users').upsert([{'name': 'a', 'email': 'a@x', 'votes': 1}], ['email'])
+        self.assertEqual(self.driver.statements, [
+            ('insert into "users" ("email", "name", "votes") values (%s, %s, %s) '
+             'on conflict ("email") do update set "name" = excluded."name", "votes" = excluded."votes"',
+             ('a@x', 'a', 1)),
+        ])
+
+        self.driver.statements.clear()
+        self.pg.table('users').upsert({'email': 'a@x'}, 'email')
+        self.assertEqual(self.driver.statements[0][0],
+                         'insert into "users" ("email") values (%s) on conflict ("email") do nothing')
+
+    def test_upsert_duplicate_keys(self):
+        rows = [{'email': 'a@x', 'votes': 1}, {'email': 'b@x', 'votes': 2}, {'email': 'a@x', 'votes': 3}]
+        self.pg.table('users').upsert(rows, 'email')
+        self.assertEqual(self.driver.statements, [
+            ('insert into "users" ("email", "votes") values (%s, %s), (%s, %s) '
+             'on conflict ("email") do update set "votes" = excluded."votes"', ('a@x', 3, 'b@x', 2)),
+        ])
+
+    def test_upsert_requires_unique_by(self):
+        from sqlbuilder.builder import InvalidArgumentException
+        with self.assertRaises(InvalidArgumentException):
+            self.pg.table('users').upsert({'email': 'a@x'}, [])
+        with self.assertRaises(InvalidArgumentException):
+            self.pg.table('users').upsert({'email': 'a@x'}, 'id')
+        self.assertEqual(self.driver.statements, [])
+
+    def test_upsert_invalidates_cache(self):
+        self.mysql.set_cache(MemoryCacheStore())
+        self.mysql.table('users').remember().get()
+        self.mysql.table('users').upsert({'email': 'a@x', 'votes': 1}, 'email')
+        self.mysql.table('users').remember().get()
+        self.assertEqual(self.driver.fetches, 2)
+
+    def test_upsert_unsupported(self):
+        with self.assertRaises(NotImplementedError):
+            Connection(self.driver, '').table('users').upsert({'email': 'a@x'}, 'email')
+
+    def test_update_batch_mysql(self):
+        rows = [{'id': 1, 'name': 'a', 'votes': 10}, {'id': 2, 'name': 'b', 'votes': 20}]
+        self.driver.max_parameters = 11
+        self.assertEqual(self.mysql.table('users').where('active', 1).update_batch(rows), 1)
+        self.assertEqual(self.driver.statements, [
+            ('update `users` set `name` = case `id` when %s then %s when %s then %s end, '
+             '`votes` = case `id` when %s then %s when %s then %s end '
+             'where `id` in (%s, %s) and (`active` = %s)', (1, 'a', 2, 'b', 1, 10, 2, 20, 1, 2, 1)),
+        ])
+
+    def test_update_batch_expression_key(self):
+        from sqlbuilder.builder import Builder
+        rows = [{'id': Builder.raw('@first'), 'votes': 10}, {'id': 2, 'votes': 20}]
+        self.mysql.table('users').update_batch(rows)
+        self.assertEqual(self.driver.statements, [
+            ('update `users` set `votes` = case `id` when @first then %s when %s then %s end '
+             'where `id` in (@first, %s)', (10, 2, 20, 2)),
+        ])
+
+    def test_update_batch_postgres(self):
+        rows = [{'id': i, 'meta': '{}'} for i in range(3)]
+        self.assertEqual(self.pg.table('users').update_batch(rows, types={'meta': 'jsonb'}), 2)
+        self.assertEqual(self.driver.statements, [
+            ('update "users" set "meta" = "v"."v.meta" from (values (%s, %s::jsonb), (%s, %s)) '
+             'as "v"("v.id", "v.meta") where "users"."id" = "v"."v.id"', (0, '{}', 1, '{}')),
+            ('update "users" set "meta" = "v"."v.meta" from (values (%s, %s::jsonb)) '
+             'as "v"("v.id", "v.meta") where "users"."id" = "v"."v.id"', (2, '{}')),
+        ])
+
+    def test_update_batch_postgres_where(self):
+        rows = [{'id': 6, 'votes': 1}, {'id': 7, 'votes': 2}]
+        self.driver.max_parameters = 11
+        self.pg.table('users').where('id', '>', 5).update_batch(rows)
+        self.pg.table('users as u').where('u.active', True).update_batch(rows[:1])
+        self.assertEqual(self.driver.statements, [
+            ('update "users" set "votes" = "v"."v.votes" from (values (%s, %s), (%s, %s)) '
+             'as "v"("v.id", "v.votes") where "users"."id" = "v"."v.id" and ("id" > %s)', (6, 1, 7, 2, 5)),
+            ('update "users" as "u" set "votes" = "v"."v.votes" from (values (%s, %s)) '
+             'as "v"("v.id", "v.votes") where "u"."id" = "v"."v.id" and ("u"."active" = %s)', (6, 1, True)),
+        ])
+
+    def test_update_batch_requires_key(self):
+        from sqlbuilder.builder import InvalidArgumentException
+        with self.assertRaises(InvalidArgumentException):
+            self.mysql.table('users').update_batch([{'name': 'a'}])
+        self.assertEqual(self.mysql.table('users').update_batch([]), 0)
+
+    def test_delete_in_batches_mysql(self):
+        self.driver.results = [100, 100, 30, 0]
+        progress = []
+        deleted = self.mysql.table('logs').where('created_at', '<', '2024-01-01').order_by('id')\
+            .delete_in_batches(100, progress=progress.append)
+        self.assertEqual(deleted, 230)
+        self.assertEqual(progress, [100, 200, 230])
+        self.assertEqual((self.driver.transactions, self.driver.commits), (4, 4))
+        self.assertEqual(self.driver.statements[0], (
+            'delete from `logs` where `created_at` < %s order by `id` asc limit 100', ('2024-01-01',)))
+
+    def test_delete_in_batches_postgres(self):
+        # a row updated concurrently leaves a batch short while matching rows remain
+        self.driver.results = [498, 2, 0]
+        self.assertEqual(self.pg.table('logs').where('level', 'debug').delete_in_batches(500), 500)
+        sql = ('delete from "logs" where ctid = any(array(select ctid from "logs" where "level" = %s '
+               'order by "id" asc limit 500))')
+        self.assertEqual(self.driver.statements, [(sql, ('debug',))] * 3)
+
+    def test_delete_in_batches_key(self):
+        self.driver.results = [0, 0]
+        self.mysql.table('logs').where('level', 'debug').delete_in_batches(100, key='log_id')
+        self.mysql.table('logs').delete_in_batches(100, key=None)
+        self.assertEqual([sql for sql, _ in self.driver.statements], [
+            'delete from `logs` where `level` = %s order by `log_id` asc limit 100',
+            'delete from `logs`  limit 100',
+        ])
+
+    def test_delete_in_batches_rejects_joins(self):
+        from sqlbuilder.builder import InvalidArgumentException
+        for conn in (self.mysql, self.pg):
+            with self.assertRaises(InvalidArgumentException):
+                conn.table('logs').join('users', 'users.id', '=', 'logs.user_id').delete_in_batches(100)
+        self.assertEqual(self.driver.statements, [])
+
+    def test_delete_in_batches_rolls_back(self):
+        rollbacks = []
+        self.driver.rollback = lambda: rollbacks.append(1)
+        self.driver.statement = lambda query, bindings=None: 1 / 0
+        with self.assertRaises(QueryException):
+            self.mysql.table('logs').delete_in_batches(100)
+        self.assertEqual((self.driver.transactions, len(rollbacks), self.driver.commits), (1, 1, 0))
@@ -0,0 +1,181 @@
+import datetime
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from sqlbuilder.cache import MemoryCacheStore, SqliteCacheStore
+from sqlbuilder.driver import DriverBase
+from sqlbuilder.connection import Connection
+from sqlbuilder.mysqlgrammar import MysqlGrammar
+
+
+class CountingDriver(DriverBase):
+    def __init__(self):
+        self.fetches = 0
+
+    def fetch_all(self, query, bindings=None):
+        self.fetches += 1
+        return [{'id': 1, 'aggregate': 1}]
+
+    def statement(self, query, bindings=None):
+        return 1
+
+
+class TransactionDriver(CountingDriver):
+    def __init__(self):
+        super().__init__()
+        self.rows = [{'id': 1}]
+        self.committed = list(self.rows)
+
+    def fetch_all(self, query, bindings=None):
+        self.fetches += 1
+        return [dict(row) for row in self.rows]
+
+    def statement(self, query, bindings=None):
+        self.rows.append({'id': len(self.rows) + 1})
+        return 1
+
+    def commit(self):
+        self.committed = list(self.rows)
+
+    def rollback(self):
+        self.rows = list(self.committed)
+
+
+class MysqlCountingConnection(Connection):
+    def get_grammar(self):
+        return MysqlGrammar(self.table_prefix)
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.driver = CountingDriver()
+        self.conn = MysqlCountingConnection(self.driver, '').set_cache(MemoryCacheStore())
+
+    def test_remember(self):
+        for _ in range(3):
+            rows = self.conn.table('users').where('id', 1).remember(60).get()
+            rows[0]['id'] = 2
+        self.assertEqual(self.driver.fetches, 1)
+        self.assertEqual(self.conn.table('users').where('id', 1).remember(60).get()[0]['id'], 1)
+
+        self.conn.table('users').where('id', 2).remember(60).get()
+        self.conn.table('users').where('id', 1).get()
+        self.assertEqual(self.driver.fetches, 3)
+        print(self.conn.cache.stats())
+
+    def test_tables(self):
+        query = (self.conn.table('users as u')
+                 .join('roles', 'roles.id', '=', 'u.role_id')
+                 .where_in('u.id', lambda q: q.select('user_id').table('posts'))
+                 .where_exists(lambda q: q.table('comments').where_column('comments.user_id', 'u.id')))
+        self.assertEqual(query.tables(), {'users', 'roles', 'posts', 'comments'})
+
+    def test_invalidate(self):
+        self.conn.table('users').join('roles', 'roles.id', '=', 'users.role_id').remember().count()
+        self.conn.table('posts').remember().get()
+        self.conn.table('roles').where('id', 1).update({'name': 'admin'})
+        self.conn.table('users').join('roles', 'roles.id', '=', 'users.role_id').remember().count()
+        self.conn.table('posts').remember().get()
+        self.assertEqual(self.driver.fetches, 3)
+
+        self.conn.table('posts').truncate()
+        self.conn.table('posts').remember().get()
+        self.assertEqual(self.driver.fetches, 4)
+
+    def test_rollback(self):
+        driver = TransactionDriver()
+        conn = MysqlCountingConnection(driver, '').set_cache(MemoryCacheStore())
+        conn.start_transaction()
+        conn.table('users').insert({'name': 'rolled back'})
+        self.assertEqual(len(conn.table('users').remember().get()), 2)
+        conn.rollback()
+        self.assertEqual(len(conn.table('users').remember().get()), 1)
+        self.assertEqual(len(conn.table('users').remember().get()), 1)
+        self.assertEqual(driver.fetches, 2)
+
+        # without start_transaction the read is cached, the rollback drops it
+        conn.table('users').insert({'name': 'rolled back'})
+        self.assertEqual(len(conn.table('users').remember().get()), 2)
+        conn.rollback()
+        self.assertEqual(len(conn.table('users').remember().get()), 1)
+        self.assertEqual(driver.fetches, 4)
+
+
+class SqliteCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'cache.db')
+
+    def tearDown(self) -> None:
+        self.dir.cleanup()
+
+    def test_shared(self):
+        first, second = SqliteCacheStore(self.path), SqliteCacheStore(self.path)
+        rows = [{'id': i, 'name': f'user{i}', 'created_at': datetime.datetime(2024, 1, 1)} for i in range(3)]
+        first.put('users', rows, 60, {'users'}, time.time())
+        self.assertEqual(second.get('users'), rows)
+        second.invalidate_tags(['users'])
+        self.assertIsNone(first.get('users'))
+
+        first.put('expired', rows, 0, {'users'}, time.time())
+        self.assertIsNone(second.get('expired'))
+        print(first.stats())
+
+    def test_locked(self):
+        store, other = SqliteCacheStore(self.path, timeout=0.01), SqliteCacheStore(self.path)
+        rows = [{'id': 1}]
+        since = time.time()
+        store.put('users', rows, 60, {'users'}, since)
+        store.put('roles', rows, 60, {'roles'}, since)
+
+        lock = sqlite3.connect(self.path, isolation_level=None)
+        lock.execute('begin immediate')
+        with self.assertLogs('sqlbuilder.cache', 'WARNING'):
+            store.invalidate_tags(['users'])
+            store.clear()
+        # the invalidation holds in this process while the file is locked
+        self.assertIsNone(store.get('users'))
+        self.assertIsNone(store.get('roles'))
+        lock.execute('rollback')
+        lock.close()
+
+        # and reaches the file on the next access
+        store.get('users')
+        self.assertEqual(store.pending, {})
+        self.assertIsNone(other.get('roles'))
+        store.put('users', rows, 60, {'users'}, time.time())
+        self.assertEqual(other.get('users'), rows)
+
+    def test_remember_with_locked_cache(self):
+        store = SqliteCacheStore(self.path, timeout=0.01)
+        conn = MysqlCountingConnection(CountingDriver(), '').set_cache(store)
+        conn.table('users').remember().get()
+        lock = sqlite3.connect(self.path, isolation_level=None)
+        lock.execute('begin immediate')
+        try:
+            with self.assertLogs('sqlbuilder.cache', 'WARNING'):
+                self.assertEqual(conn.table('users').where('id', 1).update({'name': 'a'}), 1)
+        finally:
+            lock.execute('rollback')
+            lock.close()
+
+    def test_lru(self):
+        store = SqliteCacheStore(self.path, max_bytes=2000, touch_interval=0)
+        rows = [{'id': i, 'payload': os.urandom(16).hex()} for i in range(10)]
+        for i in range(20):
+            store.put(f'k{i}', rows, None, set(), time.time())
+            store.get('k0')
+        self.assertLessEqual(store.stats()['bytes'], 2000)
+        self.assertEqual(store.get('k0'), rows)
+        self.assertIsNone(store.get('k1'))
+
+    def test_remember(self):
+        driver = CountingDriver()
+        conn = MysqlCountingConnection(driver, '').set_cache(SqliteCacheStore(self.path))
+        conn.table('users').where('id', 1).remember(60).first()
+        conn.table('users').where('id', 1).remember(60).first()
+        conn.table('users').insert({'name': 'hothat'})
+        conn.table('users').where('id', 1).remember(60).first()
+        self.assertEqual(driver.fetches, 2)
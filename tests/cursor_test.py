@@ -0,0 +1,171 @@
+import unittest
+from mysql.connector.constants import FieldType, FieldFlag
+from sqlbuilder.connection import Connection
+from sqlbuilder.driver import DriverBase, MySqlDriver, PostgresDriver
+from sqlbuilder.pool import ConnectionPool, PooledDriver
+
+
+class FakeCursor:
+    def __init__(self, rows, description=None):
+        self.rows = rows
+        self.description = description
+        self.executed = None
+        self.itersize = None
+        self.closed = False
+
+    def execute(self, query, bindings=None):
+        self.executed = (query, bindings)
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        self.closed = True
+
+
+class FakePgColumn:
+    def __init__(self, name, type_code):
+        self.name = name
+        self.type_code = type_code
+
+
+class FakePgContext:
+    def __init__(self, rows, autocommit=False):
+        self.rows = rows
+        self.autocommit = autocommit
+        self.cursors = []
+
+    def cursor(self, name=None, **kwargs):
+        cursor = FakeCursor(list(self.rows), [FakePgColumn('id', 23), FakePgColumn('amount', 1700)])
+        self.cursors.append((name, kwargs, cursor))
+        return cursor
+
+    def close(self):
+        pass
+
+
+class FakeMysqlContext:
+    def __init__(self, rows):
+        self.rows = rows
+        self.cursors = []
+        self.unread_result = False
+        self.consumed = False
+
+    def cursor(self, **kwargs):
+        description = [('id', FieldType.LONGLONG, None, None, None, None, 0, FieldFlag.UNSIGNED),
+                       ('votes', FieldType.LONG, None, None, None, None, 1, 0),
+                       ('created', FieldType.DATETIME, None, None, None, None, 1, 0)]
+        cursor = FakeCursor(list(self.rows), description)
+        self.cursors.append((kwargs, cursor))
+        self.unread_result = True
+        return cursor
+
+    def consume_results(self):
+        self.consumed = True
+        self.unread_result = False
+
+    def close(self):
+        pass
+
+
+def pg_driver(rows, autocommit=False):
+    driver = PostgresDriver.__new__(PostgresDriver)
+    driver.context = FakePgContext(rows, autocommit)
+    driver.cursor_count = 0
+    return driver
+
+
+def mysql_driver(rows):
+    driver = MySqlDriver.__new__(MySqlDriver)
+    driver.context = FakeMysqlContext(rows)
+    return driver
+
+
+class StreamingDriver(DriverBase):
+    def __init__(self):
+        self.calls = []
+        self.closed = 0
+
+    def cursor(self, query, bindings=None, batch_size=1000):
+        self.calls.append((query, bindings, batch_size))
+        return self._rows()
+
+    def _rows(self):
+        try:
+            yield from ({'id': i} for i in range(10))
+        finally:
+            self.closed += 1
+
+
+class CursorTest(unittest.TestCase):
+    def test_builder_cursor(self):
+        driver = StreamingDriver()
+        conn = Connection(driver, '')
+        rows = list(conn.table('events').where('type', 'click').cursor(batch_size=50))
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(driver.calls, [('select * from "events" where "type" = ?', ('click',), 50)])
+
+    def test_postgres_withhold(self):
+        driver = pg_driver([(1,), (2,), (3,)])
+        self.assertEqual(list(driver.cursor('select 1', None, 2)), [(1,), (2,), (3,)])
+        name, kwargs, cursor = driver.context.cursors[0]
+        self.assertEqual(name, 'sqlbuilder_cursor_1')
+        # inside a transaction block the cursor lives until commit, so it need not be holdable
+        self.assertFalse(kwargs['withhold'])
+        self.assertEqual(cursor.itersize, 2)
+        self.assertTrue(cursor.closed)
+
+        driver.context.autocommit = True
+        list(driver.cursor('select 1'))
+        name, kwargs, _ = driver.context.cursors[1]
+        self.assertEqual(name, 'sqlbuilder_cursor_2')
+        self.assertTrue(kwargs['withhold'])
+
+    def test_postgres_early_exit(self):
+        driver = pg_driver([(i,) for i in range(10)])
+        rows = driver.cursor('select 1', None, 3)
+        self.assertEqual(next(rows), (0,))
+        rows.close()
+        self.assertTrue(driver.context.cursors[0][2].closed)
+
+    def test_postgres_fetch_batches(self):
+        driver = pg_driver([(1, 2), (3, 4), (5, 6)], autocommit=True)
+        columns, batches = driver.fetch_batches('select 1', None, 2)
+        self.assertEqual(columns, [('id', 'int'), ('amount', 'object')])
+        self.assertEqual(list(batches), [[(1, 2), (3, 4)], [(5, 6)]])
+        self.assertTrue(driver.context.cursors[0][1]['withhold'])
+        self.assertTrue(driver.context.cursors[0][2].closed)
+
+    def test_mysql_early_exit(self):
+        driver = mysql_driver([{'id': i} for i in range(10)])
+        rows = driver.cursor('select 1', None, 3)
+        self.assertEqual(next(rows), {'id': 0})
+        rows.close()
+        kwargs, cursor = driver.context.cursors[0]
+        self.assertEqual(kwargs, {'dictionary': True, 'buffered': False})
+        self.assertTrue(driver.context.consumed)
+        self.assertTrue(cursor.closed)
+
+    def test_mysql_fetch_batches(self):
+        driver = mysql_driver([(1, 2, None)] * 3)
+        columns, batches = driver.fetch_batches('select 1', None, 2)
+        # an unsigned bigint does not fit int64
+        self.assertEqual(columns, [('id', 'object'), ('votes', 'int'), ('created', 'datetime')])
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertTrue(driver.context.cursors[0][1].closed)
+
+    def test_pooled_early_exit(self):
+        drivers = []
+
+        def factory():
+            drivers.append(StreamingDriver())
+            return drivers[-1]
+
+        driver = PooledDriver(ConnectionPool(factory, min_size=0, max_size=1))
+        rows = driver.cursor('select 1')
+        next(rows)
+        self.assertEqual(driver.stats()['in_use'], 1)
+        rows.close()
+        self.assertEqual(drivers[0].closed, 1)
+        self.assertEqual(driver.stats()['in_use'], 0)
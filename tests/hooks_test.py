@@ -0,0 +1,78 @@
+import unittest
+from sqlbuilder.cache import MemoryCacheStore
+from sqlbuilder.connection import Connection, QueryException
+from sqlbuilder.driver import DriverBase
+
+
+class ListDriver(DriverBase):
+    def fetch_all(self, query, bindings=None):
+        if 'missing' in query:
+            raise RuntimeError('no such table')
+        return [{'id': 1}, {'id': 2}]
+
+    def statement(self, query, bindings=None):
+        return 1
+
+
+class HooksTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.conn = Connection(ListDriver(), '')
+        self.events = []
+
+    def record(self, name):
+        def hook(event):
+            self.events.append((name, event))
+        return hook
+
+    def test_events(self):
+        for name in ('before_compile', 'after_compile', 'before_execute', 'after_execute', 'on_error'):
+            self.conn.on(name, self.record(name))
+        query = self.conn.table('users').where('id', '>', 0)
+        query.get()
+        self.assertEqual([name for name, _ in self.events],
+                         ['before_compile', 'after_compile', 'before_execute', 'after_execute'])
+        event = self.events[-1][1]
+        self.assertIs(event.builder, query)
+        self.assertEqual(event.rows, 2)
+        self.assertGreater(event.compile_ns, 0)
+        print(event.sql, event.bindings, event.compile_ns, event.execute_ns)
+
+        self.events.clear()
+        with self.assertRaises(QueryException):
+            self.conn.table('missing').get()
+        self.assertEqual(self.events[-1][0], 'on_error')
+
+        self.events.clear()
+        self.conn.statement('select 1', ())
+        self.assertIsNone(self.events[0][1].builder)
+
+    def test_rewrite_and_off(self):
+        def comment(event):
+            event.sql += ' /* dashboard */'
+
+        self.conn.on('after_compile', comment)
+        hook = self.conn.on('after_execute')(self.record('after_execute'))
+        self.conn.table('users').update({'votes': 1})
+        self.assertTrue(self.events[0][1].sql.endswith('/* dashboard */'))
+
+        self.conn.off('after_compile', comment)
+        self.conn.off('after_execute', hook)
+        self.assertIsNone(self.conn.hooks)
+
+    def test_off_without_hooks(self):
+        self.conn.off('after_execute', self.record('after_execute'))
+        self.assertIsNone(self.conn.hooks)
+
+    def test_cache_hit_leaves_no_event(self):
+        self.conn.set_cache(MemoryCacheStore())
+        self.conn.on('after_execute', self.record('after_execute'))
+        query = self.conn.table('users').remember()
+        query.get()
+        query.get()
+        self.conn.select('select * from "users"', ())
+        self.assertEqual([event.builder for _, event in self.events], [query, None])
+
+        self.events.clear()
+        self.conn.table('users').prepare()
+        self.conn.select('select * from "users"', ())
+        self.assertIsNone(self.events[0][1].builder)
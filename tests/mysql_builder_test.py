@@ -184,3 +184,79 @@ class BuilderTest(unittest.TestCase):
                )
 
         print(sql)
+
+    def test_compiled_cache(self):
+        grammar = MysqlGrammar('')
+
+        def build(ids):
+            return Builder(self.connection, grammar).table('users').where('votes', '>', 100).where_in('id', ids)
+
+        first = build([1, 2]).to_sql()
+        second = build([3, 4]).to_sql()
+        build([1, 2, 3]).to_sql()
+        raw = build([1, Builder.raw('max_id')]).to_sql()
+        self.assertEqual(first, second)
+        self.assertEqual(raw, 'select * from `users` where `votes` > %s and `id` in (%s, max_id)')
+        info = grammar.cache_info()
+        self.assertEqual((info['hits'], info['misses'], info['size']), (1, 3, 3))
+
+    def test_prepare(self):
+        template = (self.mysql_builder
+                    .table('users')
+                    .where('id', Builder.param('id'))
+                    .where('status', Builder.param('status'))
+                    .where('votes', '>', 100)
+                    .prepare())
+        print(template.sql)
+        self.assertEqual(template.bind(id=5, status='x'), (5, 'x', 100))
+
+    def test_where_between_exists(self):
+        def fn(query: Builder):
+            query.select(Builder.raw(1)).table('orders').where_raw('orders.user_id = users.id')
+
+        sql = (self.mysql_builder
+               .table('users')
+               .where_between('votes', [1, 100])
+               .where_not_exists(fn)
+               .to_sql()
+               )
+        print(sql)
+        self.assertEqual(sql, 'select * from `users` where `votes` between %s and %s and '
+                              'not exists (select 1 from `orders` where orders.user_id = users.id)')
+
+    def test_bindings(self):
+        query = (self.mysql_builder
+                 .table('users')
+                 .join_where('roles', 'roles.level', '>', 3)
+                 .where('votes', '>', 100)
+                 .where_in('id', [1, 2])
+                 .group_by('account_id')
+                 .having('account_id', '>', 10)
+                 .select_raw('? as flag', [0]))
+        print(query.get_bindings())
+        self.assertEqual(query.get_bindings(), (0, 3, 100, 1, 2, 10))
+
+    def test_for_page_after_id(self):
+        sql = (self.mysql_builder
+               .table('users')
+               .where('votes', '>', 100)
+               .or_where('name', 'John')
+               .order_by('name')
+               .for_page_after_id(100, 42)
+               .to_sql()
+               )
+        print(sql)
+        self.assertEqual(sql, 'select * from `users` where (`votes` > %s or `name` = %s) and `id` > %s '
+                              'order by `id` asc, `name` asc limit 100')
+
+    def test_where_seek(self):
+        query = self.mysql_builder.table('users').order_by('votes', 'desc').order_by('id')
+        sql = query.where_seek(query.orders_, [100, 7]).to_sql()
+        print(sql)
+        self.assertEqual(sql, 'select * from `users` where ((`votes` < %s) or (`votes` = %s and `id` > %s)) '
+                              'order by `votes` desc, `id` asc')
+
+        query = Builder(self.connection, MysqlGrammar('')).table('users').order_by('votes').order_by('id')
+        sql = query.where_seek(query.orders_, [100, 7]).to_sql()
+        print(sql)
+        self.assertEqual(sql, 'select * from `users` where (`votes`, `id`) > (%s, %s) order by `votes` asc, `id` asc')
@@ -40,3 +40,70 @@ class MysqlDriverTest(unittest.TestCase):
 
     def test_transaction(self):
         pass
+
+
+class FakePreparedCursor:
+    def __init__(self):
+        self.executed = []
+        self.closed = False
+        self.lastrowid = None
+        self.rowcount = 1
+        self.column_names = ('id',)
+
+    def execute(self, query, bindings=None):
+        self.executed.append(bindings)
+
+    def fetchall(self):
+        return [(bindings[0],) for bindings in self.executed[-1:]]
+
+    def close(self):
+        self.closed = True
+
+
+class FakePreparedContext:
+    def __init__(self):
+        self.connection_id = 1
+        self.cursors = []
+
+    def cursor(self, prepared=False, **kwargs):
+        cursor = FakePreparedCursor()
+        self.cursors.append(cursor)
+        return cursor
+
+    def close(self):
+        pass
+
+
+class StatementCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.conn = MySqlDriver.__new__(MySqlDriver)
+        self.conn.context = FakePreparedContext()
+        self.conn.last_rowid_ = None
+        self.conn.init_statement_cache(2)
+
+    def test_lru_eviction(self):
+        one, two, three = ('select * from `user` where id=%s', 'select * from `user` where name=%s',
+                           'select * from `user` where email=%s')
+        self.conn.statement(one, [1])
+        self.conn.statement(two, ['a'])
+        self.conn.statement(one, [2])
+        # two is the least recently used statement now
+        self.conn.statement(three, ['a@x'])
+        self.assertEqual(list(self.conn.statements), [one, three])
+        cursors = self.conn.context.cursors
+        self.assertEqual([cursor.closed for cursor in cursors], [False, True, False])
+        self.assertEqual(cursors[0].executed, [(1,), (2,)])
+        self.assertEqual(self.conn.statement_cache_info(),
+                         {'prepares': 3, 'executes': 4, 'evictions': 1, 'size': 2, 'max_size': 2})
+
+    def test_prepare_again_after_reconnect(self):
+        query = 'select * from `user` where id=%s'
+        self.conn.fetch_all(query, [1])
+        self.conn.fetch_all(query, [2])
+        self.assertEqual(len(self.conn.context.cursors), 1)
+
+        self.conn.context.connection_id = 2
+        self.assertEqual(self.conn.fetch_all(query, [3]), [{'id': 3}])
+        self.assertEqual(len(self.conn.context.cursors), 2)
+        self.assertEqual(self.conn.statement_cache_info()['prepares'], 2)
+        self.assertEqual(self.conn.statement_cache_info()['size'], 1)
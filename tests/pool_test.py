@@ -0,0 +1,147 @@
+import threading
+import time
+import unittest
+from sqlbuilder.builder import InvalidArgumentException
+from sqlbuilder.connection import Connection, QueryException
+from sqlbuilder.driver import DriverBase
+from sqlbuilder.pool import ConnectionPool, PooledDriver, PoolTimeoutException
+
+
+class FakeDriver(DriverBase):
+    opened = 0
+
+    def __init__(self):
+        FakeDriver.opened += 1
+        self.id = FakeDriver.opened
+        self.alive = True
+        self.closed = False
+        self.log = []
+
+    def ping(self):
+        return self.alive
+
+    def close(self):
+        self.closed = True
+
+    def connection_id(self):
+        return self.id
+
+    def fetch_all(self, query, bindings=None):
+        if bindings and bindings[0] == 'sleep':
+            time.sleep(bindings[1])
+        return [{'id': self.id, 'sql': query}]
+
+    def statement(self, query, bindings=None):
+        self.log.append(query)
+        return 1
+
+    def last_rowid(self):
+        return self.id
+
+    def start_transaction(self):
+        self.log.append('begin')
+
+    def commit(self):
+        self.log.append('commit')
+
+
+class PoolTest(unittest.TestCase):
+    def test_checkout_reuse(self):
+        pool = ConnectionPool(FakeDriver, min_size=1, max_size=2)
+        first = pool.checkout()
+        pool.checkin(first)
+        self.assertIs(first, pool.checkout())
+        print(pool.stats())
+
+    def test_timeout(self):
+        pool = ConnectionPool(FakeDriver, min_size=0, max_size=1, timeout=0.05)
+        pool.checkout()
+        with self.assertRaises(PoolTimeoutException):
+            pool.checkout()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_wait_for_checkin(self):
+        pool = ConnectionPool(FakeDriver, min_size=0, max_size=1, timeout=1)
+        entry = pool.checkout()
+        threading.Timer(0.05, pool.checkin, (entry,)).start()
+        self.assertIs(entry, pool.checkout())
+
+    def test_health_check(self):
+        pool = ConnectionPool(FakeDriver, min_size=1, max_size=1)
+        entry = pool.checkout()
+        entry.driver.alive = False
+        pool.checkin(entry)
+        fresh = pool.checkout()
+        self.assertIsNot(entry, fresh)
+        self.assertTrue(entry.driver.closed)
+
+    def test_idle_and_lifetime(self):
+        pool = ConnectionPool(FakeDriver, min_size=1, max_size=3, max_idle=0.01, max_lifetime=None)
+        entries = [pool.checkout() for _ in range(3)]
+        for entry in entries:
+            pool.checkin(entry)
+        time.sleep(0.02)
+        pool.checkin(pool.checkout())
+        self.assertEqual(pool.stats()['size'], 1)
+
+        pool = ConnectionPool(FakeDriver, min_size=1, max_size=1, max_lifetime=0.01)
+        entry = pool.checkout()
+        time.sleep(0.02)
+        pool.checkin(entry)
+        self.assertTrue(entry.driver.closed)
+        self.assertEqual(pool.stats()['recycled'], 1)
+
+    def test_pinned_transaction(self):
+        driver = PooledDriver(ConnectionPool(FakeDriver, min_size=0, max_size=2))
+        driver.start_transaction()
+        pinned = driver.connection_id()
+        driver.statement('update users set votes = 1')
+        self.assertEqual(driver.last_rowid(), pinned)
+        other = []
+        thread = threading.Thread(target=lambda: other.append(driver.fetch_all('select 1')[0]['id']))
+        thread.start()
+        thread.join()
+        self.assertNotEqual(other[0], pinned)
+        driver.commit()
+        self.assertIsNone(driver.connection_id())
+        self.assertEqual(driver.pool.stats()['in_use'], 0)
+
+    def test_gather(self):
+        conn = Connection(PooledDriver(ConnectionPool(FakeDriver, min_size=0, max_size=4)), '')
+        builders = [conn.table('users').where('name', 'sleep').where('votes', 0.05) for _ in range(4)]
+        builders.append(conn.table('roles'))
+        start = time.monotonic()
+        results = conn.gather(builders, max_concurrency=4)
+        self.assertLess(time.monotonic() - start, 0.15)
+        self.assertEqual(results[-1][0]['sql'], 'select * from "roles"')
+
+        with self.assertRaises(QueryException):
+            conn.gather([conn.table('users').where('name', 'sleep').where('votes', 0.2)], timeout=0.02)
+
+    def test_gather_hooks_see_builders(self):
+        conn = Connection(PooledDriver(ConnectionPool(FakeDriver, min_size=0, max_size=2)), '')
+        seen = []
+        conn.on('after_execute', lambda event: seen.append(event.builder))
+        builders = [conn.table('users'), conn.table('roles'), conn.table('events')]
+        conn.gather(builders, timeout=1)
+        self.assertCountEqual(seen, builders)
+
+    def test_gather_timeout_needs_thread_safe_driver(self):
+        conn = Connection(FakeDriver(), '')
+        seen = []
+        conn.on('after_execute', lambda event: seen.append(event.builder))
+        builders = [conn.table('users'), conn.table('roles')]
+        self.assertEqual(len(conn.gather(builders)), 2)
+        self.assertEqual(seen, builders)
+        with self.assertRaises(InvalidArgumentException):
+            conn.gather(builders, timeout=1)
+
+    def test_gather_cancels_queued(self):
+        pool = ConnectionPool(FakeDriver, min_size=0, max_size=1)
+        conn = Connection(PooledDriver(pool), '')
+        builders = [conn.table('users').where('name', 'sleep').where('votes', 0.1) for _ in range(3)]
+        with self.assertRaises(QueryException):
+            conn.gather(builders, timeout=0.02, max_concurrency=1)
+        time.sleep(0.15)
+        # only the query past its timeout ran, the queued ones were cancelled
+        self.assertEqual(pool.stats()['checkouts'], 1)
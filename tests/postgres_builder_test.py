@@ -194,3 +194,9 @@ class PgBuilderTest(unittest.TestCase):
                )
 
         print(sql)
+
+    def test_copy_from(self):
+        rows = ({'username': f'copy{i}', 'password': '123456'} for i in range(1000))
+        count = self.conn.table('users').copy_from(rows)
+        self.assertEqual(count, 1000)
+        self.conn.commit()
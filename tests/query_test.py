@@ -162,3 +162,21 @@ class QueryTest(unittest.TestCase):
          .where('votes', '>', 100)
          .delete())
         self.conn.commit()
+
+    def test_insert_many(self):
+        rows = ({'email': f'hothat{i}@example.com', 'votes': i, 'name': f'Test{i}'} for i in range(1000))
+        count = self.conn.table('users').insert_many(rows, chunk_size=300, transaction=True)
+        self.assertEqual(count, 1000)
+
+    def test_cursor(self):
+        count = 0
+        for row in self.conn.table('users').where('votes', '>=', 0).cursor(batch_size=100):
+            count += 1
+        self.assertEqual(count, self.conn.table('users').where('votes', '>=', 0).count())
+
+    def test_cursor_paginate(self):
+        page = self.conn.table('users').order_by('votes', 'desc').order_by('id').cursor_paginate(10)
+        print(page.to_dict())
+        if page.next_cursor:
+            page = self.conn.table('users').order_by('votes', 'desc').order_by('id').cursor_paginate(10, page.next_cursor)
+            print(page.to_dict())
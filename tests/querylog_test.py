@@ -0,0 +1,55 @@
+import json
+import os
+import tempfile
+import unittest
+from sqlbuilder.connection import Connection, QueryException
+from sqlbuilder.driver import DriverBase
+from sqlbuilder.querylog import JsonlSink
+
+
+class EchoDriver(DriverBase):
+    def fetch_all(self, query, bindings=None):
+        if 'missing' in query:
+            raise RuntimeError('no such table')
+        return [{'id': 1}]
+
+
+class QueryLogTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.conn = Connection(EchoDriver(), '')
+
+    def test_ring_buffer(self):
+        self.conn.table('users').where('id', 1).get()
+        self.assertEqual(self.conn.get_query_log(), [])
+
+        self.conn.enable_query_log(max_entries=3)
+        for i in range(5):
+            self.conn.table('users').where('id', i).get()
+        log = self.conn.get_query_log()
+        print(log)
+        self.assertEqual([entry['bindings'] for entry in log], [(2,), (3,), (4,)])
+
+        with self.assertRaises(QueryException):
+            self.conn.table('missing').get()
+        self.assertEqual(self.conn.get_query_log()[-1]['error'], 'RuntimeError: no such table')
+
+    def test_sample_and_redact(self):
+        self.conn.enable_query_log(sample_rate=0)
+        self.conn.table('users').get()
+        self.assertEqual(self.conn.get_query_log(), [])
+
+        self.conn.enable_query_log(redact=True)
+        self.conn.table('users').where('email', 'secret@example.com').get()
+        self.assertEqual(self.conn.get_query_log()[0]['bindings'], ('?',))
+
+    def test_jsonl_sink(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'queries.jsonl')
+            sink = JsonlSink(path)
+            self.conn.enable_query_log(sinks=[sink])
+            self.conn.table('users').where('id', 1).get()
+            sink.close()
+            with open(path) as f:
+                entry = json.loads(f.readline())
+        self.assertEqual(entry['query'], 'select * from "users" where "id" = ?')
+        self.assertEqual(entry['bindings'], [1])
@@ -0,0 +1,36 @@
+import unittest
+from sqlbuilder.connection import Connection
+from sqlbuilder.driver import DriverBase
+from sqlbuilder.querystats import fingerprint, LogHistogram
+
+
+class RowsDriver(DriverBase):
+    def fetch_all(self, query, bindings=None):
+        return [{'id': value} for value in bindings]
+
+
+class QueryStatsTest(unittest.TestCase):
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint('select * from `users` where `id` in (%s, %s, %s) and name = \'x\''),
+                         'select * from `users` where `id` in (...) and name = ?')
+        self.assertEqual(fingerprint('insert into t1 (a, b) values ($1, $2), ($3, $4)  limit 10'),
+                         'insert into t1 (a, b) values (...) limit ?')
+
+    def test_histogram(self):
+        histogram = LogHistogram()
+        for value in range(1, 10001):
+            histogram.add(value * 1000)
+        for q, exact in ((0.5, 5e6), (0.95, 9.5e6), (0.99, 9.9e6)):
+            self.assertAlmostEqual(histogram.quantile(q) / exact, 1, delta=0.02)
+
+    def test_report(self):
+        conn = Connection(RowsDriver(), '')
+        stats = conn.enable_query_stats()
+        for i in range(1, 6):
+            conn.table('users').where_in('id', list(range(i))).get()
+        conn.table('roles').where('id', 1).get()
+        report = stats.report(order_by='calls')
+        self.assertEqual(report[0]['query'], 'select * from "users" where "id" in (...)')
+        self.assertEqual(report[0]['calls'], 5)
+        self.assertEqual(report[0]['rows'], 15)
+        print(stats.format_report())
@@ -0,0 +1,47 @@
+import time
+import unittest
+from sqlbuilder.driver import DriverBase
+from sqlbuilder.replication import ReplicatedConnection
+
+
+class NamedDriver(DriverBase):
+    def __init__(self, name, delay=0):
+        self.name = name
+        self.delay = delay
+
+    def fetch_all(self, query, bindings=None):
+        time.sleep(self.delay)
+        return [{'server': self.name}]
+
+    def statement(self, query, bindings=None):
+        return 1
+
+
+class ReplicationTest(unittest.TestCase):
+    def server(self, builder):
+        return builder.get()[0]['server']
+
+    def test_round_robin(self):
+        conn = ReplicatedConnection(NamedDriver('primary'), [NamedDriver('r1'), NamedDriver('r2')], sticky_window=0)
+        print(conn.table('users').get())
+        self.assertEqual([self.server(conn.table('users')) for _ in range(4)], ['r2', 'r1', 'r2', 'r1'])
+        self.assertEqual(self.server(conn.table('users').use_primary()), 'primary')
+
+    def test_sticky_reads(self):
+        conn = ReplicatedConnection(NamedDriver('primary'), [NamedDriver('r1')], sticky_window=0.05)
+        conn.table('users').where('id', 1).update({'votes': 1})
+        self.assertEqual(self.server(conn.table('users')), 'primary')
+        time.sleep(0.06)
+        self.assertEqual(self.server(conn.table('users')), 'r1')
+
+        conn.start_transaction()
+        self.assertEqual(self.server(conn.table('users')), 'primary')
+        conn.rollback()
+        self.assertEqual(self.server(conn.table('users')), 'r1')
+
+    def test_least_latency(self):
+        conn = ReplicatedConnection(NamedDriver('primary'), [NamedDriver('slow', 0.02), NamedDriver('fast')],
+                                    strategy='least_latency')
+        servers = [self.server(conn.table('users')) for _ in range(4)]
+        self.assertEqual(servers, ['slow', 'fast', 'fast', 'fast'])
+        print(conn.replica_stats())
@@ -0,0 +1,65 @@
+import pickle
+import unittest
+from sqlbuilder.connection import Connection
+from sqlbuilder.driver import DriverBase
+from sqlbuilder.rows import shape, pack, unpack, row_class
+
+
+class TupleDriver(DriverBase):
+    names = ('id', 'name', 'count(*)')
+
+    def fetch_all(self, query, bindings=None, row_format='dict'):
+        return shape(self.names, [(1, 'a', 10), (2, 'b', 20)], row_format)
+
+
+class RowsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.conn = Connection(TupleDriver(), '')
+
+    def test_formats(self):
+        query = self.conn.table('users')
+        self.assertEqual(query.get(), [{'id': 1, 'name': 'a', 'count(*)': 10}, {'id': 2, 'name': 'b', 'count(*)': 20}])
+        self.assertEqual(query.get(row_format='tuple'), [(1, 'a', 10), (2, 'b', 20)])
+        self.assertEqual(query.get(row_format='columnar'), {'id': [1, 2], 'name': ['a', 'b'], 'count(*)': [10, 20]})
+
+        named = query.get(row_format='namedtuple')
+        self.assertEqual((named[1].id, named[1].name, named[1][2]), (2, 'b', 20))
+
+        rows = query.get(row_format='slots')
+        print(rows)
+        self.assertEqual((rows[0].id, rows[0]['name'], rows[0][2], rows[0]['count(*)']), (1, 'a', 10, 10))
+        self.assertEqual(rows[0]._asdict(), {'id': 1, 'name': 'a', 'count(*)': 10})
+        self.assertIs(type(rows[0]), row_class(TupleDriver.names))
+        self.assertFalse(hasattr(rows[0], '__dict__'))
+
+        with self.assertRaises(ValueError):
+            shape(TupleDriver.names, [], 'xml')
+
+    def test_duplicate_columns(self):
+        # select * over a join where both tables have an id
+        names = ('id', 'name', 'id')
+        row = shape(names, [(1, 'a', 2)], 'slots')[0]
+        self.assertEqual((row.id, row._2, row[2]), (1, 2, 2))
+        self.assertEqual(row._fields, shape(names, [(1, 'a', 2)], 'namedtuple')[0]._fields)
+
+    def test_pack(self):
+        query = self.conn.table('users')
+        for row_format in ('dict', 'tuple', 'namedtuple', 'slots', 'columnar'):
+            rows = query.get(row_format=row_format)
+            self.assertEqual(unpack(*pickle.loads(pickle.dumps(pack(rows)))), rows)
+        self.assertEqual(unpack(*pack({'id': []})), {'id': []})
+
+    def test_old_driver_signature(self):
+        class OldDriver(DriverBase):
+            def fetch_all(self, query, bindings=None):
+                return [{'id': 1}]
+
+        self.assertEqual(Connection(OldDriver(), '').table('users').get(), [{'id': 1}])
+
+    def test_columnar_row_count(self):
+        events = []
+        self.conn.on('after_execute', events.append)
+        stats = self.conn.enable_query_stats()
+        self.conn.table('users').get(row_format='columnar')
+        self.assertEqual(events[0].rows, 2)
+        self.assertEqual(stats.report()[0]['rows'], 2)